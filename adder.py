@@ -20,13 +20,13 @@ if __name__ == "__main__":
 
     # define body
     adder_entry = rs.BasicBlock(name="entry")
-    a_val = rs.Value(type="read", void=False, content={"from": a_port, "time": 0})
-    b_val = rs.Value(type="read", void=False, content={"from": b_port, "time": 1})
-    sum_val = rs.Value(type="add", void=False, content={"width": 32, "operands": [a_val, b_val]})    # time to be determined by scheduler
+    a_val = rs.core.Value(type="read", void=False, content={"from": a_port, "time": 0})
+    b_val = rs.core.Value(type="read", void=False, content={"from": b_port, "time": 1})
+    sum_val = rs.core.Value(type="add", void=False, content={"width": 32, "operands": [a_val, b_val]})    # time to be determined by scheduler
     adder_entry.body += [
         a_val, b_val, sum_val,
-        rs.Value(type="write", void=True, content={"value": sum_val, "to": result_port, "time": 2}),
-        rs.Value(type="emit", void=True, content={"to": done_port, "time": 2})
+        rs.core.Value(type="write", void=True, content={"value": sum_val, "to": result_port, "time": 2}),
+        rs.core.Value(type="emit", void=True, content={"to": done_port, "time": 2})
     ]
     adder._blocks.append(adder_entry)
 
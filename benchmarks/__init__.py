@@ -0,0 +1,4 @@
+"""
+Benchmarks of the compile pipeline on generated workloads, run from the repository root with
+    python -m benchmarks.run --help
+"""
@@ -0,0 +1,170 @@
+"""
+Time each stage of the compile pipeline on generated workloads, and write one JSON record per run, e.g.,
+    python -m benchmarks.run --workloads dot_product random_dag --ops 10 1000 100000 --output new.jsonl
+    python -m benchmarks.run --baseline old.jsonl --output new.jsonl   # exits with 1 on regressions
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+import numpy as np
+from redstone import opt, stats
+from redstone.be import to_pyrtl
+from redstone.irsim import simulate
+from redstone.regalloc import allocate_registers, ready
+from redstone.rtlsim import simulate_rtl
+from redstone.verilog import to_verilog
+from .workloads import WORKLOADS, generate
+
+
+def run_one(
+    name: str,
+    ops: int,
+    resources: dict[str, int] | None = None,
+    max_rtl_ops: int = 1000,
+    batch: int = 1024,
+    cycles: int = 1000,
+    trace_memory: bool = False,
+    optimize: bool = False,
+    workers: int | None = None,
+    budget: float | None = None
+) -> dict[str, Any]:
+    """
+    Run the pipeline on one workload and return its record.
+    Lowering to pyrtl and RTL simulation are skipped above max_rtl_ops values.
+    If optimize, the opt passes run on the block before scheduling.
+    With workers, the independent parts of the block are scheduled in up to that many processes.
+    With a budget in seconds, scheduling keeps the best schedule found by then.
+    """
+    record: dict[str, Any] = {"workload": name, "ops": ops, "resources": resources, "optimize": optimize, "workers": workers, "budget": budget, "times": {}}
+    if trace_memory:
+        record["memory"] = {}
+
+    def stage(label: str, fn: Callable[[], Any]) -> Any:
+        # time one stage, and trace its peak Python allocation if requested
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        record["times"][label] = time.perf_counter() - start
+        if trace_memory:
+            record["memory"][label] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return result
+
+    func = stage("generate", lambda: generate(name, ops))
+    bb = func.blocks[0]
+    if optimize:
+        stage("optimize", lambda: opt.optimize(bb))
+    stage("dependencies", bb.dependencies)
+    stage("schedule", lambda: bb.schedule(resources=resources, workers=workers or 1, budget=budget))
+
+    types = bb.types()
+    val2reg = allocate_registers(bb)
+    reg_widths: dict[int, int] = {}
+    for val, idx in val2reg.items():
+        width = val.content["from"].width if val.type == "read" else val.content["width"]
+        reg_widths[idx] = max(reg_widths.get(idx, 0), width)
+    record["values"] = len(types)
+    record["operators"] = {ty: types.count(ty) for ty in ("add", "mul")}
+    record["units"] = len({(val.type, val.content["unit"]) for val in bb.body if "unit" in val.content})
+    record["schedule_length"] = max(ready(val) for val in bb.body) + 1
+    record["registers"] = len(reg_widths)
+    record["register_bits"] = sum(reg_widths.values())
+
+    with open(os.devnull, "w") as out:
+        stage("verilog", lambda: to_verilog(func, out))
+    rng = np.random.default_rng(0)
+    inputs = [port for port in func.ports if port.type.startswith("input")]
+    stimulus = {port.name: rng.integers(0, 1 << min(port.width, 63), size=batch, dtype=np.uint64) for port in inputs}
+    stage("simulate_ir", lambda: simulate(bb, stimulus))
+    if record["operators"]["add"] + record["operators"]["mul"] <= max_rtl_ops:
+        block = stage("to_pyrtl", lambda: to_pyrtl(func))
+        record["nets"] = len(block.logic)
+        columns = {port.name: rng.integers(0, 1 << min(port.width, 63), size=cycles, dtype=np.uint64) for port in inputs}
+        stage("simulate_rtl", lambda: simulate_rtl(func, columns, block=block))
+    record["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return record
+
+
+def regressions(baseline: list[dict[str, Any]], results: list[dict[str, Any]], tolerance: float, min_time: float) -> list[str]:
+    """
+    Return a message for every stage slower than its baseline by more than `tolerance`, as a fraction.
+    Stages shorter than min_time seconds in the baseline are too noisy and ignored.
+    """
+    key = lambda record: (record["workload"], record["ops"], json.dumps(record["resources"], sort_keys=True), record.get("optimize", False), record.get("workers"), record.get("budget"))
+    old = {key(record): record for record in baseline}
+    messages = []
+    for record in results:
+        if key(record) not in old:
+            continue
+        for label, new_time in record["times"].items():
+            old_time = old[key(record)]["times"].get(label)
+            if old_time is not None and old_time >= min_time and new_time > old_time * (1 + tolerance):
+                messages.append(f"{record['workload']} ({record['ops']} ops) {label}: {old_time:.4f}s -> {new_time:.4f}s")
+    return messages
+
+
+def _environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "machine": platform.machine(), "timestamp": time.time()}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", choices=sorted(WORKLOADS), default=sorted(WORKLOADS))
+    parser.add_argument("--ops", nargs="+", type=int, default=[10, 100, 1000, 10000, 100000], help="approximate number of add/mul values")
+    parser.add_argument("--resources", default="", help="resource limits, e.g., mul=4,add=8")
+    parser.add_argument("--max-rtl-ops", type=int, default=1000, help="skip pyrtl lowering and RTL simulation above this size")
+    parser.add_argument("--batch", type=int, default=1024, help="stimulus vectors of the IR simulation")
+    parser.add_argument("--cycles", type=int, default=1000, help="cycles of the RTL simulation")
+    parser.add_argument("--optimize", action="store_true", help="fold constants, drop dead values and narrow widths before scheduling")
+    parser.add_argument("--workers", type=int, help="schedule independent parts of each block in up to this many processes")
+    parser.add_argument("--budget", type=float, help="wall-clock seconds for scheduling each workload")
+    parser.add_argument("--trace-memory", action="store_true", help="record peak allocation per stage, which slows every stage down")
+    parser.add_argument("--output", help="JSON lines file to write, stdout by default")
+    parser.add_argument("--baseline", help="JSON lines file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown reported as a regression")
+    parser.add_argument("--min-time", type=float, default=1e-3, help="ignore stages faster than this in the baseline, in seconds")
+    args = parser.parse_args(argv)
+
+    resources = dict((ty, int(limit)) for ty, limit in (item.split("=") for item in args.resources.split(",") if item)) or None
+    env = _environment()
+    out = open(args.output, "w") if args.output else sys.stdout
+    results = []
+    try:
+        for name in args.workloads:
+            for ops in args.ops:
+                with stats.collect() as passes:
+                    record = run_one(name, ops, resources, args.max_rtl_ops, args.batch, args.cycles, args.trace_memory, args.optimize, args.workers, args.budget)
+                record["passes"] = passes.to_json()
+                record["environment"] = env
+                results.append(record)
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = [json.loads(line) for line in f if line.strip()]
+        messages = regressions(baseline, results, args.tolerance, args.min_time)
+        for message in messages:
+            print(f"regression: {message}", file=sys.stderr)
+        return 1 if messages else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Generators of parameterized single-block functions for benchmarking.
+Every generator returns an unscheduled core.Function whose results are written to output buses.
+"""
+from __future__ import annotations
+import random
+from redstone.core import BasicBlock, Function, Port, Value
+
+
+def dot_product(n: int, width: int = 32) -> Function:
+    """
+    Dot product of two n-element vectors streamed through ports a and b, one element per time step,
+    summed by a balanced adder tree.
+    """
+    a = Port("a", "inputbus", width)
+    b = Port("b", "inputbus", width)
+    products = []
+    body = []
+    for i in range(n):
+        a_val = Value("read", False, {"from": a, "time": i})
+        b_val = Value("read", False, {"from": b, "time": i})
+        products.append(Value("mul", False, {"width": width, "operands": [a_val, b_val]}))
+        body += [a_val, b_val, products[-1]]
+    return _finish("dot_product", [a, b], body, [_tree(products, "add", width, body)], width)
+
+
+def fir(taps: int, width: int = 32) -> Function:
+    """
+    Transposed-form FIR filter over `taps` samples streamed through port x, one per time step,
+    with coefficients read from ports c0, c1, ... at time 0.
+    """
+    x = Port("x", "inputbus", width)
+    coeffs = [Port(f"c{k}", "inputbus", width) for k in range(taps)]
+    body = [Value("read", False, {"from": c, "time": 0}) for c in coeffs]
+    acc = None
+    for k in range(taps):
+        sample = Value("read", False, {"from": x, "time": k})
+        prod = Value("mul", False, {"width": width, "operands": [sample, body[k]]})
+        body += [sample, prod]
+        if acc is None:
+            acc = prod
+        else:
+            acc = Value("add", False, {"width": width, "operands": [acc, prod]})
+            body.append(acc)
+    return _finish("fir", [x] + coeffs, body, [acc], width)
+
+
+def matmul_tree(n: int, width: int = 16) -> Function:
+    """
+    Product of two n x n matrices read from ports a_i_j and b_i_j at time 0,
+    each output element summed by a balanced adder tree and written to port c_i_j.
+    """
+    a = [[Port(f"a_{i}_{j}", "inputbus", width) for j in range(n)] for i in range(n)]
+    b = [[Port(f"b_{i}_{j}", "inputbus", width) for j in range(n)] for i in range(n)]
+    a_vals = [[Value("read", False, {"from": p, "time": 0}) for p in row] for row in a]
+    b_vals = [[Value("read", False, {"from": p, "time": 0}) for p in row] for row in b]
+    body = [val for row in a_vals + b_vals for val in row]
+    results = []
+    for i in range(n):
+        for j in range(n):
+            products = []
+            for k in range(n):
+                products.append(Value("mul", False, {"width": width, "operands": [a_vals[i][k], b_vals[k][j]]}))
+            body += products
+            results.append(_tree(products, "add", width, body))
+    ports = [p for row in a + b for p in row]
+    return _finish("matmul_tree", ports, body, results, width, [f"c_{i}_{j}" for i in range(n) for j in range(n)])
+
+
+def random_dag(ops: int, width: int = 32, inputs: int = 8, window: int = 64, seed: int = 0) -> Function:
+    """
+    Random DAG of add and mul values, each taking one operand among the `window` latest values
+    and the other anywhere before it, so that it has both long chains and wide fan-out.
+    """
+    rnd = random.Random(seed)
+    ports = [Port(f"i{k}", "inputbus", width) for k in range(inputs)]
+    body = [Value("read", False, {"from": p, "time": 0}) for p in ports]
+    for _ in range(ops):
+        lhs = body[rnd.randrange(max(len(body) - window, 0), len(body))]
+        rhs = body[rnd.randrange(len(body))]
+        body.append(Value(rnd.choice(["add", "mul"]), False, {"width": width, "operands": [lhs, rhs]}))
+    return _finish("random_dag", ports, body, [body[-1]], width)
+
+
+WORKLOADS = {
+    # name -> (generator, parameter giving about `ops` add/mul values)
+    "dot_product": (dot_product, lambda ops: max(ops // 2, 1)),
+    "fir": (fir, lambda ops: max(ops // 2, 1)),
+    "matmul_tree": (matmul_tree, lambda ops: max(round((ops / 2) ** (1 / 3)), 1)),
+    "random_dag": (random_dag, lambda ops: ops),
+}
+
+
+def generate(name: str, ops: int) -> Function:
+    """
+    Generate the named workload with about `ops` add/mul values.
+    """
+    generator, param = WORKLOADS[name]
+    return generator(param(ops))
+
+
+def _tree(vals: list[Value], type: str, width: int, body: list[Value]) -> Value:
+    # reduce values by a balanced tree, appending the new values to body
+    while len(vals) > 1:
+        pairs = []
+        for k in range(0, len(vals) - 1, 2):
+            pairs.append(Value(type, False, {"width": width, "operands": [vals[k], vals[k + 1]]}))
+        body += pairs
+        vals = pairs + vals[len(vals) - len(vals) % 2:]
+    return vals[0]
+
+
+def _finish(name: str, inputs: list[Port], body: list[Value], results: list[Value], width: int, names: list[str] | None = None) -> Function:
+    # write the results to output ports, with a done pulse left for the scheduler to place
+    func = Function(name)
+    outputs = [Port(port_name, "outputbus", width) for port_name in names or [f"out{k}" for k in range(len(results))]]
+    done = Port("done", "outputpulse", 1)
+    func.ports += inputs + outputs + [done]
+    bb = BasicBlock("entry")
+    bb.body += body
+    for val, port in zip(results, outputs):
+        bb.body.append(Value("write", True, {"value": val, "to": port}))
+    bb.body.append(Value("emit", True, {"to": done}))
+    func.blocks.append(bb)
+    return func
@@ -1,5 +1,47 @@
+from typing import TYPE_CHECKING
+import importlib
+
 from .fe import *
 
-# from .core import Event, Value, Port, BasicBlock, Function
+# everything past the frontend is imported on first use, so that elaborating a design loads no solver or backend
+# NOTE: Value and Event are those of the frontend, the IR ones are rs.core.Value and rs.core.Event
+_LAZY_NAMES = {
+    "Function": "core",
+    "BasicBlock": "core",
+    "Port": "core",
+    "CompactBlock": "compact",
+    "OpLib": "oplib",
+    "DEFAULT_OPLIB": "oplib",
+    "lower": "lowering",
+    "to_pyrtl": "be",
+    "to_verilog": "verilog",
+    "simulate": "irsim",
+    "simulate_rtl": "rtlsim",
+}
+_SUBMODULES = {"be", "compact", "core", "fe", "irsim", "lowering", "oplib", "opt", "parallel", "regalloc", "rtlsim", "sched", "solvers", "stats", "timeline", "verilog"}
+
+if TYPE_CHECKING:
+    from . import be, compact, core, irsim, lowering, oplib, opt, parallel, regalloc, rtlsim, sched, solvers, stats, timeline, verilog
+    from .be import to_pyrtl
+    from .compact import CompactBlock
+    from .core import BasicBlock, Function, Port
+    from .irsim import simulate
+    from .lowering import lower
+    from .oplib import DEFAULT_OPLIB, OpLib
+    from .rtlsim import simulate_rtl
+    from .verilog import to_verilog
+
+
+def __getattr__(name: str):
+    if name in _LAZY_NAMES:
+        attr = getattr(importlib.import_module(f".{_LAZY_NAMES[name]}", __name__), name)
+    elif name in _SUBMODULES:
+        attr = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = attr
+    return attr
+
 
-# from .be import to_pyrtl
\ No newline at end of file
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY_NAMES) | _SUBMODULES)
@@ -1,8 +1,13 @@
 import pyrtl
-from .core import Function, Value, Port
+from . import stats
+from .core import BasicBlock, Function, Value, Port
+from .regalloc import allocate_registers, latency, lifetimes, pipeline_ii, ready
 
 
-def to_pyrtl(func: Function, is_top: bool = True) -> pyrtl.Block:
+def to_pyrtl(func: Function, is_top: bool = True, pipelined: bool = False, ii: int | None = None) -> pyrtl.Block:
+    # NOTE: by default, a counter FSM runs one transaction at a time and ignores go until it is done
+    # NOTE: if pipelined, every time step is a pipeline stage and a new go is accepted every ii cycles, in which the
+    # ready output is high, and ii defaults to that of a modulo-scheduled block or the smallest one the schedule allows
     if len(func.blocks) != 1:
         raise NotImplementedError("Only single-block function is supported.")
     bb = func.blocks[0]
@@ -10,72 +15,119 @@ def to_pyrtl(func: Function, is_top: bool = True) -> pyrtl.Block:
         raise RuntimeError("Scheduling required before lowering.")
     if not is_top:
         raise NotImplementedError("Only top-level function is supported.")
+    with stats.timed("to_pyrtl", function=func.name, values=len(bb.body), pipelined=pipelined) as counters:
+        if pipelined:
+            block = _to_pyrtl_pipelined(func, bb, pipeline_ii(bb, ii))
+        else:
+            block = _to_pyrtl_fsm(func, bb)
+        counters.update(
+            registers=len(block.wirevector_subset(pyrtl.Register)),
+            wires=len(block.wirevector_set),
+            nets=len(block.logic),
+        )
+    return block
+
 
+def _to_pyrtl_fsm(func: Function, bb: BasicBlock) -> pyrtl.Block:
     time2vals: dict[int, list[Value]] = {}
+    time2ready: dict[int, list[Value]] = {}   # values whose results are ready in each time step
     for val in bb.body:
-        if val.content["time"] in time2vals:
-            time2vals[val.content["time"]].append(val)
-        else:
-            time2vals[val.content["time"]] = [val]
-    max_time = max(time2vals.keys())
-    cnter_width = max_time.bit_length()
+        time2vals.setdefault(val.content["time"], []).append(val)
+        time2ready.setdefault(ready(val), []).append(val)
+    max_time = max(time2ready.keys())
+    cnter_width = max(max_time.bit_length(), 1)
 
     pyrtl.reset_working_block()
 
     # module ports
     go = pyrtl.Input(bitwidth=1, name="go")
-    port2wv: dict[Port, pyrtl.WireVector] = {}
-    for port in func.ports:
-        if port.type.startswith("input"):
-            wv = pyrtl.Input(bitwidth=port.width, name=port.name or "")
-        else:
-            wv = pyrtl.Output(bitwidth=port.width, name=port.name or "")
-        port2wv[port] = wv
+    port2wv = _declare_ports(func)
 
     cnter = pyrtl.Register(bitwidth=cnter_width, name="cnter")
 
-    # declare internal registers and wires
-    # NOTE: some unused registers may be created
-    val2ref: dict[Value, tuple[pyrtl.WireVector, pyrtl.Register]] = {}
+    # declare internal wires, and registers only for values crossing a cycle boundary
+    # NOTE: values whose lifetimes do not overlap share a register
+    val2ref: dict[Value, tuple[pyrtl.WireVector, pyrtl.WireVector | None]] = {}
+    val2reg: dict[Value, pyrtl.Register] = {}
+    val2idx = allocate_registers(bb)
+    reg_widths: dict[int, int] = {}
+    for val, idx in val2idx.items():
+        reg_widths[idx] = max(reg_widths.get(idx, 0), _width(val))
+    regs = [pyrtl.Register(bitwidth=reg_widths[idx]) for idx in range(len(reg_widths))]
     for val in bb.body:
         if val.type == "phi":
-            # TODO: handle phi nodes
-            pass
+            # the state register carries the value into the next transaction
+            wire = pyrtl.Register(bitwidth=val.content["width"], reset_value=val.content.get("init", 0))
         elif val.type == "read":
-            from_port = val.content["from"]
-            from_wv = port2wv[from_port]
-            from_reg = pyrtl.Register(bitwidth=from_port.width)
-            val2ref[val] = (from_wv, from_reg)
-        elif val.type in {"add", "mul"}:
-            width = val.content["width"]
-            result_wv = pyrtl.WireVector(bitwidth=width)
-            result_reg = pyrtl.Register(bitwidth=width)
-            val2ref[val] = (result_wv, result_reg)
+            wire = port2wv[val.content["from"]]
+        elif val.type in {"add", "mul", "eq", "mux", "slice", "shl"}:
+            wire = pyrtl.WireVector(bitwidth=val.content["width"])
+        elif val.type == "const":
+            # constants need no register, they are seen as they are in every time step
+            const = pyrtl.Const(val.content["constant"], bitwidth=val.content["width"])
+            val2ref[val] = (const, const)
+            continue
+        else:
+            continue
+        reg_ref = None
+        if val in val2idx:
+            val2reg[val] = regs[val2idx[val]]
+            reg_ref = val2reg[val][:_width(val)]
+        val2ref[val] = (wire, reg_ref)
+
+    val2unit = _declare_units(bb)
+    next2phis: dict[Value, list[Value]] = {}
+    for val in bb.body:
+        if val.type == "phi" and "next" in val.content:
+            next2phis.setdefault(val.content["next"], []).append(val)
 
     # connect logic per time step
-    for t, vals in time2vals.items():
-        with pyrtl.conditional_assignment:
+    # NOTE: one conditional block for all steps, so that wires shared across steps have a single driver
+    with pyrtl.conditional_assignment:
+        for t in sorted(time2vals.keys() | time2ready.keys()):
             with cnter == t if t > 0 else (cnter == 0) & go:
-                for val in vals:
-                    if val.type == "read":
-                        from_wv, from_reg = val2ref[val]
-                        from_reg.next |= from_wv
-                    elif val.type in {"add", "mul"}:
+                for val in time2ready.get(t, []):
+                    if val in val2reg:
+                        # keep the value for later time steps
+                        val2reg[val].next |= val2ref[val][0]
+                    # update phi nodes fed by values ready in this time step
+                    for phi in next2phis.get(val, []):
+                        val2ref[phi][0].next |= val2ref[val][0]
+                for val in time2vals.get(t, []):
+                    if val.type in {"add", "mul"}:
                         lhs, rhs = val.content["operands"]
-                        # use registered value if produced earlier
-                        lhs_ref = val2ref[lhs][1] if lhs.content["time"] < t else val2ref[lhs][0]
-                        rhs_ref = val2ref[rhs][1] if rhs.content["time"] < t else val2ref[rhs][0]
-                        result_wv, result_reg = val2ref[val]
-                        if val.type == "add":
+                        # use registered value if ready earlier
+                        lhs_ref = val2ref[lhs][1] if ready(lhs) < t else val2ref[lhs][0]
+                        rhs_ref = val2ref[rhs][1] if ready(rhs) < t else val2ref[rhs][0]
+                        result_wv = val2ref[val][0]
+                        if val in val2unit:
+                            # steer operands into the unit in this time step, the result leaves its pipeline when ready
+                            unit_lhs, unit_rhs, unit_stages = val2unit[val]
+                            unit_lhs |= lhs_ref
+                            unit_rhs |= rhs_ref
+                            result_wv <<= unit_stages[latency(val)]
+                        elif val.type == "add":
                             result_wv <<= lhs_ref + rhs_ref
                         else:  # mul
                             result_wv <<= lhs_ref * rhs_ref
-                        result_reg.next |= result_wv
+                    elif val.type in {"eq", "mux"}:
+                        refs = [val2ref[pred][1] if ready(pred) < t else val2ref[pred][0] for pred in val.content["operands"]]
+                        result_wv = val2ref[val][0]
+                        result_wv <<= refs[0] == refs[1] if val.type == "eq" else pyrtl.select(*refs)
+                    elif val.type == "slice":
+                        (operand,) = val.content["operands"]
+                        result_wv = val2ref[val][0]
+                        result_wv <<= _bits(val2ref[operand][1] if ready(operand) < t else val2ref[operand][0], val.content["lsb"])
+                    elif val.type == "shl":
+                        (operand,) = val.content["operands"]
+                        result_wv = val2ref[val][0]
+                        operand_ref = val2ref[operand][1] if ready(operand) < t else val2ref[operand][0]
+                        result_wv <<= pyrtl.concat(operand_ref, pyrtl.Const(0, bitwidth=val.content["amount"]))
                     elif val.type == "write":
                         value = val.content["value"]
                         to_port = val.content["to"]
-                        # use registered value if produced earlier
-                        value_ref = val2ref[value][1] if value.content["time"] < t else val2ref[value][0]
+                        # use registered value if ready earlier
+                        value_ref = val2ref[value][1] if ready(value) < t else val2ref[value][0]
                         to_wv = port2wv[to_port]
                         to_wv |= value_ref
                     elif val.type == "emit":
@@ -94,4 +146,170 @@ def to_pyrtl(func: Function, is_top: bool = True) -> pyrtl.Block:
             with pyrtl.otherwise:
                 cnter.next |= cnter + 1
 
-    return pyrtl.working_block()
\ No newline at end of file
+    return pyrtl.working_block()
+
+
+def _to_pyrtl_pipelined(func: Function, bb: BasicBlock, ii: int) -> pyrtl.Block:
+    # every time step is a stage, values are carried by free-running stage registers
+    # and a valid bit travels along the stages with each transaction
+    max_time = max(ready(val) for val in bb.body)
+    last_use = {val: ready(val) for val in bb.body}
+    for val in bb.body:
+        for pred in val.predecessors:
+            last_use[pred] = max(last_use[pred], val.content["time"])
+
+    pyrtl.reset_working_block()
+
+    # module ports
+    go = pyrtl.Input(bitwidth=1, name="go")
+    port2wv = _declare_ports(func)
+
+    # transactions are issued in slots aligned to ii, so that units shared modulo ii never collide,
+    # and ready tells the caller that go is taken in this cycle
+    accept = pyrtl.Output(bitwidth=1, name="ready")
+    if ii > 1:
+        phase = pyrtl.Register(bitwidth=(ii - 1).bit_length(), name="phase")
+        phase.next <<= pyrtl.select(phase == ii - 1, pyrtl.Const(0), phase + 1)
+        accept <<= phase == 0
+        issue = go & (phase == 0)
+    else:
+        accept <<= 1
+        issue = go
+    valid: list[pyrtl.WireVector] = [issue]
+    for t in range(1, max_time + 1):
+        valid_reg = pyrtl.Register(bitwidth=1, name=f"valid{t}")
+        valid_reg.next <<= valid[t - 1]
+        valid.append(valid_reg)
+
+    # declare the wire of each value at its own stage, followed by its stage registers
+    val2stages: dict[Value, list[pyrtl.WireVector]] = {}
+    for val in bb.body:
+        if val.type == "phi":
+            stage = pyrtl.Register(bitwidth=val.content["width"], reset_value=val.content.get("init", 0))
+        elif val.type == "read":
+            stage = port2wv[val.content["from"]]
+        elif val.type in {"add", "mul", "eq", "mux", "slice", "shl"}:
+            stage = pyrtl.WireVector(bitwidth=val.content["width"])
+        elif val.type == "const":
+            const = pyrtl.Const(val.content["constant"], bitwidth=val.content["width"])
+            val2stages[val] = [const] * (last_use[val] - ready(val) + 1)
+            continue
+        else:
+            continue
+        stages = [stage]
+        for _ in range(ready(val), last_use[val]):
+            stage_reg = pyrtl.Register(bitwidth=_width(val))
+            stage_reg.next <<= stages[-1]
+            stages.append(stage_reg)
+        val2stages[val] = stages
+
+    def ref(val: Value, t: int) -> pyrtl.WireVector:
+        # the value as seen in stage t
+        return val2stages[val][t - ready(val)]
+
+    val2unit = _declare_units(bb)
+    port2emits: dict[Port, list[pyrtl.WireVector]] = {}
+    # conditional drivers of each destination, grouped since sibling conditions form a priority chain
+    # NOTE: the conditions of a destination never hold together, since pipeline_ii keeps their time steps apart modulo ii
+    dest2cases: dict[pyrtl.WireVector, list[tuple[pyrtl.WireVector, pyrtl.WireVector]]] = {}
+
+    for val in bb.body:
+        t = val.content["time"]
+        if val.type in {"add", "mul"}:
+            lhs, rhs = val.content["operands"]
+            result_wv = val2stages[val][0]
+            if val in val2unit:
+                unit_lhs, unit_rhs, unit_stages = val2unit[val]
+                dest2cases.setdefault(unit_lhs, []).append((valid[t], ref(lhs, t)))
+                dest2cases.setdefault(unit_rhs, []).append((valid[t], ref(rhs, t)))
+                result_wv <<= unit_stages[latency(val)]
+            elif val.type == "add":
+                result_wv <<= ref(lhs, t) + ref(rhs, t)
+            else:  # mul
+                result_wv <<= ref(lhs, t) * ref(rhs, t)
+        elif val.type in {"eq", "mux"}:
+            refs = [ref(pred, t) for pred in val.content["operands"]]
+            result_wv = val2stages[val][0]
+            result_wv <<= refs[0] == refs[1] if val.type == "eq" else pyrtl.select(*refs)
+        elif val.type == "slice":
+            result_wv = val2stages[val][0]
+            result_wv <<= _bits(ref(val.content["operands"][0], t), val.content["lsb"])
+        elif val.type == "shl":
+            result_wv = val2stages[val][0]
+            result_wv <<= pyrtl.concat(ref(val.content["operands"][0], t), pyrtl.Const(0, bitwidth=val.content["amount"]))
+        elif val.type == "phi" and "next" in val.content:
+            next_val = val.content["next"]
+            t_next = ready(next_val)
+            dest2cases.setdefault(val2stages[val][0], []).append((valid[t_next], ref(next_val, t_next)))
+        elif val.type == "write":
+            dest2cases.setdefault(port2wv[val.content["to"]], []).append((valid[t], ref(val.content["value"], t)))
+        elif val.type == "emit":
+            port2emits.setdefault(val.content["to"], []).append(valid[t])
+
+    for dest, cases in dest2cases.items():
+        with pyrtl.conditional_assignment:
+            for cond, src in cases:
+                with cond:
+                    if isinstance(dest, pyrtl.Register):
+                        dest.next |= src
+                    else:
+                        dest |= src
+    for port, emits in port2emits.items():
+        port2wv[port] <<= pyrtl.rtl_any(*emits)
+
+    return pyrtl.working_block()
+
+
+def _declare_ports(func: Function) -> dict[Port, pyrtl.WireVector]:
+    port2wv: dict[Port, pyrtl.WireVector] = {}
+    for port in func.ports:
+        if port.type.startswith("input"):
+            wv = pyrtl.Input(bitwidth=port.width, name=port.name or "")
+        else:
+            wv = pyrtl.Output(bitwidth=port.width, name=port.name or "")
+        port2wv[port] = wv
+    return port2wv
+
+
+def _declare_units(bb: BasicBlock) -> dict[Value, tuple[pyrtl.WireVector, pyrtl.WireVector, list[pyrtl.WireVector]]]:
+    # declare functional units of values bound to the same unit by the scheduler,
+    # and a private unit for every other multi-cycle value
+    # return the operand wires of the unit of each value, and its output delayed by 0, 1, ... cycles
+    # NOTE: a multi-cycle unit is an operator followed by pipeline registers, a value with latency L takes stage L,
+    # and the scheduler keeps non-pipelined units busy until their results are ready
+    val2key: dict[Value, tuple[str, int | Value]] = {}
+    unit_widths: dict[tuple[str, int | Value], list[int]] = {}
+    for val in bb.body:
+        if val.type in {"add", "mul"} and ("unit" in val.content or latency(val) > 0):
+            lhs, rhs = val.content["operands"]
+            key = (val.type, val.content.get("unit", val))
+            widths = unit_widths.setdefault(key, [0, 0, 0])
+            widths[0] = max(widths[0], _width(lhs))
+            widths[1] = max(widths[1], _width(rhs))
+            widths[2] = max(widths[2], latency(val))
+            val2key[val] = key
+    key2ref: dict[tuple[str, int | Value], tuple[pyrtl.WireVector, pyrtl.WireVector, list[pyrtl.WireVector]]] = {}
+    for key, (lhs_width, rhs_width, depth) in unit_widths.items():
+        op, unit = key
+        name = f"{op}{unit}" if isinstance(unit, int) else ""
+        unit_lhs = pyrtl.WireVector(bitwidth=lhs_width, name=f"{name}_lhs" if name else "")
+        unit_rhs = pyrtl.WireVector(bitwidth=rhs_width, name=f"{name}_rhs" if name else "")
+        unit_stages = [unit_lhs + unit_rhs if op == "add" else unit_lhs * unit_rhs]
+        for _ in range(depth):
+            stage_reg = pyrtl.Register(bitwidth=len(unit_stages[-1]))
+            stage_reg.next <<= unit_stages[-1]
+            unit_stages.append(stage_reg)
+        key2ref[key] = (unit_lhs, unit_rhs, unit_stages)
+    return {val: key2ref[key] for val, key in val2key.items()}
+
+
+def _bits(wv: pyrtl.WireVector, lsb: int) -> pyrtl.WireVector:
+    # bits of a wire from lsb up, which the destination truncates or zero-extends to its width
+    return wv[lsb:] if lsb < len(wv) else pyrtl.Const(0)
+
+
+def _width(val: Value) -> int:
+    # bitwidth of the wire carrying the value
+    if val.type == "read":
+        return val.content["from"].width
+    return val.content["width"]
\ No newline at end of file
@@ -0,0 +1,356 @@
+"""
+Compact struct-of-arrays representation of basic blocks.
+Opcodes, widths, times, unit bindings and operand indices live in typed arrays,
+and values are exposed as lightweight views that keep the core.Value API.
+"""
+from __future__ import annotations
+from array import array
+from collections.abc import Iterator, MutableMapping, Sequence
+from typing import Any
+from .core import BasicBlock, Port, Value
+
+
+# opcodes every block starts with, other value types are registered by each block on first use
+OPCODES: tuple[str, ...] = ("phi", "read", "add", "mul", "write", "store", "emit")
+MAX_OPCODES = 256   # value types of a block, as opcodes are bytes
+
+# content keys stored in columns, the rest go to a sparse side table
+_COLUMN_KEYS = {"width", "time", "unit", "operands", "value", "from", "to", "next"}
+
+
+class ValueView:
+    """
+    A value of a CompactBlock, behaving like core.Value.
+    Views of the same block and index compare equal, so they can be used as dict keys.
+    """
+    __slots__ = ("_block", "_idx")
+    _block: CompactBlock
+    _idx: int
+
+    def __init__(self, block: CompactBlock, idx: int):
+        self._block = block
+        self._idx = idx
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ValueView) and self._block is other._block and self._idx == other._idx
+
+    def __hash__(self) -> int:
+        return hash((id(self._block), self._idx))
+
+    def __repr__(self) -> str:
+        return f"Value(type={self.type}, void={self.void}, content={dict(self.content)})"
+
+    @property
+    def index(self) -> int:
+        return self._idx
+
+    @property
+    def type(self) -> str:
+        return self._block.optypes[self._block.opcodes[self._idx]]
+
+    @property
+    def void(self) -> bool:
+        return bool(self._block.voids[self._idx])
+
+    @property
+    def content(self) -> _ContentView:
+        return _ContentView(self._block, self._idx)
+
+    @property
+    def predecessors(self) -> tuple[ValueView, ...]:
+        b = self._block
+        return tuple(ValueView(b, j) for j in b.operand_index[b.operand_start[self._idx]:b.operand_start[self._idx + 1]])
+
+
+class _ContentView(MutableMapping):
+    # dict-like content of a ValueView, reading and writing the columns
+    __slots__ = ("_block", "_idx")
+
+    def __init__(self, block: CompactBlock, idx: int):
+        self._block = block
+        self._idx = idx
+
+    def _columns(self) -> dict[str, Any]:
+        b, i = self._block, self._idx
+        ty = b.optypes[b.opcodes[i]]
+        cols: dict[str, Any] = {}
+        if b.widths[i]:
+            cols["width"] = b.widths[i]
+        if b.times[i] >= 0:
+            cols["time"] = b.times[i]
+        if b.units[i] >= 0:
+            cols["unit"] = b.units[i]
+        operands = b.operand_index[b.operand_start[i]:b.operand_start[i + 1]]
+        if ty in {"write", "store"}:
+            cols["value"] = ValueView(b, operands[0])
+        elif len(operands):
+            cols["operands"] = [ValueView(b, j) for j in operands]
+        if b.port_refs[i] >= 0:
+            cols["from" if ty == "read" else "to"] = b.ports[b.port_refs[i]]
+        if b.nexts[i] >= 0:
+            cols["next"] = ValueView(b, b.nexts[i])
+        return cols
+
+    def __getitem__(self, key: str) -> Any:
+        # fast paths for the columns read in scheduling and lowering loops
+        b, i = self._block, self._idx
+        if key == "time" and b.times[i] >= 0:
+            return b.times[i]
+        if key == "width" and b.widths[i]:
+            return b.widths[i]
+        cols = self._columns()
+        if key in cols:
+            return cols[key]
+        return self._block.extra[self._idx][key]
+
+    def __setitem__(self, key: str, item: Any):
+        b, i = self._block, self._idx
+        if key == "time":
+            b.times[i] = item
+        elif key == "unit":
+            b.units[i] = item
+        elif key == "width":
+            b.widths[i] = item
+        elif key in _COLUMN_KEYS:
+            raise KeyError(f"Column {key} of a compact value cannot be reassigned.")
+        else:
+            b.extra.setdefault(i, {})[key] = item
+
+    def __delitem__(self, key: str):
+        b, i = self._block, self._idx
+        if key == "time" and b.times[i] >= 0:
+            b.times[i] = -1
+        elif key == "unit" and b.units[i] >= 0:
+            b.units[i] = -1
+        elif key in b.extra.get(i, {}):
+            del b.extra[i][key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._columns()
+        yield from self._block.extra.get(self._idx, {})
+
+    def __len__(self) -> int:
+        return len(self._columns()) + len(self._block.extra.get(self._idx, {}))
+
+
+class _BodyView(Sequence):
+    # read-only sequence of ValueViews
+    __slots__ = ("_block",)
+
+    def __init__(self, block: CompactBlock):
+        self._block = block
+
+    def __len__(self) -> int:
+        return len(self._block.opcodes)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [ValueView(self._block, i) for i in range(len(self))[idx]]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        return ValueView(self._block, idx)
+
+    def __iter__(self) -> Iterator[ValueView]:
+        b = self._block
+        return (ValueView(b, i) for i in range(len(b.opcodes)))
+
+
+class CompactBlock(BasicBlock):
+    """
+    A BasicBlock stored as columns.
+    Values are appended by index with append() and must come after their operands,
+    except for phi nodes whose next value is set later with set_next().
+    """
+    opcodes: array   # index into optypes
+    optypes: list[str]
+    voids: array
+    widths: array
+    times: array   # -1 if not scheduled
+    units: array   # -1 if not bound to a shared unit
+    port_refs: array   # index into ports, -1 if none
+    nexts: array   # next value of phi nodes, -1 if none
+    operand_start: array   # operands of value i are operand_index[operand_start[i]:operand_start[i + 1]]
+    operand_index: array
+    ports: list[Port]
+    extra: dict[int, dict[str, Any]]
+    _port2idx: dict[Port, int]
+    _opcode_index: dict[str, int]
+
+    def __init__(self, name: str | None = None):
+        super().__init__(name)
+        self._body = _BodyView(self)
+        self.opcodes = array("B")
+        self.optypes = list(OPCODES)
+        self._opcode_index = {ty: code for code, ty in enumerate(OPCODES)}
+        self.voids = array("B")
+        self.widths = array("I")
+        self.times = array("i")
+        self.units = array("i")
+        self.port_refs = array("i")
+        self.nexts = array("i")
+        self.operand_start = array("I", [0])
+        self.operand_index = array("I")
+        self.ports = []
+        self.extra = {}
+        self._port2idx = {}
+
+    def opcode(self, ty: str) -> int:
+        """
+        Return the opcode of a value type in this block, registering it on first use.
+        """
+        code = self._opcode_index.get(ty)
+        if code is None:
+            code = len(self.optypes)
+            if code == MAX_OPCODES:
+                raise ValueError(f"Compact block {self.name} cannot hold more than {MAX_OPCODES} value types, such as {ty}.")
+            self.optypes.append(ty)
+            self._opcode_index[ty] = code
+        return code
+
+    def append(
+        self,
+        type: str,
+        void: bool = False,
+        width: int = 0,
+        operands: Sequence[int] = (),
+        port: Port | None = None,
+        time: int | None = None,
+        **extra: Any
+    ) -> int:
+        """
+        Append a value and return its index.
+        For write/store values, the single operand is the written value.
+        """
+        idx = len(self.opcodes)
+        if any(not 0 <= j < idx for j in operands):
+            raise IndexError("Operands must be appended before their users.")
+        self.opcodes.append(self.opcode(type))
+        self.voids.append(void)
+        self.widths.append(width)
+        self.times.append(-1 if time is None else time)
+        self.units.append(-1)
+        self.nexts.append(-1)
+        if port is None:
+            self.port_refs.append(-1)
+        else:
+            if port not in self._port2idx:
+                self._port2idx[port] = len(self.ports)
+                self.ports.append(port)
+            self.port_refs.append(self._port2idx[port])
+        self.operand_index.extend(operands)
+        self.operand_start.append(len(self.operand_index))
+        if extra:
+            self.extra[idx] = extra
+        return idx
+
+    def set_next(self, phi: int, next_val: int):
+        """
+        Set the value a phi node takes from the previous loop iteration.
+        """
+        self.nexts[phi] = next_val
+
+    @classmethod
+    def from_block(cls, bb: BasicBlock) -> CompactBlock:
+        """
+        Convert a BasicBlock into columns.
+        """
+        cb = cls(bb.name)
+        val2idx: dict[Value, int] = {}
+        for val in bb.body:
+            content = dict(val.content)
+            operands = [val2idx[pred] for pred in val.predecessors]
+            for key in ("operands", "value", "next"):
+                content.pop(key, None)
+            port = content.pop("from", None) or content.pop("to", None)
+            unit = content.pop("unit", None)
+            val2idx[val] = cb.append(val.type, val.void, content.pop("width", 0), operands, port, content.pop("time", None), **content)
+            if unit is not None:
+                cb.units[val2idx[val]] = unit
+        for val in bb.body:
+            if val.type == "phi" and "next" in val.content:
+                cb.set_next(val2idx[val], val2idx[val.content["next"]])
+        return cb
+
+    def to_block(self) -> BasicBlock:
+        """
+        Convert back into a BasicBlock of core.Value objects.
+        """
+        bb = BasicBlock(self.name)
+        vals: list[Value] = []
+        for view in self.body:
+            content = dict(view.content)
+            if "operands" in content:
+                content["operands"] = [vals[v.index] for v in content["operands"]]
+            if "value" in content:
+                content["value"] = vals[content["value"].index]
+            content.pop("next", None)
+            vals.append(Value(view.type, view.void, content))
+        for view, val in zip(self.body, vals):
+            if self.nexts[view.index] >= 0:
+                val.content["next"] = vals[self.nexts[view.index]]
+        bb.body = vals
+        return bb
+
+    @property
+    def body(self) -> _BodyView:
+        return self._body
+
+    @body.setter
+    def body(self, new_body: list[Value]):
+        raise AttributeError("Body of a CompactBlock cannot be replaced, use append() instead.")
+
+    def __repr__(self) -> str:
+        return f"CompactBlock(name={self.name}, size={len(self.opcodes)})"
+
+    # the dependency index is the operand columns themselves
+    def reindex(self):
+        pass
+
+    def _sync_index(self):
+        pass
+
+    def index(self, val: ValueView) -> int:
+        return val.index
+
+    def predecessors(self) -> list[list[int]]:
+        start, ops = self.operand_start, self.operand_index
+        return [ops[start[i]:start[i + 1]].tolist() for i in range(len(self.opcodes))]
+
+    def successors(self) -> list[list[int]]:
+        succs: list[list[int]] = [[] for _ in range(len(self.opcodes))]
+        for j, i in self.dependencies():
+            succs[j].append(i)
+        return succs
+
+    def dependencies(self) -> list[tuple[int, int]]:
+        start, ops = self.operand_start, self.operand_index
+        return [(ops[k], i) for i in range(len(self.opcodes)) for k in range(start[i], start[i + 1])]
+
+    def carried_dependencies(self) -> list[tuple[int, int]]:
+        return [(nxt, i) for i, nxt in enumerate(self.nexts) if nxt >= 0]
+
+    def scheduled(self) -> bool:
+        return min(self.times, default=0) >= 0
+
+    def fixed_times(self) -> dict[int, int]:
+        phi = self._opcode_index["phi"]
+        return {i: (0 if code == phi else t) for i, (code, t) in enumerate(zip(self.opcodes, self.times)) if t >= 0 or code == phi}
+
+    def types(self) -> list[str]:
+        return [self.optypes[code] for code in self.opcodes]
+
+    def _widths(self) -> list[int]:
+        read = self._opcode_index["read"]
+        return [self.ports[ref].width if code == read else w for code, w, ref in zip(self.opcodes, self.widths, self.port_refs)]
+
+    def _set_schedule(self, ts: list[int], units: list[int | None] | None = None, latencies: list[int] | None = None):
+        self.times = array("i", ts)
+        self.units = array("i", [-1 if u is None else u for u in units] if units is not None else [-1] * len(ts))
+        for i in range(len(ts)):
+            self.extra.get(i, {}).pop("latency", None)
+            if latencies is not None and latencies[i] > 0:
+                self.extra.setdefault(i, {})["latency"] = latencies[i]
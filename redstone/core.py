@@ -1,7 +1,9 @@
 from __future__ import annotations
+import time
 from typing import Any
 from dataclasses import dataclass
-import gurobipy as grb
+from . import sched, solvers, stats
+from .oplib import DEFAULT_OPLIB, OpLib
 
 
 @dataclass(eq=False, frozen=True)
@@ -16,12 +18,14 @@ class Value:
     content: dict[Any, Any]
 
     @property
-    def predecessors(self) -> Any:
-        if self.type in {"add", "mul"}:
-            return self.content["operands"]
+    def predecessors(self) -> tuple[Value, ...]:
+        # NOTE: eq yields 1 bit, mux takes (1-bit select, value if set, value if clear), const holds content["constant"],
+        # slice takes content["width"] bits of its operand from bit content["lsb"], and shl shifts it left by content["amount"]
+        if self.type in {"add", "mul", "eq", "mux", "slice", "shl"}:
+            return tuple(self.content["operands"])
         if self.type in {"write", "store"}:
-            return self.content["value"]
-        return None
+            return (self.content["value"],)
+        return ()
 
 
 @dataclass(eq=False, frozen=True)
@@ -31,13 +35,61 @@ class Port:
     width: int
 
 
+class _Body(list):
+    # list of values which counts in-place edits other than appending,
+    # so that the dependency index knows when it has to be rebuilt
+    version: int = 0
+
+    def _edit(method):
+        def wrapper(self, *args, **kwargs):
+            self.version += 1
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    __setitem__ = _edit(list.__setitem__)
+    __delitem__ = _edit(list.__delitem__)
+    __imul__ = _edit(list.__imul__)
+    insert = _edit(list.insert)
+    pop = _edit(list.pop)
+    remove = _edit(list.remove)
+    clear = _edit(list.clear)
+    sort = _edit(list.sort)
+    reverse = _edit(list.reverse)
+    del _edit
+
+
+def _check_schedule(objective: str, solver: str, resources: dict[str, int] | None):
+    # raise NotImplementedError for schedule arguments no backend supports together, ValueError for bad limits
+    sched.check_resources(resources or {})
+    if objective not in {"ASAP", "ALAP"}:
+        raise NotImplementedError("Unsupported scheduling objective.")
+    if resources and objective != "ASAP":
+        raise NotImplementedError("Only ASAP objective supports resource constraints.")
+    if solver != "auto" and solver not in solvers.BACKENDS:
+        raise NotImplementedError(f"Unsupported scheduling solver: {solver}.")
+    if objective != "ASAP" and solver not in {"auto", "graph"}:
+        raise NotImplementedError(f"Unsupported scheduling objective for {solver}.")
+
+
 class BasicBlock:
     _name: str | None
-    _body: list[Value]
+    _body: _Body
+    _ii: int | None
+    # state kept by solver backends between schedule calls, e.g., a model to re-solve in place after small edits
+    _solver_cache: dict[str, Any]
+    # dependency index, built lazily and extended as values are appended to body
+    _val2idx: dict[Value, int]
+    _preds: list[list[int]]
+    _succs: list[list[int]]
+    _deps: list[tuple[int, int]]
+    _indexed_version: int
 
     def __init__(self, name: str | None = None):
         self._name = name
-        self._body = []
+        self._body = _Body()
+        self._ii = None
+        self._solver_cache = {}
+        self.reindex()
 
     @property
     def name(self) -> str | None:
@@ -49,7 +101,15 @@ class BasicBlock:
 
     @body.setter
     def body(self, new_body: list[Value]):
-        self._body = new_body
+        # NOTE: "block.body += values" assigns the same list back, which keeps the index
+        if new_body is not self._body:
+            self._body = _Body(new_body)
+            self.reindex()
+
+    @property
+    def ii(self) -> int | None:
+        # initiation interval if the block is a modulo-scheduled loop body
+        return self._ii
 
     def __repr__(self) -> str:
         return f"BasicBlock(name={self._name}, body={self._body})"
@@ -58,50 +118,221 @@ class BasicBlock:
         # check if all values in body have a fixed time
         return all(isinstance(val.content.get("time"), int) for val in self._body)
 
+    def release_model(self):
+        # dispose of the solver models kept from earlier schedule calls
+        solvers.release(self._solver_cache)
+
+    def reindex(self):
+        # drop the dependency index, e.g., after changing operands of values in place
+        self._val2idx = {}
+        self._preds = []
+        self._succs = []
+        self._deps = []
+        self._indexed_version = self._body.version
+
+    def _sync_index(self):
+        # index values appended since the last query, or rebuild after other edits
+        if self._indexed_version != self._body.version:
+            self.reindex()
+        start = len(self._preds)
+        if start == len(self._body):
+            return
+        new_vals = self._body[start:]
+        for idx, val in enumerate(new_vals, start):
+            self._val2idx[val] = idx
+            self._preds.append([])
+            self._succs.append([])
+        for idx, val in enumerate(new_vals, start):
+            for pred in val.predecessors:
+                pred_idx = self._val2idx[pred]
+                self._preds[idx].append(pred_idx)
+                self._succs[pred_idx].append(idx)
+                self._deps.append((pred_idx, idx))
+
+    def index(self, val: Value) -> int:
+        # return position of a value in body
+        self._sync_index()
+        return self._val2idx[val]
+
+    def predecessors(self) -> list[list[int]]:
+        # return producer indices of each value, which must not be modified
+        self._sync_index()
+        return self._preds
+
+    def successors(self) -> list[list[int]]:
+        # return consumer indices of each value, which must not be modified
+        self._sync_index()
+        return self._succs
+
     def dependencies(self) -> list[tuple[int, int]]:
         # return list of (producer_index, consumer_index) pairs
-        val2idx = {val: idx for idx, val in enumerate(self._body)}
-        deps = []
+        self._sync_index()
+        return list(self._deps)
+
+    def carried_dependencies(self) -> list[tuple[int, int]]:
+        # return list of (producer_index, phi_index) pairs crossing to the next loop iteration
+        # NOTE: a phi node takes content["next"] from the previous iteration
+        self._sync_index()
+        return [(self._val2idx[val.content["next"]], idx) for idx, val in enumerate(self._body) if val.type == "phi" and "next" in val.content]
+
+    def fixed_times(self) -> dict[int, int]:
+        # return {index: time} for values whose time is pinned
+        # NOTE: phi nodes are always at time 0
+        fixed = {}
+        for i, val in enumerate(self._body):
+            if val.type == "phi":
+                fixed[i] = 0
+            elif isinstance(val.content.get("time"), int):
+                fixed[i] = val.content["time"]
+        return fixed
+
+    def types(self) -> list[str]:
+        # return type of each value
+        return [val.type for val in self._body]
+
+    def _set_schedule(self, ts: list[int], units: list[int | None] | None = None, latencies: list[int] | None = None):
+        # write scheduled times, functional unit bindings and multi-cycle latencies back to values
         for idx, val in enumerate(self._body):
-            preds = val.predecessors
-            try:
-                for pred in preds:
-                    deps.append((val2idx[pred], idx))
-            except TypeError:
-                if preds is not None:
-                    deps.append((val2idx[preds], idx))
-        return deps
-
-    def schedule(self, objective: str = "ASAP", **grb_params):
+            val.content["time"] = ts[idx]
+            val.content.pop("unit", None)
+            val.content.pop("latency", None)
+            if units is not None and units[idx] is not None:
+                val.content["unit"] = units[idx]
+            if latencies is not None and latencies[idx] > 0:
+                val.content["latency"] = latencies[idx]
+
+    def _widths(self) -> list[int]:
+        return [val.content["from"].width if val.type == "read" else val.content.get("width", 0) for val in self._body]
+
+    def delays(self, oplib: OpLib = DEFAULT_OPLIB) -> list[float]:
+        # return combinational delay of each value in ns
+        return [oplib.delay(ty, width) for ty, width in zip(self.types(), self._widths())]
+
+    def latencies(self, oplib: OpLib = DEFAULT_OPLIB) -> list[int]:
+        # return number of cycles until the result of each value is ready
+        return [oplib.latency(ty, width) for ty, width in zip(self.types(), self._widths())]
+
+    def occupancy(self, oplib: OpLib = DEFAULT_OPLIB) -> list[int]:
+        # return number of time steps each value holds its functional unit
+        return [oplib.occupancy(ty, width) for ty, width in zip(self.types(), self._widths())]
+
+    def constraints(self, period: float | None = None, oplib: OpLib = DEFAULT_OPLIB) -> tuple[list[tuple[int, int]], list[int]]:
+        # return (deps, weights) where value j starts at least weights[k] steps after value i for deps[k] == (i, j)
+        # NOTE: a user starts no earlier than the latency of its operand
+        # NOTE: with a clock period, chains longer than the period are cut by registers
+        deps = self.dependencies()
+        latencies = self.latencies(oplib)
+        weights = [latencies[i] for i, _ in deps]
+        if period is not None:
+            # multi-cycle values end in a register, so they do not extend combinational chains
+            delays = [0.0 if lat else delay for delay, lat in zip(self.delays(oplib), latencies)]
+            cuts = sched.chain_cuts(len(self._body), deps, delays, period)
+            deps += cuts
+            weights += [1] * len(cuts)
+        return deps, weights
+
+    def mobility(self, period: float | None = None, oplib: OpLib = DEFAULT_OPLIB) -> list[int]:
+        # return ALAP - ASAP slack of each value under the minimum latency
+        n, fixed = len(self._body), self.fixed_times()
+        deps, weights = self.constraints(period, oplib)
+        latencies = self.latencies(oplib)
+        asap_ts = sched.asap(n, deps, fixed, weights)
+        horizon = max((t + lat for t, lat in zip(asap_ts, latencies)), default=0)
+        alap_ts = sched.alap(n, deps, fixed, horizon, weights, latencies)
+        return sched.mobility(asap_ts, alap_ts)
+
+    def schedule(
+        self,
+        objective: str = "ASAP",
+        solver: str = "auto",
+        resources: dict[str, int] | None = None,
+        period: float | None = None,
+        oplib: OpLib = DEFAULT_OPLIB,
+        workers: int | None = 1,
+        budget: float | None = None,
+        **solver_params
+    ):
         # NOTE: phi nodes are always at time 0
-        # NOTE: for simplicity, we don't consider resource constraints here
-        if objective == "ASAP":
-            model = grb.Model("ASAP Scheduling")
-            for k, v in grb_params.items():
-                model.setParam(k, v)
-            deps = self.dependencies()
-            n = len(self._body)
-            ts = model.addVars(n, vtype=grb.GRB.INTEGER, name="ts") # non-negative integers
-            total_time = model.addVar(vtype=grb.GRB.INTEGER, name="total_time")
-
-            model.addConstrs((total_time >= ts[i] for i in range(n)), name="total_time_def")
-            for i, val in enumerate(self._body):
-                if val.type == "phi":
-                    model.addConstr(ts[i] == 0, name=f"phi_node_{i}")
-                elif isinstance(val.content.get("time"), int):
-                    model.addConstr(ts[i] == val.content["time"], name=f"fixed_time_{i}")
-            model.addConstrs((ts[j] - ts[i] >= 0 for i, j in deps), name="deps")
-
-            model.setObjective(total_time, grb.GRB.MINIMIZE)
-            model.optimize()
-            if model.status == grb.GRB.OPTIMAL:
-                for i, val in enumerate(self._body):
-                    time_val = int(ts[i].X)
-                    val.content["time"] = time_val
+        # NOTE: resources limits how many values of a type, e.g., {"mul": 2}, share a time step
+        # NOTE: period is the target clock period in ns, values are chained only while their delays fit in it
+        # NOTE: oplib gives the delays, and the latencies of multi-cycle values
+        # NOTE: solver is a backend in solvers.BACKENDS, e.g., "graph", "gurobi" or "highs", or "auto" to pick one by
+        # problem size, and solver_params are passed to it, e.g., Gurobi params
+        # NOTE: with workers other than 1, independent parts of the block are solved apart in up to that many processes,
+        # or the number of CPUs if None, see parallel
+        # NOTE: budget is in wall-clock seconds, after which an ILP backend stops with the best schedule found so far,
+        # and the lower bound on the makespan and the gap to it are the counters "bound" and "gap" of the schedule pass
+        _check_schedule(objective, solver, resources)
+        if workers != 1:
+            from . import parallel
+            parallel.schedule_blocks([self], objective, solver, resources, period, oplib, workers, budget, **solver_params)
+            return
+        deadline = time.time() + budget if budget is not None else None
+        with stats.timed("schedule", block=self._name, values=len(self._body), solver=solver) as counters:
+            self._ii = None
+            problem, units = self._problem(resources, period, oplib)
+            if objective == "ALAP":
+                n, deps, weights, fixed = problem.n, problem.deps, problem.weights, problem.fixed
+                # sinks finish by the makespan of the ASAP schedule, multi-cycle ones start earlier
+                horizon = problem.makespan(problem.start)
+                backend, ts = "graph", sched.alap(n, deps, fixed, horizon, weights, problem.latencies)
+                bound = problem.makespan(ts)
             else:
-                raise RuntimeError("Scheduling optimization failed.")
-        else:
-            raise NotImplementedError("Unsupported scheduling objective.")
+                backend, ts, bound = solvers.solve(problem, solver, self._solver_cache, deadline, **solver_params)
+                if resources and backend != "graph":
+                    units = sched.bind_units(ts, problem.types, resources, problem.occupancy)
+            self._set_schedule(ts, units, problem.latencies)
+            counters["backend"] = backend
+            counters["dependencies"] = len(problem.deps)
+            counters["length"] = problem.makespan(ts) + 1
+            counters["bound"] = bound
+            counters["gap"] = solvers.gap(problem.makespan(ts), bound)
+
+    def _problem(
+        self,
+        resources: dict[str, int] | None = None,
+        period: float | None = None,
+        oplib: OpLib = DEFAULT_OPLIB
+    ) -> tuple[solvers.Problem, list[int | None] | None]:
+        # return the scheduling problem of the block, and the unit bindings of its heuristic schedule if resource-constrained
+        n, fixed = len(self._body), self.fixed_times()
+        deps, weights = self.constraints(period, oplib)
+        latencies = self.latencies(oplib)
+        if resources:
+            # list scheduling, optionally refined by an ILP backend with the list schedule as the start point
+            types, occupancy = self.types(), self.occupancy(oplib)
+            start, units = sched.list_schedule(n, deps, fixed, types, resources, weights, occupancy)
+            return solvers.Problem(n, deps, weights, latencies, fixed, start, types, resources, occupancy), units
+        # without resource constraints, ASAP/ALAP are longest-path passes over the DAG
+        start = sched.asap(n, deps, fixed, weights)
+        return solvers.Problem(n, deps, weights, latencies, fixed, start), None
+
+    def modulo_schedule(
+        self,
+        ii: int = 1,
+        resources: dict[str, int] | None = None,
+        period: float | None = None,
+        oplib: OpLib = DEFAULT_OPLIB
+    ) -> int:
+        # schedule the block as a loop body whose iterations start every ii time steps
+        # return the achieved initiation interval, which is the smallest feasible one not below ii
+        with stats.timed("modulo_schedule", block=self._name, values=len(self._body), target_ii=ii) as counters:
+            n, fixed = len(self._body), self.fixed_times()
+            deps, weights = self.constraints(period, oplib)
+            resources = resources or {}
+            types = self.types()
+            shared = [ty in resources for ty in types]
+            edges = [(i, j, w, 0) for (i, j), w in zip(deps, weights)]
+            edges += [(i, j, 1, 0) for i, j in sched.unit_chains(n, deps, shared)]
+            # the carried value is registered once ready, so it reaches the phi node of the next iteration one step later
+            latencies = self.latencies(oplib)
+            edges += [(i, j, latencies[i] + 1, 1) for i, j in self.carried_dependencies()]
+            achieved, ts, units = sched.modulo_schedule(n, edges, fixed, types, resources, ii, occupancy=self.occupancy(oplib))
+            self._set_schedule(ts, units, latencies)
+            self._ii = achieved
+            counters["ii"] = achieved
+            counters["length"] = max((t + lat for t, lat in zip(ts, latencies)), default=-1) + 1
+        return achieved
 
 
 class Function:
@@ -116,6 +347,10 @@ class Function:
         self._ports = []
         self._blocks = []
 
+    @property
+    def name(self) -> str | None:
+        return self._name
+
     @property
     def ports(self) -> list[Port]:
         return self._ports
@@ -132,6 +367,24 @@ class Function:
     def blocks(self, new_blocks: list[BasicBlock]):
         self._blocks = new_blocks
 
+    def schedule(
+        self,
+        objective: str = "ASAP",
+        solver: str = "auto",
+        resources: dict[str, int] | None = None,
+        period: float | None = None,
+        oplib: OpLib = DEFAULT_OPLIB,
+        workers: int | None = 1,
+        budget: float | None = None,
+        **solver_params
+    ):
+        # schedule every block as BasicBlock.schedule does, solving the independent parts of all blocks
+        # in up to `workers` processes, the number of CPUs if None, or in this process by default
+        # NOTE: budget is in wall-clock seconds for all blocks together
+        _check_schedule(objective, solver, resources)
+        from . import parallel
+        parallel.schedule_blocks(self._blocks, objective, solver, resources, period, oplib, workers, budget, **solver_params)
+
     def __repr__(self) -> str:
         repr_str = f"Function(name={self._name}, ports={self._ports}, blocks=[\n"
         for block in self._blocks:
@@ -1,7 +1,10 @@
 from __future__ import annotations
+import itertools
+import re
 from contextlib import contextmanager
-from dataclasses import dataclass, field
+from contextvars import ContextVar
 from typing import Any
+from .timeline import Timeline, TimelineError
 
 
 class Module:
@@ -9,13 +12,17 @@ class Module:
     ports: list[dict[str, Any]]
     instances: list[dict[str, Any]]
     top_region: Region
+    timeline: Timeline
     _current_region: Region
+    _tvar2node: dict[TVar, int]
 
     def __init__(self, name: str):
         self.name = name
         self.ports = []
         self.instances = []
         self.top_region = Region()
+        self.timeline = Timeline()
+        self._tvar2node = {TZERO: 0}
         self._current_region = self.top_region  # initialize current region to top region
 
     def __repr__(self) -> str:
@@ -24,24 +31,76 @@ class Module:
     def current_region(self) -> Region:
         return self._current_region
 
+    def tnode(self, tvar: TVar) -> int:
+        """
+        Return the timeline node of a time variable, adding it on first use.
+        """
+        node = self._tvar2node.get(tvar)
+        if node is None:
+            # start derived time variables where their definitions put them
+            if tvar._expr is None:
+                after = None
+            elif tvar._expr[0] == "add":
+                after = [(self.tnode(tvar._expr[1]), tvar._expr[2])]
+            else:
+                after = [(self.tnode(tvar._expr[1]), 0), (self.tnode(tvar._expr[2]), 0)]
+            node = self.timeline.add_node(repr(tvar), after)
+            self._tvar2node[tvar] = node
+        return node
+
+    def _readable(self, err: TimelineError) -> TimelineError:
+        # spell out the derived time variables in the constraints of err, e.g., T7 as TZERO+3
+        labels: dict[TVar, str] = {}
+        def label(tvar: TVar) -> str:
+            if tvar not in labels:
+                base, delay = tvar, 0
+                while base.name is None and base._expr is not None and base._expr[0] == "add":
+                    base, delay = base._expr[1], delay + base._expr[2]
+                if base.name is None and base._expr is not None:
+                    text = f"max({label(base._expr[1])}, {label(base._expr[2])})"
+                else:
+                    text = repr(base)
+                labels[tvar] = text + (f"{delay:+}" if delay else "")
+            return labels[tvar]
+        unnamed = {repr(tvar): tvar for tvar in self._tvar2node if tvar.name is None}
+        def replace(match: re.Match) -> str:
+            tvar = unnamed.get(match.group(0))
+            return match.group(0) if tvar is None else label(tvar)
+        return TimelineError([re.sub(r"\bT\d+\b", replace, c) for c in err.constraints])
+
+
+# working module of each thread or asyncio task, so that modules can be elaborated concurrently
+_working_module: ContextVar[Module | None] = ContextVar("working_module", default=None)
+
+def start_module(name: str = "top") -> Module:
+    """
+    Start a new working module in the current thread or asyncio task.
+    """
+    m = Module(name)
+    _working_module.set(m)
+    return m
 
-_working_module: Module | None = None
-
-def start_module(name: str = "top"):
+@contextmanager
+def module(name: str = "top"):
     """
-    Start a new working module.
+    Make a new module the working one within the with block, and restore the previous one afterwards, e.g.,
+        with rs.module("adder") as m:
+            a = rs.input(width=32, name="a")
     """
-    global _working_module
-    _working_module = Module(name)
+    token = _working_module.set(Module(name))
+    try:
+        yield _working_module.get()
+    finally:
+        _working_module.reset(token)
 
 def current_module() -> Module:
     """
-    Return the current working module.
+    Return the working module of the current thread or asyncio task.
     """
-    global _working_module
-    if _working_module is None:
-        raise RuntimeError("No working module. Please call start_module() first.")
-    return _working_module
+    m = _working_module.get()
+    if m is None:
+        raise RuntimeError("No working module. Please call start_module() or use module() first.")
+    return m
 
 
 """
@@ -71,33 +130,85 @@ def output_pulse(name: str | None = None) -> dict[str, Any]:
 class TVar:
     """
     Represents a time variable.
+    Operations add difference constraints to the timeline of the current module,
+    which raises TimelineError as soon as they become infeasible.
     """
+    _ids = itertools.count()   # unique across threads
+    name: str | None
+    _id: int
+    _expr: tuple[str, TVar, Any] | None    # ("add", tvar, delay) or ("max", a, b) if derived
+
+    def __init__(self, name: str | None = None, _expr: tuple[str, TVar, Any] | None = None):
+        self.name = name
+        self._id = next(TVar._ids)
+        self._expr = _expr
+
+    def __repr__(self) -> str:
+        return self.name or f"T{self._id}"
+
+    def _constrain(self, other: TVar, lower: int | None, upper: int | None, how: str):
+        # lower <= other - self <= upper
+        m = current_module()
+        u, v = m.tnode(self), m.tnode(other)
+        constraints = []
+        if upper is not None:
+            constraints.append((u, v, upper, f"{other!r} - {self!r} <= {upper} ({how})"))
+        if lower is not None:
+            constraints.append((v, u, -lower, f"{other!r} - {self!r} >= {lower} ({how})"))
+        try:
+            m.timeline.add_constraints(constraints)
+        except TimelineError as err:
+            raise m._readable(err) from None
+
     def __add__(self, delay: int) -> TVar:
-        return TVar()   # TODO: implement it
+        res = TVar(_expr=("add", self, delay))
+        self._constrain(res, delay, delay, "add")
+        return res
 
     @staticmethod
     def tmax(a: TVar, b: TVar) -> TVar:
-        return TVar()   # TODO: implement it
+        """
+        Return a time variable no earlier than both a and b.
+        It is exactly the later one if their distance is fixed by + and tset, e.g., tmax(t, t + 2) is t + 2.
+        Otherwise it is only a lower bound, e.g., with a.tbefore(b) it may still be later than b.
+        """
+        res = TVar(_expr=("max", a, b))
+        a._constrain(res, 0, None, "tmax")
+        b._constrain(res, 0, None, "tmax")
+        m = current_module()
+        # NOTE: a search for offsets implied by inequalities would cover the whole timeline,
+        # which makes building a chain of tmax quadratic
+        offset = m.timeline.known_offset(m.tnode(a), m.tnode(b))
+        if offset is not None:
+            (b if offset >= 0 else a)._constrain(res, 0, 0, "tmax")
+        return res
 
     def tset(self, other: TVar):
         """
         Force this TVar to be equal to another TVar.
         """
-        pass    # TODO: implement it
+        self._constrain(other, 0, 0, "tset")
 
     def tbefore(self, other: TVar):
         """
         Force this TVar to be before another TVar.
         """
-        pass    # TODO: implement it
+        self._constrain(other, 1, None, "tbefore")
 
     def tafter(self, other: TVar):
         """
         Force this TVar to be after another TVar.
         """
-        pass    # TODO: implement it
+        self._constrain(other, None, -1, "tafter")
 
-TZERO = TVar()  # time variable representing time 0, which means the start of everything, e.g., after reset
+    def offset(self, other: TVar) -> int | None:
+        """
+        Return other - self if the timeline fixes it, otherwise None.
+        """
+        m = current_module()
+        return m.timeline.offset(m.tnode(self), m.tnode(other))
+
+TZERO = TVar(name="TZERO")  # time variable representing time 0, which means the start of everything, e.g., after reset
 
 
 class Action:
@@ -105,7 +216,9 @@ class Action:
     Represents an action, which can be associated with a time variable or within a time range.
     An action can be a normal action or a control flow action.
     """
-    pass
+    region: Region | None = None    # region the action belongs to
+    time: TVar | None = None        # set by at().do or the at argument of control flow, otherwise the compiler picks the time
+    trange: tuple[TVar | None, TVar | None] | None = None  # set by within().do
 
 
 class LoopAction(Action):
@@ -145,6 +258,10 @@ class NormalAction(Action):
         if content is None:
             content = {}
         self.content = content
+        # actions created in a module belong to its current region, even without at().do
+        m = _working_module.get()
+        if m is not None:
+            m.current_region().add(self)
 
     def __repr__(self) -> str:
         return f"NormalAction(content={self.content})"
@@ -159,12 +276,16 @@ def loop(at: TVar | None = None):
     current_region = module.current_region()
     iter_start = TVar()
     next_iter_start = TVar()
+    if at is not None:
+        at._constrain(iter_start, 0, None, "loop")
+    iter_start._constrain(next_iter_start, 1, None, "loop")  # iterations advance by at least one step
     loop_body = Region()
     loop_action = LoopAction()
+    loop_action.time = at
     loop_action.iter_start = iter_start
     loop_action.next_iter_start = next_iter_start
     loop_action.body = loop_body
-    current_region.actions.append(loop_action)
+    current_region.add(loop_action)
     previous_region = module._current_region
     module._current_region = loop_body
     try:
@@ -224,7 +345,8 @@ def branch(*, condition: dict[str, Any], at: TVar | None = None):
     false_r = Region()
 
     act = BranchAction(condition=condition, true_region=true_r, false_region=false_r)
-    parent.actions.append(act)
+    act.time = at
+    parent.add(act)
 
     ctx = BranchContext(module=m, prev_region=parent, action=act)
 
@@ -252,7 +374,23 @@ class Value:
         return f"Value(name={self.name}, width={self.width})"
 
     def __getitem__(self, key: slice | int) -> Value:
-        return Value(width=self.width, name=self.name)  # TODO: implement slicing
+        """
+        Return a new value holding bits [start, stop) of this one, counted from the LSB,
+        e.g., instr[26:32] is the top 6 bits of a 32-bit instr.
+        The bits are taken from what this value holds at this point of the program.
+        """
+        if isinstance(key, int):
+            bit = key + self.width if key < 0 else key
+            key = slice(bit, bit + 1)
+        start, stop, step = key.indices(self.width)
+        if step != 1 or stop <= start:
+            raise IndexError(f"Unsupported slice {key} of a {self.width}-bit value.")
+        res = Value(stop - start, name=f"{self.name}[{start}:{stop}]" if self.name else None)
+        m = _working_module.get()
+        if m is not None:
+            m.current_region().values.append(res)
+        NormalAction({"type": "slice", "from": self, "lsb": start, "to": res})
+        return res
 
 
 def value(width: int, name: str | None = None) -> Value:
@@ -286,6 +424,17 @@ class Region:
     def __repr__(self) -> str:
         return f"Region(name={self.name}, tvars={self.tvars}, values={self.values}, actions={self.actions})"
 
+    def add(self, action: Action):
+        """
+        Move an action to the end of this region, unless it already belongs here.
+        """
+        if action.region is self:
+            return
+        if action.region is not None:
+            action.region.actions.remove(action)
+        action.region = self
+        self.actions.append(action)
+
 
 class At:
     tvar: TVar
@@ -296,7 +445,8 @@ class At:
     def do(self, *actions: Action):
         region = current_module().current_region()
         for action in actions:
-            region.actions.append(action)
+            action.time = self.tvar
+            region.add(action)
 
 
 def at(tvar: TVar) -> At:
@@ -310,7 +460,10 @@ class Within:
         self.trange = trange
 
     def do(self, actions: tuple[Action, ...] | Action):
-        pass
+        region = current_module().current_region()
+        for action in actions if isinstance(actions, tuple) else (actions,):
+            action.trange = self.trange
+            region.add(action)
 
 
 def within(tlower: TVar | None = None, tupper: TVar | None = None) -> Within:
@@ -339,7 +492,9 @@ def wait(event: Event, at: TVar) -> TVar:
     Wait for an event starting from a given time variable.
     Return a time variable indicating when the event is triggered.
     """
-    return TVar()   # TODO: implement it
+    triggered = TVar()
+    at._constrain(triggered, 0, None, "wait")   # unbounded, known only at run time
+    return triggered
 
 
 def instantiate(info: dict[str, Any]) -> dict[str, Any]:
@@ -350,11 +505,15 @@ def instantiate(info: dict[str, Any]) -> dict[str, Any]:
     return info
 
 
-@dataclass
 class SwitchAction(Action):
     selector: Value
-    cases: dict[Any, Region] = field(default_factory=dict)
-    default_region: Region | None = None
+    cases: dict[Any, Region]
+    default_region: Region | None
+
+    def __init__(self, selector: Value, cases: dict[Any, Region] | None = None, default_region: Region | None = None):
+        self.selector = selector
+        self.cases = cases if cases is not None else {}
+        self.default_region = default_region
 
     def __repr__(self) -> str:
         return f"SwitchAction(selector={self.selector}, cases={list(self.cases.keys())}, default_region={self.default_region})"
@@ -413,7 +572,8 @@ def switch(*, selector: Value, at: TVar | None = None):
     parent = m.current_region()
 
     act = SwitchAction(selector=selector)
-    parent.actions.append(act)
+    act.time = at
+    parent.add(act)
 
     ctx = SwitchContext(module=m, prev_region=parent, action=act)
 
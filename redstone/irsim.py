@@ -0,0 +1,105 @@
+"""
+Vectorized simulator of scheduled basic blocks, used as a golden model of the generated hardware.
+Every value is a NumPy array over a batch of stimulus vectors, so a block is interpreted once
+per loop iteration regardless of the batch size.
+"""
+from __future__ import annotations
+import numpy as np
+from .core import BasicBlock, Port, Value
+from .regalloc import ready
+
+
+def simulate(bb: BasicBlock, inputs: dict[str | Port, np.ndarray], iterations: int = 1) -> dict[str | Port, np.ndarray]:
+    """
+    Run `iterations` transactions of a scheduled block over a batch of stimulus vectors.
+    Transactions start every ii time steps if the block is modulo scheduled, otherwise each one starts
+    after the previous one is done, as when go is held high in the hardware from be.to_pyrtl.
+    inputs maps each input port, or its name, to an array of shape (batch,) holding the port value
+    in every time step, or (batch, steps) giving it per time step.
+    Return the trace of every output port by its name (or the port if unnamed), of shape (batch, steps),
+    where output buses are 0 and pulses are low in time steps they are not driven.
+    """
+    if not bb.scheduled():
+        raise RuntimeError("Scheduling required before simulation.")
+    body = list(bb.body)
+    ports = _ports(body)
+    max_time = max((ready(val) for val in body), default=0)
+    # NOTE: the counter FSM takes at least two cycles per transaction
+    ii = bb.ii or max(max_time + 1, 2)
+    steps = (iterations - 1) * ii + max_time + 1
+
+    # wide values fall back to Python integers, the rest wrap around in 64 bits before masking
+    dtype = np.uint64 if max((_width(val) for val in body if val.type != "write"), default=1) <= 64 else object
+    port2in: dict[Port, np.ndarray] = {}
+    batch = None
+    for port in ports:
+        if port.type.startswith("input"):
+            key = port.name if port.name in inputs else port
+            if key not in inputs:
+                raise KeyError(f"No stimulus for input port {port.name}.")
+            arr = np.asarray(inputs[key]).astype(dtype) & _mask(port.width, dtype)
+            port2in[port] = arr
+            batch = arr.shape[0] if batch is None else batch
+            if arr.shape[0] != batch:
+                raise ValueError("All stimulus arrays must have the same batch size.")
+    batch = batch or 1
+    traces = {port: np.zeros((batch, steps), dtype=dtype if port.type == "outputbus" else bool) for port in ports if port.type.startswith("output")}
+
+    carried: dict[Value, np.ndarray] = {}   # phi node -> value for the next iteration
+    for k in range(iterations):
+        env: dict[Value, np.ndarray] = {}
+        for val in body:
+            step = k * ii + val.content["time"]
+            if val.type == "phi":
+                init = np.full(batch, val.content.get("init", 0), dtype=dtype) & _mask(val.content["width"], dtype)
+                env[val] = carried.get(val, init)
+            elif val.type == "read":
+                arr = port2in[val.content["from"]]
+                env[val] = arr if arr.ndim == 1 else arr[:, step]
+            elif val.type in {"add", "mul"}:
+                lhs, rhs = (env[pred] for pred in val.content["operands"])
+                result = lhs + rhs if val.type == "add" else lhs * rhs
+                env[val] = result & _mask(val.content["width"], dtype)
+            elif val.type == "const":
+                env[val] = np.full(batch, val.content["constant"], dtype=dtype) & _mask(val.content["width"], dtype)
+            elif val.type == "eq":
+                lhs, rhs = (env[pred] for pred in val.content["operands"])
+                env[val] = (lhs == rhs).astype(dtype)
+            elif val.type == "mux":
+                sel, lhs, rhs = (env[pred] for pred in val.content["operands"])
+                env[val] = np.where(sel != 0, lhs, rhs).astype(dtype) & _mask(val.content["width"], dtype)
+            elif val.type == "slice":
+                shift = np.uint64(val.content["lsb"]) if dtype is np.uint64 else val.content["lsb"]
+                env[val] = (env[val.content["operands"][0]] >> shift) & _mask(val.content["width"], dtype)
+            elif val.type == "shl":
+                shift = np.uint64(val.content["amount"]) if dtype is np.uint64 else val.content["amount"]
+                env[val] = (env[val.content["operands"][0]] << shift) & _mask(val.content["width"], dtype)
+            elif val.type == "write":
+                port = val.content["to"]
+                traces[port][:, step] = env[val.content["value"]] & _mask(port.width, dtype)
+            elif val.type == "emit":
+                traces[val.content["to"]][:, step] = True
+        for val in body:
+            if val.type == "phi" and "next" in val.content:
+                carried[val] = env[val.content["next"]]
+    return {port.name or port: trace for port, trace in traces.items()}
+
+
+def _ports(body: list[Value]) -> list[Port]:
+    # ports touched by the block, in order of first use
+    ports: dict[Port, None] = {}
+    for val in body:
+        for key in ("from", "to"):
+            if key in val.content:
+                ports[val.content[key]] = None
+    return list(ports)
+
+
+def _mask(width: int, dtype) -> np.uint64 | int:
+    return np.uint64((1 << width) - 1) if dtype is np.uint64 else (1 << width) - 1
+
+
+def _width(val: Value) -> int:
+    if val.type == "read":
+        return val.content["from"].width
+    return val.content.get("width", 1)
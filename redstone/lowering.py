@@ -0,0 +1,331 @@
+"""
+Lowering of frontend modules into the core IR.
+Branches and switches are if-converted: every region is computed speculatively and the values
+assigned in them are merged by mux values, so that the loop body becomes a single basic block.
+Pure operators are hash-consed, so that identical computations, e.g., pc + 4 in several switch cases,
+are built as one value.
+"""
+from __future__ import annotations
+from typing import Any
+from . import fe, stats
+from .core import BasicBlock, Function, Port, Value
+
+
+# operators whose operands can be swapped
+_COMMUTATIVE = {"add", "mul", "eq"}
+
+# conjunction of (select, polarity) literals under which an action takes effect, empty if always
+_Guard = tuple[tuple[Value, bool], ...]
+
+
+def lower(module: fe.Module | None = None) -> Function:
+    """
+    Lower a module, the working one by default, into a function of one basic block.
+    The block is one iteration of the top-level loop, with time 0 at the start of the iteration,
+    and frontend values assigned in the loop are carried by phi nodes, initialized by the constant
+    drives before the loop. A module without a loop is lowered as a single transaction from TZERO.
+    Actions given a time by at() are pinned to their offset from the start, the scheduler places the others.
+    A branch or switch given a time by its at argument decides there, i.e., its selects are pinned to it.
+    """
+    if module is None:
+        module = fe.current_module()
+    with stats.timed("lower", module=module.name) as counters:
+        lowering = _Lowering(module)
+        func = lowering.run()
+        counters.update(values=len(func.blocks[0].body), merged=lowering.merged)
+    return func
+
+
+def initiation_interval(module: fe.Module) -> int | None:
+    """
+    Return the fixed distance between iterations of the top-level loop, e.g., to modulo schedule the lowered block.
+    """
+    loop = _top_loop(module)
+    if loop is None:
+        return None
+    return module.timeline.offset(module.tnode(loop.iter_start), module.tnode(loop.next_iter_start))
+
+
+class _Lowering:
+    module: fe.Module
+    func: Function
+    body: list[Value]
+    # pure values by (type, width, time, operands, attributes), to build each computation once
+    table: dict[tuple[Any, ...], Value]
+    # number of values found in table instead of being built again
+    merged: int
+    # drives of output buses and pulses by (port, time), in program order, with their guards
+    writes: dict[tuple[Port, int | None], list[tuple[_Guard, Value]]]
+    emits: dict[tuple[Port, int | None], list[_Guard]]
+
+    def __init__(self, module: fe.Module):
+        self.module = module
+        self.func = Function(module.name)
+        self._ports: dict[int, Port] = {}   # id of frontend port dict -> core port
+        for port in module.ports:
+            core_port = Port(port["name"], port["direction"] + port["type"], port.get("width", 1))
+            self._ports[id(port)] = core_port
+            self.func.ports.append(core_port)
+        self.body = []
+        self.table = {}
+        self.merged = 0
+        self.writes = {}
+        self.emits = {}
+        self._origin = fe.TZERO
+
+    def run(self) -> Function:
+        top = self.module.top_region
+        loop = _top_loop(self.module)
+        env: dict[fe.Value, Value] = {}
+        phis: dict[fe.Value, Value] = {}
+        if loop is None:
+            self.region(top, env, ())
+        else:
+            if loop.time is not None and self.module.timeline.offset(self.module.tnode(fe.TZERO), self.module.tnode(loop.time)) is None:
+                raise NotImplementedError(f"Loop start {loop.time!r} is not a fixed offset from TZERO, e.g., it follows a wait.")
+            init: dict[fe.Value, int] = {}
+            for action in top.actions:
+                if action is loop:
+                    continue
+                content = getattr(action, "content", {})
+                if content.get("type") != "drive" or not isinstance(content.get("from"), int) or not isinstance(content.get("to"), fe.Value):
+                    raise NotImplementedError("Only constant initialization of values is supported outside the loop.")
+                init[content["to"]] = content["from"]
+            self._origin = loop.iter_start
+            for var in _assigned(loop.body):
+                phis[var] = Value("phi", False, {"width": var.width, "init": init.get(var, 0) & ((1 << var.width) - 1)})
+            for var, constant in init.items():
+                env[var] = phis.get(var) or self.const(constant, var.width)
+            self.region(loop.body, env, ())
+            for var, phi in phis.items():
+                if env[var] is not phi:
+                    phi.content["next"] = env[var]
+        effects = self.effects()
+
+        # phi nodes of values that are assigned before they are used in every iteration carry nothing
+        used = {pred for val in self.body + effects for pred in val.predecessors}
+        used.update(phi.content["next"] for phi in phis.values() if "next" in phi.content)
+        bb = BasicBlock(self.module.name)
+        bb.body = [phi for phi in phis.values() if phi in used] + self.body + effects
+        self.func.blocks.append(bb)
+        return self.func
+
+    def region(self, region: fe.Region, env: dict[fe.Value, Value], guard: _Guard):
+        # lower the actions of a region in program order, updating env with the values assigned
+        for action in region.actions:
+            if isinstance(action, fe.NormalAction):
+                self.action(action, env, guard)
+            elif isinstance(action, fe.BranchAction):
+                self.branch(action, env, guard)
+            elif isinstance(action, fe.SwitchAction):
+                self.switch(action, env, guard)
+            elif isinstance(action, fe.LoopAction):
+                raise NotImplementedError("Only a single top-level loop is supported.")
+            else:
+                raise NotImplementedError(f"Unsupported action: {type(action).__name__}.")
+
+    def action(self, action: fe.NormalAction, env: dict[fe.Value, Value], guard: _Guard):
+        content = action.content
+        ty = content.get("type")
+        time = self.time(action)
+        if ty == "sample":
+            env[content["to"]] = self.read(self.port(content["from"]), time)
+        elif ty == "drive":
+            dest = content["to"]
+            if isinstance(dest, fe.Value):
+                env[dest] = self.operand(content["from"], env, dest.width)
+            else:
+                port = self.port(dest)
+                self.writes.setdefault((port, time), []).append((guard, self.operand(content["from"], env, port.width)))
+        elif ty == "emit":
+            self.emits.setdefault((self.port(content["pulse"]), time), []).append(guard)
+        elif ty == "slice":
+            dest = content["to"]
+            env[dest] = self.op("slice", [self.use(env, content["from"])], dest.width, time, lsb=content["lsb"])
+        elif ty in {"add", "mul", "bool_eq"}:
+            dest = content["to"]
+            # constant operands take the width of the others
+            operand_width = max((x.width for x in content["operands"] if isinstance(x, fe.Value)), default=dest.width)
+            operands = [self.operand(x, env, operand_width) for x in content["operands"]]
+            if ty == "bool_eq":
+                env[dest] = self.op("eq", operands, 1, time)
+            else:
+                env[dest] = self.op(ty, operands, content.get("width", dest.width), time)
+        else:
+            raise NotImplementedError(f"Unsupported action type: {ty}.")
+
+    def branch(self, action: fe.BranchAction, env: dict[fe.Value, Value], guard: _Guard):
+        if action.condition.get("type") != "bool":
+            raise NotImplementedError(f"Unsupported condition type: {action.condition.get('type')}.")
+        cond = action.condition["value"]
+        if not isinstance(cond, fe.Value):
+            # decided during elaboration, e.g., by a comparison of Python objects
+            self.region(action.true_region if cond else action.false_region, env, guard)
+            return
+        sel, polarity = self.truth(self.use(env, cond), self.time(action))
+        true_env, false_env = dict(env), dict(env)
+        self.region(action.true_region, true_env, guard + ((sel, polarity),))
+        self.region(action.false_region, false_env, guard + ((sel, not polarity),))
+        if polarity:
+            self.merge(env, [(sel, true_env)], false_env)
+        else:
+            self.merge(env, [(sel, false_env)], true_env)
+
+    def switch(self, action: fe.SwitchAction, env: dict[fe.Value, Value], guard: _Guard):
+        selector = self.use(env, action.selector)
+        width = _width(selector)
+        time = self.time(action)
+        cases: list[tuple[Value, dict[fe.Value, Value]]] = []
+        for key, region in action.cases.items():
+            if not isinstance(key, int):
+                raise NotImplementedError(f"Unsupported case value: {key!r}.")
+            hit = self.op("eq", [selector, self.const(key, width)], 1, time)
+            case_env = dict(env)
+            self.region(region, case_env, guard + ((hit, True),))
+            cases.append((hit, case_env))
+        default_env = dict(env)
+        if action.default_region is not None:
+            self.region(action.default_region, default_env, guard + tuple((hit, False) for hit, _ in cases))
+        self.merge(env, cases, default_env)
+
+    def merge(self, env: dict[fe.Value, Value], cases: list[tuple[Value, dict[fe.Value, Value]]], default_env: dict[fe.Value, Value]):
+        # select the value of each variable from the first case whose select is set, or from default_env
+        # NOTE: a variable left unassigned on some paths takes any assigned value there
+        variables = dict.fromkeys(default_env)
+        for _, case_env in cases:
+            variables.update(dict.fromkeys(case_env))
+        for var in variables:
+            result = default_env.get(var)
+            for sel, case_env in reversed(cases):
+                val = case_env.get(var, result)
+                result = val if result is None or val is None else self.mux(sel, val, result, var.width)
+            env[var] = result
+
+    def effects(self) -> list[Value]:
+        # one write per output bus and time step, taking the last drive whose guard holds, 0 as an undriven bus
+        effects: list[Value] = []
+        for (port, time), drives in self.writes.items():
+            value = None
+            for guard, val in drives:
+                cond = self.condition(guard)
+                if cond is None:
+                    value = val
+                else:
+                    value = self.mux(cond, val, value if value is not None else self.const(0, port.width), port.width)
+            effects.append(Value("write", True, _timed({"value": value, "to": port}, time)))
+        for (port, time), guards in self.emits.items():
+            if all(guards):
+                raise NotImplementedError(f"Conditional pulse {port.name} is not supported.")
+            effects.append(Value("emit", True, _timed({"to": port}, time)))
+        return effects
+
+    def condition(self, guard: _Guard) -> Value | None:
+        # 1-bit value set when every literal of the guard holds, None if the guard always holds
+        cond = None
+        for sel, polarity in guard:
+            lit = sel if polarity else self.mux(sel, self.const(0, 1), self.const(1, 1), 1)
+            cond = lit if cond is None else self.mux(cond, lit, self.const(0, 1), 1)
+        return cond
+
+    def truth(self, val: Value, time: int | None = None) -> tuple[Value, bool]:
+        # 1-bit select and the polarity in which it means the value is nonzero, computed at time if given
+        if _width(val) == 1 and time is None:
+            return val, True
+        return self.op("eq", [val, self.const(0, _width(val))], 1, time), False
+
+    def time(self, action: fe.Action) -> int | None:
+        # time step of an action from the start of the iteration, None if left to the scheduler
+        if action.trange is not None:
+            raise NotImplementedError("Time ranges given by within() are not supported.")
+        if action.time is None:
+            return None
+        t = self.module.timeline.offset(self.module.tnode(self._origin), self.module.tnode(action.time))
+        if t is None or t < 0:
+            raise NotImplementedError(f"Time {action.time!r} is not a fixed offset from {self._origin!r}, e.g., it follows a wait.")
+        return t
+
+    def port(self, port: dict[str, Any]) -> Port:
+        core_port = self._ports.get(id(port))
+        if core_port is None:
+            raise RuntimeError(f"Port {port.get('name')} does not belong to module {self.module.name}.")
+        return core_port
+
+    def use(self, env: dict[fe.Value, Value], var: fe.Value) -> Value:
+        val = env.get(var)
+        if val is None:
+            raise RuntimeError(f"{var!r} is used before it is assigned.")
+        return val
+
+    def operand(self, x: fe.Value | int, env: dict[fe.Value, Value], width: int) -> Value:
+        if isinstance(x, fe.Value):
+            return self.use(env, x)
+        if isinstance(x, int):
+            return self.const(x, width)
+        raise NotImplementedError(f"Unsupported operand: {x!r}.")
+
+    def const(self, constant: int, width: int) -> Value:
+        constant &= (1 << width) - 1
+        return self.value("const", {"constant": constant, "width": width}, ("const", width, constant))
+
+    def read(self, port: Port, time: int | None) -> Value:
+        # reads of a port in the same time step see the same data, the scheduler may place others apart
+        return self.value("read", _timed({"from": port}, time), ("read", port, time) if time is not None else None)
+
+    def mux(self, sel: Value, lhs: Value, rhs: Value, width: int) -> Value:
+        if lhs is rhs:
+            return lhs
+        return self.op("mux", [sel, lhs, rhs], width)
+
+    def op(self, ty: str, operands: list[Value], width: int, time: int | None = None, **attrs) -> Value:
+        key = (ty, width, time, frozenset(operands) if ty in _COMMUTATIVE else tuple(operands), *sorted(attrs.items()))
+        return self.value(ty, _timed({"width": width, "operands": operands, **attrs}, time), key)
+
+    def value(self, ty: str, content: dict[str, Any], key: tuple[Any, ...] | None) -> Value:
+        # return the value built earlier for key, or build it
+        if key is not None:
+            val = self.table.get(key)
+            if val is not None:
+                self.merged += 1
+                return val
+        val = Value(ty, False, content)
+        if key is not None:
+            self.table[key] = val
+        self.body.append(val)
+        return val
+
+
+def _top_loop(module: fe.Module) -> fe.LoopAction | None:
+    loops = [action for action in module.top_region.actions if isinstance(action, fe.LoopAction)]
+    if len(loops) > 1:
+        raise NotImplementedError("Only a single top-level loop is supported.")
+    return loops[0] if loops else None
+
+
+def _assigned(region: fe.Region) -> dict[fe.Value, None]:
+    # frontend values assigned anywhere in a region, in order of first assignment
+    assigned: dict[fe.Value, None] = {}
+    for action in region.actions:
+        if isinstance(action, fe.NormalAction):
+            if isinstance(action.content.get("to"), fe.Value):
+                assigned[action.content["to"]] = None
+        elif isinstance(action, fe.BranchAction):
+            assigned.update(_assigned(action.true_region))
+            assigned.update(_assigned(action.false_region))
+        elif isinstance(action, fe.SwitchAction):
+            for case_region in action.cases.values():
+                assigned.update(_assigned(case_region))
+            if action.default_region is not None:
+                assigned.update(_assigned(action.default_region))
+    return assigned
+
+
+def _timed(content: dict[str, Any], time: int | None) -> dict[str, Any]:
+    if time is not None:
+        content["time"] = time
+    return content
+
+
+def _width(val: Value) -> int:
+    if val.type == "read":
+        return val.content["from"].width
+    return val.content["width"]
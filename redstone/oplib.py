@@ -0,0 +1,59 @@
+"""
+Operator library: characterization of each value type for scheduling.
+"""
+from __future__ import annotations
+from typing import Callable
+
+
+class OpLib:
+    """
+    Maps a value type and bitwidth to its combinational delay in ns and its latency in cycles.
+    A value with latency L that starts at time t has its result ready at time t + L.
+    A pipelined unit accepts new operands every cycle, otherwise it stays busy until its result is ready.
+    Types without an entry, e.g., read, write and const, take no time.
+    """
+    _delays: dict[str, Callable[[int], float]]
+    _latencies: dict[str, Callable[[int], int]]
+    _pipelined: dict[str, bool]
+
+    def __init__(
+        self,
+        delays: dict[str, Callable[[int], float]] | None = None,
+        latencies: dict[str, Callable[[int], int]] | None = None,
+        pipelined: dict[str, bool] | None = None
+    ):
+        self._delays = {
+            # rough figures for a mid-range FPGA fabric
+            "add": lambda width: 0.5 + 0.03 * width,    # carry chain
+            "mul": lambda width: 1.5 + 0.15 * width,    # DSP cascade
+            "eq": lambda width: 0.4,                    # comparator tree, width is that of the 1-bit result
+            "mux": lambda width: 0.3,                   # one LUT level per bit
+        }
+        if delays:
+            self._delays.update(delays)
+        # every type is combinational unless given a latency, e.g., {"mul": lambda width: 3 if width > 18 else 0}
+        self._latencies = dict(latencies or {})
+        self._pipelined = {"add": True, "mul": True}
+        if pipelined:
+            self._pipelined.update(pipelined)
+
+    def delay(self, type: str, width: int) -> float:
+        model = self._delays.get(type)
+        return model(width) if model else 0.0
+
+    def latency(self, type: str, width: int) -> int:
+        model = self._latencies.get(type)
+        return model(width) if model else 0
+
+    def pipelined(self, type: str) -> bool:
+        return self._pipelined.get(type, False)
+
+    def occupancy(self, type: str, width: int) -> int:
+        """
+        Number of time steps a value of this type holds its functional unit.
+        """
+        latency = self.latency(type, width)
+        return 1 if latency == 0 or self.pipelined(type) else latency
+
+
+DEFAULT_OPLIB = OpLib()
@@ -0,0 +1,325 @@
+"""
+Optimization passes over basic blocks, run after lowering and before scheduling, e.g.,
+    func = rs.lower(m)
+    opt.optimize(func.blocks[0])    # fold constants, drop dead values, narrow widths
+    func.blocks[0].schedule()
+Every value left in a block becomes a solver variable and a piece of hardware, so that
+the passes shrink both the scheduling problem and the netlist.
+"""
+from __future__ import annotations
+from typing import Any
+from . import stats
+from .core import BasicBlock, Value
+
+
+# types whose width is chosen by the compiler, unlike reads which take that of their port
+_NARROWABLE = {"phi", "const", "add", "mul", "mux", "slice", "shl"}
+# types kept for their effect on ports, even though nothing uses them
+_EFFECTS = {"write", "store", "emit"}
+
+
+def optimize(bb: BasicBlock):
+    """
+    Run the passes of this module on a block in place, in the order they help each other:
+    folding exposes dead values, and fewer users leave fewer demanded bits.
+    """
+    with stats.timed("optimize", block=bb.name, values=len(bb.body)) as counters:
+        fold_constants(bb)
+        eliminate_dead_values(bb)
+        narrow_widths(bb)
+        counters["values_after"] = len(bb.body)
+
+
+def fold_constants(bb: BasicBlock) -> int:
+    """
+    Replace values of an unscheduled block by simpler ones, and return how many were replaced:
+    operators of constants by constants, x + 0, x * 1 and mux(s, x, x) by x, x * 0 by 0,
+    x * 2^k by a left shift, muxes of a constant select by the selected value, and phi nodes
+    that never change by their initial value.
+    Replaced values leave the block, values they used stay until eliminate_dead_values.
+    """
+    with stats.timed("fold_constants", block=bb.name, values=len(bb.body)) as counters:
+        folded = 0
+        while True:
+            count = _Folder(bb).run()
+            if count == 0:
+                break
+            folded += count
+        counters["folded"] = folded
+    return folded
+
+
+def eliminate_dead_values(bb: BasicBlock) -> int:
+    """
+    Remove the values of a block with no path to a write, store or emit, and return how many were removed.
+    """
+    with stats.timed("eliminate_dead_values", block=bb.name, values=len(bb.body)) as counters:
+        body = list(bb.body)
+        live: set[Value] = set()
+        stack = [val for val in body if val.void or val.type in _EFFECTS]
+        while stack:
+            val = stack.pop()
+            if val in live:
+                continue
+            live.add(val)
+            stack.extend(val.predecessors)
+            if val.type == "phi" and "next" in val.content:
+                stack.append(val.content["next"])
+        removed = len(body) - len(live)
+        if removed:
+            bb.body = [val for val in body if val in live]
+        counters["removed"] = removed
+    return removed
+
+
+def infer_widths(bb: BasicBlock) -> dict[Value, int]:
+    """
+    Return the minimum width of every narrowable value of a block that keeps the port outputs the same.
+    Value ranges propagate forward from ports and constants, bounding the bits a value can hold,
+    and demanded bits propagate backward from writes, since the low bits of a sum or product only depend
+    on the low bits of its operands. The range or demand of a phi node that keeps growing across iterations
+    is widened to its full width, so that both analyses finish in a few passes.
+    """
+    body = list(bb.body)
+    phis = [val for val in body if val.type == "phi" and "next" in val.content]
+
+    # forward: the largest unsigned number each value can hold
+    bound: dict[Value, int] = {val: val.content.get("init", 0) for val in body if val.type == "phi"}
+    while True:
+        for val in body:
+            if val.type != "phi":
+                _forward(val, bound)
+        grown = [phi for phi in phis if bound[phi.content["next"]] > bound[phi]]
+        for phi in grown:
+            bound[phi] = _mask(phi.content["width"])
+        if not grown:
+            break
+
+    # backward: the number of low bits of each value read by its users
+    demand: dict[Value, int] = {val: 0 for val in body}
+    first = True
+    while True:
+        for val in reversed(body):
+            _backward(val, demand)
+        grown = [phi for phi in phis if demand[phi.content["next"]] < demand[phi]]
+        for phi in grown:
+            # the first pass gives the demand within one iteration, later ones only cross back edges
+            demand[phi.content["next"]] = demand[phi] if first else _width(phi.content["next"])
+        if not grown:
+            break
+        first = False
+
+    return {
+        val: max(1, min(val.content["width"], bound[val].bit_length(), demand[val]))
+        for val in body if val.type in _NARROWABLE
+    }
+
+
+def narrow_widths(bb: BasicBlock) -> int:
+    """
+    Narrow the values of a block in place to the widths given by infer_widths,
+    which also narrows the registers and functional units built for them.
+    Return the number of bits saved over all values.
+    """
+    with stats.timed("narrow_widths", block=bb.name, values=len(bb.body)) as counters:
+        saved = 0
+        narrowed = 0
+        for val, width in infer_widths(bb).items():
+            if width < val.content["width"]:
+                saved += val.content["width"] - width
+                narrowed += 1
+                val.content["width"] = width
+                for key in ("init", "constant"):
+                    if key in val.content:
+                        val.content[key] &= _mask(width)
+        counters.update(narrowed=narrowed, bits_saved=saved)
+    return saved
+
+
+def _forward(val: Value, bound: dict[Value, int]):
+    ty = val.type
+    if ty == "read":
+        bound[val] = _mask(val.content["from"].width)
+    elif ty == "const":
+        bound[val] = val.content["constant"]
+    elif ty == "eq":
+        bound[val] = 1
+    elif ty in {"add", "mul", "mux", "slice", "shl"}:
+        operands = [bound[pred] for pred in val.content["operands"]]
+        if ty == "add":
+            result = operands[0] + operands[1]
+        elif ty == "mul":
+            result = operands[0] * operands[1]
+        elif ty == "mux":
+            result = max(operands[1], operands[2])
+        elif ty == "slice":
+            result = operands[0] >> val.content["lsb"]
+        else:
+            result = operands[0] << val.content["amount"]
+        # a result that may not fit wraps around to anything within the width
+        bound[val] = min(result, _mask(val.content["width"]))
+    elif "width" in val.content:
+        bound[val] = _mask(val.content["width"])
+
+
+def _backward(val: Value, demand: dict[Value, int]):
+    ty = val.type
+    need = min(demand[val], _width(val)) if ty not in {"write", "store", "emit"} else 0
+    if ty == "write":
+        _demand(demand, val.content["value"], val.content["to"].width)
+    elif ty == "store":
+        _demand(demand, val.content["value"], _width(val.content["value"]))
+    elif need == 0:
+        return
+    elif ty in {"add", "mul"}:
+        for pred in val.content["operands"]:
+            _demand(demand, pred, need)
+    elif ty == "mux":
+        sel, lhs, rhs = val.content["operands"]
+        _demand(demand, sel, 1)
+        _demand(demand, lhs, need)
+        _demand(demand, rhs, need)
+    elif ty == "slice":
+        (pred,) = val.content["operands"]
+        _demand(demand, pred, val.content["lsb"] + need)
+    elif ty == "shl":
+        (pred,) = val.content["operands"]
+        _demand(demand, pred, max(need - val.content["amount"], 0))
+    else:
+        # e.g., eq compares every bit
+        for pred in val.predecessors:
+            _demand(demand, pred, _width(pred))
+
+
+def _demand(demand: dict[Value, int], val: Value, bits: int):
+    if bits > demand[val]:
+        demand[val] = bits
+
+
+class _Folder:
+    # one forward pass of fold_constants, which rebuilds the body with replaced operands
+    bb: BasicBlock
+    body: list[Value]
+    # replaced value -> its replacement, which is never replaced itself
+    repl: dict[Value, Value]
+    # constants in the new body by (width, constant)
+    consts: dict[tuple[int, int], Value]
+
+    def __init__(self, bb: BasicBlock):
+        self.bb = bb
+        self.body = []
+        self.repl = {}
+        self.consts = {}
+
+    def run(self) -> int:
+        old_body = list(self.bb.body)
+        for val in old_body:
+            content = val.content
+            if "operands" in content:
+                content["operands"] = [self.repl.get(pred, pred) for pred in content["operands"]]
+            if "value" in content:
+                content["value"] = self.repl.get(content["value"], content["value"])
+            new = self.fold(val)
+            if new is val:
+                self.body.append(val)
+                if val.type == "const":
+                    # reused by later folds, which keeps operands ahead of their users
+                    self.consts.setdefault((val.content["width"], val.content["constant"]), val)
+            else:
+                self.repl[val] = new
+        for val in self.body:
+            if val.type == "phi" and "next" in val.content:
+                val.content["next"] = self.repl.get(val.content["next"], val.content["next"])
+        if self.repl or len(self.body) != len(old_body):
+            self.bb.body = self.body
+        return len(self.repl)
+
+    def fold(self, val: Value) -> Value:
+        # return the simplest equivalent of a value, built into the body if new
+        ty = val.type
+        if ty == "phi":
+            init = val.content.get("init", 0)
+            next_val = val.content.get("next", val)
+            if next_val is val or (next_val.type == "const" and next_val.content["constant"] == init & _mask(val.content["width"])):
+                return self.const(init, val.content["width"])
+            return val
+        if ty not in {"add", "mul", "eq", "mux", "slice", "shl"}:
+            return val
+        width = val.content["width"]
+        operands = val.content["operands"]
+        if all(pred.type == "const" for pred in operands):
+            return self.const(_evaluate(val, [pred.content["constant"] for pred in operands]), width)
+        if ty in {"add", "mul"}:
+            lhs, rhs = operands
+            if lhs.type == "const":
+                lhs, rhs = rhs, lhs
+            if rhs.type != "const":
+                return val
+            c = rhs.content["constant"]
+            if ty == "add" and c == 0 or ty == "mul" and c == 1:
+                return self.resize(lhs, width, val)
+            if ty == "mul" and c == 0:
+                return self.const(0, width)
+            if ty == "mul" and c & (c - 1) == 0:
+                return self.new("shl", {"width": width, "operands": [lhs], "amount": c.bit_length() - 1}, val)
+        elif ty == "mux":
+            sel, lhs, rhs = operands
+            if sel.type == "const":
+                return self.resize(lhs if sel.content["constant"] else rhs, width, val)
+            if lhs is rhs:
+                return self.resize(lhs, width, val)
+        elif ty == "eq":
+            if operands[0] is operands[1]:
+                return self.const(1, 1)
+        elif ty == "slice":
+            if val.content["lsb"] == 0 and _width(operands[0]) <= width:
+                return operands[0]
+        return val
+
+    def resize(self, val: Value, width: int, orig: Value) -> Value:
+        # val as a value of the given width, which is zero-extended by its users if narrower
+        if _width(val) <= width:
+            return val
+        return self.new("slice", {"width": width, "operands": [val], "lsb": 0}, orig)
+
+    def const(self, constant: int, width: int) -> Value:
+        constant &= _mask(width)
+        val = self.consts.get((width, constant))
+        if val is None:
+            val = Value("const", False, {"constant": constant, "width": width})
+            self.consts[width, constant] = val
+            self.body.append(val)
+        return val
+
+    def new(self, ty: str, content: dict[str, Any], orig: Value) -> Value:
+        # a value built in place of orig, pinned to the same time if orig was
+        if "time" in orig.content:
+            content["time"] = orig.content["time"]
+        val = Value(ty, False, content)
+        self.body.append(val)
+        return val
+
+
+def _evaluate(val: Value, operands: list[int]) -> int:
+    ty = val.type
+    if ty == "add":
+        return operands[0] + operands[1]
+    if ty == "mul":
+        return operands[0] * operands[1]
+    if ty == "eq":
+        return int(operands[0] == operands[1])
+    if ty == "mux":
+        return operands[1] if operands[0] else operands[2]
+    if ty == "slice":
+        return operands[0] >> val.content["lsb"]
+    return operands[0] << val.content["amount"]
+
+
+def _mask(width: int) -> int:
+    return (1 << width) - 1
+
+
+def _width(val: Value) -> int:
+    if val.type == "read":
+        return val.content["from"].width
+    return val.content["width"]
@@ -0,0 +1,124 @@
+"""
+Scheduling of many blocks, and of the independent parts of each block, across processes, e.g.,
+    func = rs.lower(m)
+    func.schedule(solver="gurobi", resources={"mul": 2}, workers=8)
+Every block splits into subproblems of weakly connected components, which only meet through their
+pinned times (see solvers.Problem.split). Subproblems that need an ILP are solved in a pool of processes,
+the rest in this process meanwhile, and the schedules of the subproblems of a block are merged into one.
+"""
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Iterable
+from typing import Any
+from . import sched, solvers, stats
+from .core import BasicBlock
+from .oplib import DEFAULT_OPLIB, OpLib
+
+
+def schedule_blocks(
+    blocks: list[BasicBlock],
+    objective: str = "ASAP",
+    solver: str = "auto",
+    resources: dict[str, int] | None = None,
+    period: float | None = None,
+    oplib: OpLib = DEFAULT_OPLIB,
+    workers: int | None = 1,
+    budget: float | None = None,
+    **solver_params
+):
+    """
+    Schedule blocks as BasicBlock.schedule does, solving their subproblems in up to `workers` processes,
+    the number of CPUs if None, or all of them in this process by default.
+    budget is in wall-clock seconds for all blocks, and every subproblem stops at the same deadline.
+    ILP models are only kept by a block for later calls if it does not split and is solved in this process.
+    """
+    if objective != "ASAP":
+        # ALAP is a longest-path pass over each block, with nothing to spread across processes
+        for bb in blocks:
+            bb.schedule(objective, solver, resources, period, oplib, **solver_params)
+        return
+    deadline = time.time() + budget if budget is not None else None
+    with stats.timed("schedule_blocks", blocks=len(blocks), solver=solver) as counters:
+        problems: list[tuple[solvers.Problem, list[int | None] | None]] = []
+        tasks: list[tuple[int, list[int], solvers.Problem]] = []    # (block position, node indices, subproblem)
+        for b, bb in enumerate(blocks):
+            problem, units = bb._problem(resources, period, oplib)
+            problems.append((problem, units))
+            tasks += [(b, nodes, sub) for nodes, sub in problem.split()]
+        results: list[tuple[str, list[int], int] | None] = [None] * len(tasks)
+        pooled = [k for k, (_, _, sub) in enumerate(tasks) if solvers.needs_ilp(sub, solver)]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(pooled) > 1:
+            # largest first, so that no worker is left with a large subproblem at the end
+            pooled.sort(key=lambda k: tasks[k][2].size(), reverse=True)
+            inline = sorted(set(range(len(tasks))) - set(pooled))
+            with ProcessPoolExecutor(min(workers, len(pooled))) as pool:
+                futures = {k: pool.submit(_solve, tasks[k][2], solver, solver_params, deadline) for k in pooled}
+                _solve_inline(blocks, tasks, results, inline, solver, solver_params, deadline)
+                for k, future in futures.items():
+                    results[k] = future.result()
+        else:
+            pooled = []
+            _solve_inline(blocks, tasks, results, range(len(tasks)), solver, solver_params, deadline)
+        counters.update(subproblems=len(tasks), pooled=len(pooled))
+
+        merged: list[list[tuple[list[int], str, list[int], int]]] = [[] for _ in blocks]
+        for (b, nodes, _), (backend, sub_ts, bound) in zip(tasks, results):
+            merged[b].append((nodes, backend, sub_ts, bound))
+        for bb, (problem, units), parts in zip(blocks, problems, merged):
+            with stats.timed("schedule", block=bb.name, values=problem.n, solver=solver) as block_counters:
+                ts = [0] * problem.n
+                for nodes, _, sub_ts, _ in parts:
+                    for i, t in zip(nodes, sub_ts):
+                        ts[i] = t
+                backends = sorted({backend for _, backend, _, _ in parts})
+                # the makespan of the block is the largest one of its parts, so is its bound
+                bound = max((part_bound for _, _, _, part_bound in parts), default=0)
+                # the list schedule binds units of the merged schedule if every part kept its share of it
+                if resources and backends != ["graph"]:
+                    units = sched.bind_units(ts, problem.types, resources, problem.occupancy)
+                bb._ii = None
+                bb._set_schedule(ts, units, problem.latencies)
+                block_counters["backend"] = "+".join(backends) or "graph"
+                block_counters["subproblems"] = len(parts)
+                block_counters["dependencies"] = len(problem.deps)
+                block_counters["length"] = problem.makespan(ts) + 1
+                block_counters["bound"] = bound
+                block_counters["gap"] = solvers.gap(problem.makespan(ts), bound)
+
+
+def _solve_inline(
+    blocks: list[BasicBlock],
+    tasks: list[tuple[int, list[int], solvers.Problem]],
+    results: list[tuple[str, list[int], int] | None],
+    indices: Iterable[int],
+    solver: str,
+    params: dict[str, Any],
+    deadline: float | None
+):
+    # solve the given subproblems in this process, with the models of the block if it did not split
+    parts = [0] * len(blocks)
+    for b, _, _ in tasks:
+        parts[b] += 1
+    for k in indices:
+        b, _, sub = tasks[k]
+        results[k] = _solve(sub, solver, params, deadline, blocks[b]._solver_cache if parts[b] == 1 else None)
+
+
+def _solve(
+    problem: solvers.Problem,
+    solver: str,
+    params: dict[str, Any],
+    deadline: float | None = None,
+    cache: dict[str, Any] | None = None
+) -> tuple[str, list[int], int]:
+    # solve a subproblem, in a worker or this process, releasing the models of a scratch cache
+    if cache is not None:
+        return solvers.solve(problem, solver, cache, deadline, **params)
+    cache = {}
+    try:
+        return solvers.solve(problem, solver, cache, deadline, **params)
+    finally:
+        solvers.release(cache)
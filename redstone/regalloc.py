@@ -0,0 +1,98 @@
+"""
+Register allocation of scheduled basic blocks, shared by the backends.
+"""
+from __future__ import annotations
+import heapq
+from .core import BasicBlock, Value
+
+
+def lifetimes(bb: BasicBlock) -> dict[Value, tuple[int, int]]:
+    """
+    Return the (first, last) time steps each value must be held in a register.
+    Values used only in the time step they are ready need no register and are omitted, and so are constants.
+    """
+    last_use = {val: ready(val) for val in bb.body}
+    for val in bb.body:
+        for pred in val.predecessors:
+            last_use[pred] = max(last_use[pred], val.content["time"])
+    return {
+        val: (ready(val) + 1, last)
+        for val, last in last_use.items()
+        if last > ready(val) and val.type in {"phi", "read", "add", "mul", "eq", "mux", "slice", "shl"}
+    }
+
+
+def allocate_registers(bb: BasicBlock) -> dict[Value, int]:
+    """
+    Pack values whose lifetimes do not overlap into shared registers by the left-edge algorithm.
+    Return the register index of each value that needs one.
+    """
+    intervals = sorted(lifetimes(bb).items(), key=lambda item: item[1])
+    val2idx: dict[Value, int] = {}
+    busy: list[tuple[int, int]] = []    # heap of (last, index) of registers in use
+    free: list[int] = []    # heap of released register indices
+    num_regs = 0
+    for val, (first, last) in intervals:
+        while busy and busy[0][0] < first:
+            heapq.heappush(free, heapq.heappop(busy)[1])
+        if free:
+            idx = heapq.heappop(free)
+        else:
+            idx = num_regs
+            num_regs += 1
+        val2idx[val] = idx
+        heapq.heappush(busy, (last, idx))
+    return val2idx
+
+
+def latency(val: Value) -> int:
+    """
+    Cycles from the start of a scheduled value until its result is ready.
+    """
+    return val.content.get("latency", 0)
+
+
+def ready(val: Value) -> int:
+    """
+    Time step in which the result of a scheduled value is ready.
+    """
+    return val.content["time"] + latency(val)
+
+
+def min_ii(bb: BasicBlock) -> int:
+    """
+    Smallest initiation interval at which a scheduled block runs pipelined.
+    Values bound to the same unit, and writes to the same output port, drive it only in their own time step,
+    so their time steps must differ modulo ii, and the next value of a phi node must reach its register
+    before the next transaction reads it.
+    """
+    ii = 1
+    slots: dict[tuple, list[int]] = {}
+    for val in bb.body:
+        if val.type == "phi" and "next" in val.content:
+            ii = max(ii, ready(val.content["next"]) + 1 - val.content["time"])
+        if val.type in {"add", "mul"} and "unit" in val.content:
+            key = ("unit", val.type, val.content["unit"])
+        elif val.type == "write":
+            key = ("port", val.content["to"])
+        else:
+            continue
+        slots.setdefault(key, []).append(val.content["time"])
+    for key, times in slots.items():
+        if len(set(times)) < len(times):
+            raise ValueError(f"Values driving {key[0]} {key[1:]} share a time step, so no initiation interval is legal.")
+    while any(len({t % ii for t in times}) < len(times) for times in slots.values()):
+        ii += 1
+    return ii
+
+
+def pipeline_ii(bb: BasicBlock, ii: int | None = None) -> int:
+    """
+    Initiation interval of a scheduled block lowered as a pipeline: the given one, else the one of a modulo-scheduled
+    block, else the smallest legal one. Raise ValueError if the given or modulo-scheduled one is below min_ii.
+    """
+    least = min_ii(bb)
+    ii = ii or bb.ii or least
+    if ii < least:
+        raise ValueError(f"Initiation interval {ii} is below {least}, the smallest one the schedule allows.")
+    return ii
@@ -0,0 +1,173 @@
+"""
+Batched simulation of the hardware generated by be.to_pyrtl.
+Stimulus is given as one array per input port, outputs are recorded into preallocated
+or memory-mapped arrays chunk by chunk, and pulses are checked against the schedule.
+"""
+from __future__ import annotations
+import os
+import subprocess
+from typing import TextIO
+import numpy as np
+import pyrtl
+from .be import to_pyrtl
+from .core import BasicBlock, Function
+from .regalloc import pipeline_ii, ready
+
+
+def simulate_rtl(
+    func: Function,
+    stimulus: dict[str, np.ndarray | int],
+    steps: int | None = None,
+    pipelined: bool = False,
+    ii: int | None = None,
+    block: pyrtl.Block | None = None,
+    out: dict[str, np.ndarray] | str | None = None,
+    vcd: TextIO | None = None,
+    check_pulses: bool = True,
+    engine: str = "auto",
+    chunk: int = 1 << 14
+) -> dict[str, np.ndarray]:
+    """
+    Simulate the hardware of a scheduled function for `steps` cycles.
+    stimulus maps input port names, and optionally go, to arrays of one value per cycle or to constants;
+    go is held high and other inputs are 0 if not given.
+    block is the result of be.to_pyrtl with the same pipelined and ii, and is generated if not given.
+    out is a dict of preallocated arrays by output port name, or a directory to memory-map them as .npy files.
+    engine is "compiled", "fast" or "python", and "auto" takes the compiled one if a C compiler is available.
+    If check_pulses, raise RuntimeError when an output pulse does not follow the schedule.
+    Return the trace of every output port by its name.
+    """
+    if block is None:
+        block = to_pyrtl(func, pipelined=pipelined, ii=ii)
+    columns = {name: np.asarray(value) for name, value in stimulus.items()}
+    if steps is None:
+        steps = max((len(col) for col in columns.values() if col.ndim), default=0)
+        if steps == 0:
+            raise ValueError("Number of steps required when all stimulus is constant.")
+    columns.setdefault("go", np.ones(1, dtype=np.uint64))
+    for port in func.ports:
+        if port.type.startswith("input"):
+            columns.setdefault(port.name, np.zeros(1, dtype=np.uint64))
+    columns = {name: np.broadcast_to(col, (steps,)) if col.ndim == 0 or len(col) == 1 else col[:steps] for name, col in columns.items()}
+    outputs = [port for port in func.ports if port.type.startswith("output")]
+
+    traces: dict[str, np.ndarray] = {}
+    for port in outputs:
+        dtype = bool if port.type == "outputpulse" else np.uint64 if port.width <= 64 else object
+        if isinstance(out, dict):
+            traces[port.name] = out[port.name]
+        elif isinstance(out, str):
+            traces[port.name] = np.lib.format.open_memmap(os.path.join(out, f"{port.name}.npy"), mode="w+", dtype=dtype, shape=(steps,))
+        else:
+            traces[port.name] = np.zeros(steps, dtype=dtype)
+
+    tracer = pyrtl.SimulationTrace(wires_to_track=[block.get_wirevector_by_name(port.name) for port in outputs], block=block)
+    sim = _make_simulation(block, tracer, engine)
+    names = list(columns)
+    for start in range(0, steps, chunk):
+        stop = min(start + chunk, steps)
+        values = [columns[name][start:stop].tolist() for name in names]
+        if isinstance(sim, pyrtl.CompiledSimulation):
+            # NOTE: CompiledSimulation.run traces the outputs of the first step for every step of a batch (pyrtl 1.0),
+            # so it is stepped one cycle at a time, which still leaves the logic to the compiled code
+            for row in zip(*values):
+                sim.step(dict(zip(names, row)))
+        else:
+            sim.step_multiple(dict(zip(names, values)), nsteps=stop - start)
+        for port in outputs:
+            trace = tracer.trace[port.name]
+            traces[port.name][start:stop] = trace
+            trace.clear()
+
+    if vcd is not None:
+        signals = {name: (block.get_wirevector_by_name(name).bitwidth, col) for name, col in columns.items()}
+        signals.update({port.name: (port.width, traces[port.name]) for port in outputs})
+        write_vcd(vcd, signals)
+    if check_pulses:
+        expected = expected_pulses(func.blocks[0], columns["go"], steps, pipelined, ii)
+        for name, pulses in expected.items():
+            mismatch = np.flatnonzero(pulses != traces[name].astype(bool))
+            if len(mismatch):
+                cycle = mismatch[0]
+                raise RuntimeError(f"Pulse {name} is {int(traces[name][cycle])} at cycle {cycle}, but the schedule expects {int(pulses[cycle])}.")
+    return traces
+
+
+def expected_pulses(bb: BasicBlock, go: np.ndarray, steps: int, pipelined: bool = False, ii: int | None = None) -> dict[str, np.ndarray]:
+    """
+    Return the trace of every output pulse emitted by a scheduled block, given go in each cycle.
+    A transaction starts when go is high and the counter FSM is idle, or, if pipelined, in every
+    issue slot aligned to ii, as in be.to_pyrtl.
+    """
+    go_cycles = np.flatnonzero(np.asarray(go)[:steps])
+    max_time = max(ready(val) for val in bb.body)
+    if pipelined:
+        ii = pipeline_ii(bb, ii)
+        starts = go_cycles[go_cycles % ii == 0]
+    else:
+        # the FSM accepts go again once it has counted up to max_time and back to 0
+        period = max(max_time + 1, 2)
+        starts = []
+        k = 0
+        while k < len(go_cycles):
+            starts.append(go_cycles[k])
+            k = np.searchsorted(go_cycles, go_cycles[k] + period)
+        starts = np.asarray(starts, dtype=np.int64)
+    pulses: dict[str, np.ndarray] = {}
+    for val in bb.body:
+        if val.type == "emit":
+            trace = pulses.setdefault(val.content["to"].name, np.zeros(steps, dtype=bool))
+            cycles = starts + val.content["time"]
+            trace[cycles[cycles < steps]] = True
+    return pulses
+
+
+def write_vcd(file: TextIO, signals: dict[str, tuple[int, np.ndarray]], timescale: str = "1ns"):
+    """
+    Write (bitwidth, trace) of each signal as a value change dump, one time unit per cycle.
+    """
+    file.write(f"$timescale {timescale} $end\n$scope module top $end\n")
+    ids = {}
+    for k, (name, (width, _)) in enumerate(signals.items()):
+        ids[name] = _vcd_id(k)
+        file.write(f"$var wire {width} {ids[name]} {name} $end\n")
+    file.write("$upscope $end\n$enddefinitions $end\n")
+    # cycles in which each signal changes, merged into one sorted stream of events
+    events = []
+    for name, (width, trace) in signals.items():
+        trace = np.asarray(trace)
+        changes = np.flatnonzero(trace[1:] != trace[:-1]) + 1 if len(trace) > 1 else np.zeros(0, dtype=np.int64)
+        for cycle in np.concatenate(([0], changes)) if len(trace) else ():
+            events.append((int(cycle), name, int(trace[cycle]), width))
+    events.sort(key=lambda event: event[0])
+    cycle = None
+    for t, name, value, width in events:
+        if t != cycle:
+            file.write(f"#{t}\n")
+            cycle = t
+        file.write(f"{value}{ids[name]}\n" if width == 1 else f"b{value:b} {ids[name]}\n")
+
+
+def _make_simulation(block: pyrtl.Block, tracer: pyrtl.SimulationTrace, engine: str):
+    if engine in {"auto", "compiled"}:
+        try:
+            return pyrtl.CompiledSimulation(tracer=tracer, block=block)
+        except (pyrtl.PyrtlError, OSError, subprocess.CalledProcessError):
+            # no C compiler or an unsupported platform
+            if engine == "compiled":
+                raise
+    if engine in {"auto", "fast"}:
+        return pyrtl.FastSimulation(tracer=tracer, block=block)
+    if engine == "python":
+        return pyrtl.Simulation(tracer=tracer, block=block)
+    raise NotImplementedError(f"Unsupported simulation engine: {engine}.")
+
+
+def _vcd_id(k: int) -> str:
+    # short identifier from the printable ASCII range
+    chars = ""
+    while True:
+        chars += chr(33 + k % 94)
+        k //= 94
+        if k == 0:
+            return chars
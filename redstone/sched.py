@@ -0,0 +1,417 @@
+"""
+Graph-based scheduling algorithms.
+All functions work on index-based dependency graphs, i.e., n nodes numbered 0..n-1
+and a list of (producer_index, consumer_index) edges as returned by BasicBlock.dependencies().
+Optional weights give the minimum distance in time steps along each edge, 0 by default.
+"""
+from __future__ import annotations
+import heapq
+
+
+def successors(n: int, deps: list[tuple[int, int]]) -> list[list[int]]:
+    succs: list[list[int]] = [[] for _ in range(n)]
+    for i, j in deps:
+        succs[i].append(j)
+    return succs
+
+
+def predecessors(n: int, deps: list[tuple[int, int]]) -> list[list[int]]:
+    preds: list[list[int]] = [[] for _ in range(n)]
+    for i, j in deps:
+        preds[j].append(i)
+    return preds
+
+
+def topological_order(n: int, deps: list[tuple[int, int]]) -> list[int]:
+    """
+    Return the nodes in topological order (Kahn's algorithm).
+    """
+    succs = successors(n, deps)
+    indegree = [0] * n
+    for _, j in deps:
+        indegree[j] += 1
+    order = [i for i in range(n) if indegree[i] == 0]
+    head = 0
+    while head < len(order):
+        i = order[head]
+        head += 1
+        for j in succs[i]:
+            indegree[j] -= 1
+            if indegree[j] == 0:
+                order.append(j)
+    if len(order) != n:
+        raise RuntimeError("Scheduling failed: dependency graph has a cycle.")
+    return order
+
+
+def asap(n: int, deps: list[tuple[int, int]], fixed: dict[int, int], weights: list[int] | None = None) -> list[int]:
+    """
+    Earliest start time of every node, i.e., the longest path from the sources.
+    Nodes in `fixed` are pinned to the given time.
+    """
+    preds: list[list[tuple[int, int]]] = [[] for _ in range(n)]
+    for k, (i, j) in enumerate(deps):
+        preds[j].append((i, weights[k] if weights else 0))
+    ts = [0] * n
+    for j in topological_order(n, deps):
+        t = max((ts[i] + w for i, w in preds[j]), default=0)
+        if j in fixed:
+            if t > fixed[j]:
+                raise RuntimeError(f"Scheduling failed: value {j} is pinned at time {fixed[j]} but its operands are ready at time {t}.")
+            t = fixed[j]
+        ts[j] = t
+    return ts
+
+
+def alap(
+    n: int,
+    deps: list[tuple[int, int]],
+    fixed: dict[int, int],
+    latency: int,
+    weights: list[int] | None = None,
+    latencies: list[int] | None = None
+) -> list[int]:
+    """
+    Latest start time of every node such that everything finishes by `latency`.
+    Node i takes latencies[i] time steps to finish, 0 by default, and nodes in `fixed` are pinned to the given time.
+    """
+    succs: list[list[tuple[int, int]]] = [[] for _ in range(n)]
+    for k, (i, j) in enumerate(deps):
+        succs[i].append((j, weights[k] if weights else 0))
+    ts = [0] * n
+    for i in reversed(topological_order(n, deps)):
+        t = min((ts[j] - w for j, w in succs[i]), default=latency - (latencies[i] if latencies else 0))
+        if i in fixed:
+            if t < fixed[i]:
+                raise RuntimeError(f"Scheduling failed: value {i} is pinned at time {fixed[i]} but its users start at time {t}.")
+            t = fixed[i]
+        ts[i] = t
+    return ts
+
+
+def mobility(asap_ts: list[int], alap_ts: list[int]) -> list[int]:
+    """
+    Slack of every node between its ASAP and ALAP times.
+    """
+    slack = [late - early for early, late in zip(asap_ts, alap_ts)]
+    if any(s < 0 for s in slack):
+        raise RuntimeError("Scheduling failed: latency is shorter than the critical path.")
+    return slack
+
+
+def chain_cuts(n: int, deps: list[tuple[int, int]], delays: list[float], period: float) -> list[tuple[int, int]]:
+    """
+    Return (i, j) pairs where the longest combinational path from the start of i to the end of j
+    exceeds the clock period, so j must start at least one time step after i.
+    Only the first such j along each path is returned, the rest are implied.
+    """
+    for i, d in enumerate(delays):
+        if d > period:
+            raise RuntimeError(f"Scheduling failed: value {i} takes {d} ns, longer than the clock period {period} ns.")
+    succs = successors(n, deps)
+    pos = {node: k for k, node in enumerate(topological_order(n, deps))}
+    cuts = []
+    for i in range(n):
+        if delays[i] <= 0:
+            continue    # paths from i are covered by cuts from the next node with a delay
+        arrival = {i: delays[i]}
+        cut = set()
+        heap = [(pos[i], i)]
+        while heap:
+            # visit in topological order, so that arrival[k] is final when k is expanded
+            _, k = heapq.heappop(heap)
+            if k in cut:
+                continue
+            for j in succs[k]:
+                if j in cut:
+                    continue
+                t = arrival[k] + delays[j]
+                if t > period:
+                    cut.add(j)
+                    cuts.append((i, j))
+                elif j not in arrival:
+                    arrival[j] = t
+                    heapq.heappush(heap, (pos[j], j))
+                else:
+                    arrival[j] = max(arrival[j], t)
+    return cuts
+
+
+def components(n: int, deps: list[tuple[int, int]]) -> list[list[int]]:
+    """
+    Weakly connected components of the graph, i.e., ignoring the direction of edges.
+    Return the nodes of each component in increasing order, components ordered by their first node.
+    """
+    parent = list(range(n))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in deps:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    comps: dict[int, list[int]] = {}
+    for i in range(n):
+        comps.setdefault(find(i), []).append(i)
+    return list(comps.values())
+
+
+def unit_chains(n: int, deps: list[tuple[int, int]], shared: list[bool]) -> list[tuple[int, int]]:
+    """
+    Return (i, j) pairs of shared nodes where j depends on i only through unshared nodes.
+    Such pairs must not be chained in the same time step, otherwise the operand multiplexers
+    of the shared units form a combinational loop.
+    """
+    succs = successors(n, deps)
+    chains = []
+    for i in range(n):
+        if not shared[i]:
+            continue
+        seen = set(succs[i])
+        stack = list(seen)
+        while stack:
+            k = stack.pop()
+            if shared[k]:
+                chains.append((i, k))
+                continue
+            for j in succs[k]:
+                if j not in seen:
+                    seen.add(j)
+                    stack.append(j)
+    return chains
+
+
+def check_resources(resources: dict[str, int]):
+    """
+    Raise ValueError unless every resource limit is an integer of at least 1.
+    """
+    for ty, limit in resources.items():
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+            raise ValueError(f"Resource limit of {ty} must be an integer of at least 1, not {limit!r}.")
+
+
+def list_schedule(
+    n: int,
+    deps: list[tuple[int, int]],
+    fixed: dict[int, int],
+    types: list[str],
+    resources: dict[str, int],
+    weights: list[int] | None = None,
+    occupancy: list[int] | None = None
+) -> tuple[list[int], list[int | None]]:
+    """
+    Resource-constrained list scheduling.
+    At most resources[type] nodes of a type hold a unit in the same time step, others are unlimited.
+    Node i holds its unit for occupancy[i] time steps from its start, 1 by default.
+    Ready nodes are picked in order of their ALAP time, i.e., the least mobile ones first.
+    Return (times, units) where units[i] is the index of the functional unit bound to node i,
+    or None if its type is unconstrained.
+    """
+    check_resources(resources)
+    occupancy = occupancy or [1] * n
+    asap_ts = asap(n, deps, fixed, weights)
+    priority = alap(n, deps, fixed, max(asap_ts, default=0), weights)
+
+    # edges are (producer, consumer, distance), shared units are never chained
+    edges = [(i, j, weights[k] if weights else 0) for k, (i, j) in enumerate(deps)]
+    edges += [(i, j, 1) for i, j in unit_chains(n, deps, [ty in resources for ty in types])]
+    preds: list[list[tuple[int, int]]] = [[] for _ in range(n)]
+    succs: list[list[int]] = [[] for _ in range(n)]
+    for i, j, w in edges:
+        preds[j].append((i, w))
+        succs[i].append(j)
+
+    ts: list[int] = [-1] * n
+    units: list[int | None] = [None] * n
+    taken: dict[str, list[set[int]]] = {ty: [set() for _ in range(limit)] for ty, limit in resources.items()}
+
+    def take(i: int, t: int) -> int | None:
+        # bind node i starting at t to the first unit free during its whole occupancy
+        steps = range(t, t + occupancy[i])
+        for unit, busy in enumerate(taken[types[i]]):
+            if busy.isdisjoint(steps):
+                busy.update(steps)
+                return unit
+        return None
+
+    # reserve units for pinned nodes first, since they cannot move
+    for i in sorted(fixed, key=fixed.__getitem__):
+        if types[i] in resources:
+            units[i] = take(i, fixed[i])
+            if units[i] is None:
+                raise RuntimeError(f"Scheduling failed: too many pinned {types[i]} values at time {fixed[i]}.")
+
+    pending = [len(preds[j]) for j in range(n)]
+    waiting: dict[int, list[int]] = {}  # time step -> unpinned nodes whose operands are ready by then
+    pinned_ready: dict[int, list[int]] = {}
+    free_ready: list[int] = []  # unconstrained nodes, placed as soon as they are ready
+    typed_ready: dict[str, list[tuple[int, int]]] = {ty: [] for ty in resources}  # heaps of (priority, index)
+
+    def make_ready(j: int, t: int):
+        if j in fixed:
+            if fixed[j] < t:
+                raise RuntimeError(f"Scheduling failed: value {j} is pinned at time {fixed[j]} but its operands are ready at time {t}.")
+            pinned_ready.setdefault(fixed[j], []).append(j)
+        elif t > now:
+            waiting.setdefault(t, []).append(j)
+        elif types[j] in resources:
+            heapq.heappush(typed_ready[types[j]], (priority[j], j))
+        else:
+            free_ready.append(j)
+
+    now = 0
+    for j in range(n):
+        if pending[j] == 0:
+            make_ready(j, 0)
+
+    placed = 0
+    while placed < n:
+        for j in waiting.pop(now, []):
+            make_ready(j, now)
+        progress = True
+        while progress:
+            progress = False
+            batch = pinned_ready.pop(now, []) + free_ready
+            free_ready.clear()
+            for ty, heap in typed_ready.items():
+                deferred = []   # nodes that do not fit in any unit for their whole occupancy
+                while heap and any(now not in busy for busy in taken[ty]):
+                    prio, i = heapq.heappop(heap)
+                    units[i] = take(i, now)
+                    if units[i] is None:
+                        deferred.append((prio, i))
+                    else:
+                        batch.append(i)
+                for item in deferred:
+                    heapq.heappush(heap, item)
+            for i in batch:
+                ts[i] = now
+                placed += 1
+                progress = True
+                # chaining: users may start in the same time step
+                for j in succs[i]:
+                    pending[j] -= 1
+                    if pending[j] == 0:
+                        make_ready(j, max(ts[k] + w for k, w in preds[j]))
+        now += 1
+    return ts, units
+
+
+def bind_units(ts: list[int], types: list[str], resources: dict[str, int], occupancy: list[int] | None = None) -> list[int | None]:
+    """
+    Bind nodes of constrained types to functional units by the left-edge algorithm,
+    so that no unit is held by two nodes in the same time step.
+    Return the unit index of each node, or None if its type is unconstrained.
+    """
+    n = len(ts)
+    occupancy = occupancy or [1] * n
+    units: list[int | None] = [None] * n
+    for ty, limit in resources.items():
+        busy: list[tuple[int, int]] = []    # heap of (first free step, unit)
+        free: list[int] = []
+        num_units = 0
+        for i in sorted((i for i in range(n) if types[i] == ty), key=ts.__getitem__):
+            while busy and busy[0][0] <= ts[i]:
+                heapq.heappush(free, heapq.heappop(busy)[1])
+            if free:
+                units[i] = heapq.heappop(free)
+            else:
+                units[i] = num_units
+                num_units += 1
+            heapq.heappush(busy, (ts[i] + occupancy[i], units[i]))
+        if num_units > limit:
+            raise RuntimeError(f"Scheduling failed: {num_units} {ty} units needed but only {limit} available.")
+    return units
+
+
+def earliest(n: int, edges: list[tuple[int, int, int, int]], fixed: dict[int, int], ii: int) -> list[int] | None:
+    """
+    Earliest start times under modulo constraints ts[j] >= ts[i] + latency - ii * distance
+    for every (i, j, latency, distance) edge, i.e., longest paths by Bellman-Ford.
+    Return None if the constraints are infeasible at this initiation interval.
+    """
+    ts = [fixed.get(i, 0) for i in range(n)]
+    for _ in range(n + 1):
+        changed = False
+        for i, j, lat, dist in edges:
+            t = ts[i] + lat - ii * dist
+            if t > ts[j]:
+                if j in fixed:
+                    return None
+                ts[j] = t
+                changed = True
+        if not changed:
+            return ts
+    return None # positive cycle, i.e., a recurrence longer than ii
+
+
+def modulo_schedule(
+    n: int,
+    edges: list[tuple[int, int, int, int]],
+    fixed: dict[int, int],
+    types: list[str],
+    resources: dict[str, int],
+    ii: int = 1,
+    max_ii: int | None = None,
+    occupancy: list[int] | None = None
+) -> tuple[int, list[int], list[int | None]]:
+    """
+    Iterative modulo scheduling of a loop body.
+    edges are (producer, consumer, latency, distance) where distance is the number of iterations
+    a loop-carried dependency spans. Iterations start every ii time steps, so a node of a constrained
+    type holds its unit in every time step congruent to its start time modulo ii,
+    or to any of the occupancy[i] steps from its start.
+    Values are assumed to be carried in per-stage registers, so there is no anti-dependency.
+    Return (achieved_ii, times, units) for the smallest feasible ii not below the requested one.
+    """
+    check_resources(resources)
+    occupancy = occupancy or [1] * n
+    counts: dict[str, int] = {}
+    for ty, occ in zip(types, occupancy):
+        counts[ty] = counts.get(ty, 0) + occ
+    res_mii = max((-(-counts.get(ty, 0) // limit) for ty, limit in resources.items()), default=1)
+    if max_ii is None:
+        max_ii = max(res_mii, ii, max(occupancy, default=1)) + sum(lat for _, _, lat, _ in edges) + max(fixed.values(), default=0) + 1
+
+    succs: list[list[tuple[int, int, int]]] = [[] for _ in range(n)]
+    preds: list[list[tuple[int, int, int]]] = [[] for _ in range(n)]
+    for i, j, lat, dist in edges:
+        succs[i].append((j, lat, dist))
+        preds[j].append((i, lat, dist))
+
+    for cur_ii in range(max(ii, res_mii, 1), max_ii + 1):
+        est = earliest(n, edges, fixed, cur_ii)
+        if est is None:
+            continue    # below the recurrence-constrained minimum
+        ts: list[int | None] = [None] * n
+        units: list[int | None] = [None] * n
+        mrt: set[tuple[str, int, int]] = set()  # modulo reservation table of (type, unit, slot)
+        for i in sorted(range(n), key=lambda i: (est[i], i not in fixed, i)):
+            lo = max([est[i]] + [ts[p] + lat - cur_ii * dist for p, lat, dist in preds[i] if ts[p] is not None])
+            hi = min([lo + cur_ii - 1] + [ts[s] - lat + cur_ii * dist for s, lat, dist in succs[i] if ts[s] is not None])
+            if i in fixed:
+                window = [fixed[i]] if lo <= fixed[i] <= hi else []
+            else:
+                window = range(lo, hi + 1)
+            for t in window:
+                if types[i] not in resources:
+                    ts[i] = t
+                    break
+                if occupancy[i] > cur_ii:
+                    break   # the unit would still be busy when the next iteration reaches node i
+                slots = [(types[i], (t + k) % cur_ii) for k in range(occupancy[i])]
+                unit = next((u for u in range(resources[types[i]]) if all((ty, u, slot) not in mrt for ty, slot in slots)), None)
+                if unit is not None:
+                    mrt.update((ty, unit, slot) for ty, slot in slots)
+                    ts[i], units[i] = t, unit
+                    break
+            if ts[i] is None:
+                break
+        else:
+            if all(ts[j] >= ts[i] + lat - cur_ii * dist for i, j, lat, dist in edges):
+                return cur_ii, ts, units
+    raise RuntimeError(f"Modulo scheduling failed: no feasible initiation interval up to {max_ii}.")
@@ -0,0 +1,551 @@
+"""
+Backends of BasicBlock.schedule, which refine the heuristic schedule of a Problem by an ILP or keep it.
+Backends are registered by name, and "auto" picks the first available ILP backend in AUTO_ORDER
+for problems up to AUTO_ILP_LIMIT variables, and the graph heuristics otherwise, e.g.,
+    bb.schedule(resources={"mul": 2})                   # auto
+    bb.schedule(resources={"mul": 2}, solver="highs")   # open-source MILP solver through SciPy
+    bb.schedule(resources={"mul": 2}, budget=10.0)      # best schedule found within 10 seconds
+ILP backends stopped by a limit, e.g., TimeLimit, return the better of their incumbent and the heuristic schedule.
+Gurobi and SciPy are imported only when their backend is used.
+"""
+from __future__ import annotations
+import importlib.util
+import math
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Callable
+from . import sched, stats
+
+
+class SolverUnavailable(RuntimeError):
+    # the backend cannot run here, e.g., no license or a size-limited one, so "auto" tries the next one
+    pass
+
+
+@dataclass(eq=False)
+class Problem:
+    # index-based scheduling problem as in sched, minimizing the time when every node is ready
+    n: int
+    deps: list[tuple[int, int]]
+    weights: list[int]
+    latencies: list[int]
+    fixed: dict[int, int]
+    start: list[int]   # heuristic schedule, which is the start point and bounds the horizon
+    types: list[str] = field(default_factory=list)
+    resources: dict[str, int] = field(default_factory=dict)
+    occupancy: list[int] = field(default_factory=list)
+
+    @cached_property
+    def windows(self) -> list[tuple[int, int]]:
+        # earliest and latest start of each node within the horizon of the heuristic schedule
+        horizon = self.makespan(self.start)
+        lo = sched.asap(self.n, self.deps, self.fixed, self.weights)
+        hi = sched.alap(self.n, self.deps, self.fixed, horizon, self.weights, self.latencies)
+        return list(zip(lo, hi))
+
+    @cached_property
+    def edges(self) -> list[tuple[int, int, int]]:
+        # (i, j, weight) of deps, keeping the largest weight of parallel deps and dropping those implied by a path of two others
+        # NOTE: deps form a DAG, so every dropped dep is implied by kept ones spanning fewer nodes in topological order
+        preds: list[dict[int, int]] = [{} for _ in range(self.n)]
+        for (i, j), w in zip(self.deps, self.weights):
+            if i not in preds[j] or w > preds[j][i]:
+                preds[j][i] = w
+        return [
+            (i, j, w) for j, pj in enumerate(preds) for i, w in pj.items()
+            if not any(i in preds[k] and preds[k][i] + wk >= w for k, wk in pj.items() if k != i)
+        ]
+
+    def ilp_edges(self, windows: list[tuple[int, int]] | None = None) -> list[tuple[int, int, int]]:
+        # edges an ILP needs besides the windows, those of the problem by default, as bounds of its variables
+        windows = windows or self.windows
+        return [(i, j, w) for i, j, w in self.edges if windows[j][0] - windows[i][1] < w]
+
+    @cached_property
+    def sinks(self) -> list[int]:
+        # nodes whose makespan row is not implied by the row of a successor and the edge to it
+        covered = [False] * self.n
+        for i, j, w in self.edges:
+            if w + self.latencies[j] >= self.latencies[i]:
+                covered[i] = True
+        return [i for i in range(self.n) if not covered[i]]
+
+    def size(self) -> int:
+        # number of ILP variables, i.e., one per node and time step in its window if resource-constrained
+        if not self.resources:
+            return self.n + 1
+        return sum(hi - lo + 1 for lo, hi in self.windows) + 1
+
+    def makespan(self, ts: list[int]) -> int:
+        return max((t + lat for t, lat in zip(ts, self.latencies)), default=0)
+
+    def lower_bound(self) -> int:
+        # makespan no schedule beats, from the critical path and the busy time steps of each resource type
+        bound = self.makespan([lo for lo, _ in self.windows])
+        for ty, limit in self.resources.items():
+            busy = sum(occ for t, occ in zip(self.types, self.occupancy) if t == ty)
+            bound = max(bound, -(-busy // limit) - 1)
+        return bound
+
+    def heuristic_optimal(self) -> bool:
+        # whether the heuristic schedule provably has the shortest makespan, e.g., always without resource constraints
+        return self.makespan(self.start) <= self.lower_bound()
+
+    def split(self) -> list[tuple[list[int], Problem]]:
+        # independent subproblems with the indices of their nodes here, whose makespans are minimized on their own
+        # NOTE: a subproblem has weakly connected components of the deps, only linked to the others through pinned times,
+        # merged if they share a constrained resource type
+        links = list(self.deps)
+        first: dict[str, int] = {}
+        for i, ty in enumerate(self.types):
+            if ty in self.resources:
+                links.append((first.setdefault(ty, i), i))
+        comps = sched.components(self.n, links)
+        if len(comps) <= 1:
+            return [(list(range(self.n)), self)]
+        part, local = [0] * self.n, [0] * self.n
+        for c, nodes in enumerate(comps):
+            for k, i in enumerate(nodes):
+                part[i], local[i] = c, k
+        deps: list[list[tuple[int, int]]] = [[] for _ in comps]
+        weights: list[list[int]] = [[] for _ in comps]
+        for (i, j), w in zip(self.deps, self.weights):
+            deps[part[i]].append((local[i], local[j]))
+            weights[part[i]].append(w)
+        fixed: list[dict[int, int]] = [{} for _ in comps]
+        for i, t in self.fixed.items():
+            fixed[part[i]][local[i]] = t
+        subproblems = []
+        for c, nodes in enumerate(comps):
+            types = [self.types[i] for i in nodes] if self.types else []
+            subproblems.append((nodes, Problem(
+                len(nodes), deps[c], weights[c], [self.latencies[i] for i in nodes], fixed[c], [self.start[i] for i in nodes],
+                types, {ty: limit for ty, limit in self.resources.items() if ty in types},
+                [self.occupancy[i] for i in nodes] if self.occupancy else [],
+            )))
+        return subproblems
+
+    def resource_users(self, ty: str, t: int, windows: list[tuple[int, int]] | None = None) -> list[tuple[int, int]]:
+        # (node, start) pairs within windows, those of the problem by default, which hold a unit of type ty at time t
+        # NOTE: node i holds its unit at t if it starts within occupancy[i] steps before
+        return [
+            (i, s) for i, (lo, hi) in enumerate(windows or self.windows) if self.types[i] == ty
+            for s in range(max(lo, t - self.occupancy[i] + 1), min(hi, t) + 1)
+        ]
+
+
+class Backend:
+    # scheduling backend, whose solve returns the start time of every node and a lower bound on the makespan
+    # proven by the backend, which equals the makespan of the schedule if it is optimal
+    # cache is kept by the block between calls, e.g., to re-solve a model in place
+    name: str = ""
+
+    def available(self) -> bool:
+        return True
+
+    def solve(self, problem: Problem, cache: dict[str, Any], **params) -> tuple[list[int], int]:
+        raise NotImplementedError
+
+    def release(self, cache: dict[str, Any]):
+        pass
+
+
+class GraphBackend(Backend):
+    # the heuristic schedule itself, which is optimal without resource constraints
+    name = "graph"
+
+    def solve(self, problem: Problem, cache: dict[str, Any], **params) -> tuple[list[int], int]:
+        if not problem.resources:
+            return problem.start, problem.makespan(problem.start)
+        return problem.start, min(problem.lower_bound(), problem.makespan(problem.start))
+
+
+@dataclass(eq=False)
+class _GurobiModel:
+    # Gurobi model kept in the cache, valid as long as key matches
+    key: tuple
+    model: Any
+    ts: list[Any]   # start time of each node, a variable or a linear expression, then the makespan variable
+    x: Any = None   # time-indexed binaries of the resource-constrained model
+    windows: list[tuple[int, int]] | None = None   # time range of x of each node
+    span: int = 0   # number of time steps with resource rows
+    rows: dict[tuple[str, int], Any] = field(default_factory=dict)   # (type, time) -> resource row
+    limits: dict[str, int] = field(default_factory=dict)   # resource limits the rows were set for
+    params: dict[str, Any] = field(default_factory=dict)   # Gurobi params set on the model
+
+
+class GurobiBackend(Backend):
+    # NOTE: pinned times and windows are variable bounds, so the model is kept and re-solved in place
+    # as long as the dependency graph is the same and every node stays within the windows it was built for,
+    # e.g., after re-pinning values or changing resource limits
+    name = "gurobi"
+
+    def __init__(self):
+        self._available: bool | None = None
+        self._env: Any = None
+
+    def available(self) -> bool:
+        if self._available is None:
+            self._available = False
+            if importlib.util.find_spec("gurobipy") is not None:
+                import gurobipy as grb
+                try:
+                    # starting an environment checks the license
+                    self._quiet_env()
+                    self._available = True
+                except grb.GurobiError:
+                    pass
+        return self._available
+
+    def _quiet_env(self) -> Any:
+        # environment of every model, started without the license banner of the default one,
+        # while OutputFlag of a solve still applies to its model
+        if self._env is None:
+            import gurobipy as grb
+            env = grb.Env(empty=True)
+            env.setParam("OutputFlag", 0)
+            env.start()
+            self._env = env
+        return self._env
+
+    def solve(self, problem: Problem, cache: dict[str, Any], **params) -> tuple[list[int], int]:
+        begin = time.perf_counter()
+        import gurobipy as grb
+        # models log their solves as in the default environment unless asked otherwise
+        params = {"OutputFlag": 1, **params}
+        try:
+            if problem.resources:
+                return self._solve_resources(problem, cache, params, begin)
+            return self._solve_asap(problem, cache, params, begin)
+        except grb.GurobiError as e:
+            # NOTE: 10009 is no license, 10010 is a model too large for a size-limited license
+            if e.errno in {10009, 10010}:
+                self.release(cache)
+                raise SolverUnavailable(f"Gurobi cannot solve the model: {e}") from e
+            raise
+
+    def release(self, cache: dict[str, Any]):
+        ilp = cache.pop(self.name, None)
+        if ilp is not None:
+            ilp.model.dispose()
+
+    def _solve_asap(self, problem: Problem, cache: dict[str, Any], params: dict[str, Any], begin: float) -> tuple[list[int], int]:
+        import gurobipy as grb
+        n, latencies = problem.n, problem.latencies
+        key = ("ASAP", n, tuple(problem.deps), tuple(problem.weights), tuple(latencies))
+        ilp = cache.get(self.name)
+        if ilp is None or ilp.key != key:
+            self.release(cache)
+            model = grb.Model("ASAP Scheduling", env=self._quiet_env())
+            ts = model.addVars(n, vtype=grb.GRB.INTEGER, name="ts") # non-negative integers
+            total_time = model.addVar(vtype=grb.GRB.INTEGER, name="total_time")
+            model.addConstrs((total_time >= ts[i] + latencies[i] for i in problem.sinks), name="total_time_def")
+            # NOTE: windows change with pinned times, so only deps implied by others are left out of a model kept for reuse
+            model.addConstrs((ts[j] - ts[i] >= w for i, j, w in problem.edges), name="deps")
+            model.setObjective(total_time, grb.GRB.MINIMIZE)
+            ilp = cache[self.name] = _GurobiModel(key, model, [ts[i] for i in range(n)] + [total_time])
+        model, ts = ilp.model, ilp.ts
+        params = _time_left(params, begin)
+        if params.get("TimeLimit", math.inf) < MIN_SOLVE_TIME:
+            return _incumbent(problem, None, None)
+        _set_gurobi_params(ilp, params)
+        # pinned times are windows of a single step, and the makespan lies between the lower bound and the heuristic one
+        windows = problem.windows
+        model.setAttr("LB", ts, [lo for lo, _ in windows] + [problem.lower_bound()])
+        model.setAttr("UB", ts, [hi for _, hi in windows] + [problem.makespan(problem.start)])
+        model.setAttr("Start", ts, problem.start + [problem.makespan(problem.start)])
+
+        _optimize_gurobi(model)
+        return _gurobi_result(model, problem, lambda: [int(round(v.X)) for v in ts[:n]])
+
+    def _solve_resources(self, problem: Problem, cache: dict[str, Any], params: dict[str, Any], begin: float) -> tuple[list[int], int]:
+        # time-indexed formulation: x[i, t] == 1 iff node i is scheduled at time t
+        import gurobipy as grb
+        n, deps, weights, latencies, occupancy = problem.n, problem.deps, problem.weights, problem.latencies, problem.occupancy
+        windows = problem.windows
+        key = ("resources", n, tuple(deps), tuple(weights), tuple(latencies), tuple(occupancy), tuple(problem.types), tuple(sorted(problem.resources)))
+        ilp = cache.get(self.name)
+        if ilp is None or ilp.key != key or any(lo < wlo or hi > whi for (lo, hi), (wlo, whi) in zip(windows, ilp.windows)):
+            self.release(cache)
+            model = grb.Model("Resource-Constrained Scheduling", env=self._quiet_env())
+            x = model.addVars([(i, t) for i, (lo, hi) in enumerate(windows) for t in range(lo, hi + 1)], vtype=grb.GRB.BINARY, name="x")
+            ts = [grb.quicksum(t * x[i, t] for t in range(lo, hi + 1)) for i, (lo, hi) in enumerate(windows)]
+            total_time = model.addVar(vtype=grb.GRB.INTEGER, name="total_time")
+
+            model.addConstrs((x.sum(i, "*") == 1 for i in range(n)), name="assign")
+            model.addConstrs((total_time >= ts[i] + latencies[i] for i in problem.sinks), name="total_time_def")
+            # deps implied by the windows stay implied by the narrower windows of later solves
+            model.addConstrs((ts[j] - ts[i] >= w for i, j, w in problem.ilp_edges(windows)), name="deps")
+            shared = [ty in problem.resources for ty in problem.types]
+            model.addConstrs((ts[j] - ts[i] >= 1 for i, j in sched.unit_chains(n, deps, shared)), name="unit_chains")
+            model.setObjective(total_time, grb.GRB.MINIMIZE)
+            span = max((hi + occ for (_, hi), occ in zip(windows, occupancy)), default=0)
+            ilp = cache[self.name] = _GurobiModel(key, model, ts + [total_time], x, windows, span)
+        model, x = ilp.model, ilp.x
+        total_time = ilp.ts[-1]
+        total_time.LB, total_time.UB = problem.lower_bound(), problem.makespan(problem.start)
+        params = _time_left(params, begin)
+        if params.get("TimeLimit", math.inf) < MIN_SOLVE_TIME:
+            return _incumbent(problem, None, None)
+        _set_gurobi_params(ilp, params)
+        _set_gurobi_resource_rows(ilp, problem)
+        # times outside the current windows are ruled out by bounds, and the heuristic schedule is the start point
+        keys, xs = list(x.keys()), list(x.values())
+        model.setAttr("UB", xs, [1.0 if windows[i][0] <= t <= windows[i][1] else 0.0 for i, t in keys])
+        model.setAttr("Start", xs, [1.0 if problem.start[i] == t else 0.0 for i, t in keys])
+
+        _optimize_gurobi(model)
+        return _gurobi_result(model, problem, lambda: [next(t for t in range(lo, hi + 1) if x[i, t].X > 0.5) for i, (lo, hi) in enumerate(windows)])
+
+
+def _optimize_gurobi(model: Any):
+    # solve the model, and report its size and solve statistics as a pass
+    with stats.timed("ilp", solver="gurobi", model=model.ModelName) as counters:
+        model.optimize()
+        counters.update(
+            variables=model.NumVars,
+            integer_variables=model.NumIntVars,
+            constraints=model.NumConstrs,
+            nonzeros=model.NumNZs,
+            status=model.Status,
+            solve_time=model.Runtime,
+            nodes=model.NodeCount,
+        )
+        if model.SolCount:
+            counters.update(objective=model.ObjVal, bound=model.ObjBound, gap=model.MIPGap)
+
+
+def _gurobi_result(model: Any, problem: Problem, read: Callable[[], list[int]]) -> tuple[list[int], int]:
+    # the schedule read from a solved model and its bound, keeping the incumbent or the heuristic schedule at a limit
+    import gurobipy as grb
+    status = model.status
+    if status == grb.GRB.OPTIMAL:
+        # OPTIMAL is within MIPGap of the bound, which is only the makespan at a gap of 0
+        return _incumbent(problem, read(), model.ObjBound)
+    limits = {
+        grb.GRB.ITERATION_LIMIT, grb.GRB.NODE_LIMIT, grb.GRB.TIME_LIMIT, grb.GRB.SOLUTION_LIMIT,
+        grb.GRB.INTERRUPTED, grb.GRB.WORK_LIMIT, grb.GRB.MEM_LIMIT,
+    }
+    if status not in limits:
+        raise RuntimeError(f"Scheduling optimization failed with Gurobi status {status}.")
+    try:
+        bound = model.ObjBound
+    except grb.GurobiError:
+        bound = None    # e.g., stopped before the root relaxation
+    return _incumbent(problem, read() if model.SolCount else None, bound)
+
+
+def _incumbent(problem: Problem, ts: list[int] | None, bound: float | None) -> tuple[list[int], int]:
+    # the better of the incumbent of a stopped solve, if any, and the heuristic schedule, with the best bound known
+    if ts is None or problem.makespan(ts) > problem.makespan(problem.start):
+        ts = problem.start
+    lower = problem.lower_bound()
+    if bound is not None and math.isfinite(bound):
+        # makespans are integers, so a fractional bound rounds up
+        lower = max(lower, math.ceil(bound - 1e-6))
+    return ts, min(lower, problem.makespan(ts))
+
+
+def _time_left(params: dict[str, Any], begin: float) -> dict[str, Any]:
+    # params with TimeLimit less the time spent since the backend began, e.g., building the model
+    if "TimeLimit" not in params:
+        return params
+    return {**params, "TimeLimit": max(params["TimeLimit"] - (time.perf_counter() - begin), 0.0)}
+
+
+def _set_gurobi_params(ilp: _GurobiModel, params: dict[str, Any]):
+    # params of earlier solves do not carry over
+    if params != ilp.params:
+        if ilp.params:
+            ilp.model.resetParams()
+        # OutputFlag goes first, so that setting the others is not logged if it is 0
+        for k, v in sorted(params.items(), key=lambda kv: kv[0] != "OutputFlag"):
+            ilp.model.setParam(k, v)
+        ilp.params = dict(params)
+
+
+def _set_gurobi_resource_rows(ilp: _GurobiModel, problem: Problem):
+    # update rows of changed limits, adding those which were redundant under a looser limit
+    # NOTE: rows cover the windows of the model, which contain the windows of the problem
+    import gurobipy as grb
+    for ty, limit in problem.resources.items():
+        prev = ilp.limits.get(ty)
+        if limit == prev:
+            continue
+        for t in range(ilp.span):
+            row = ilp.rows.get((ty, t))
+            if row is not None:
+                row.RHS = limit
+            elif prev is None or limit < prev:
+                users = problem.resource_users(ty, t, ilp.windows)
+                if len(users) > limit:
+                    ilp.rows[ty, t] = ilp.model.addConstr(grb.quicksum(ilp.x[key] for key in users) <= limit, name=f"resource_{ty}_{t}")
+    ilp.limits = dict(problem.resources)
+
+
+class HighsBackend(Backend):
+    # the same formulations solved by HiGHS through scipy.optimize.milp, built anew in every call
+    # NOTE: HiGHS takes no start point here, so the heuristic schedule only bounds the horizon and the objective
+    name = "highs"
+    # Gurobi params with a counterpart, so that the same params work with either backend
+    _PARAMS = {"TimeLimit": "time_limit", "MIPGap": "mip_rel_gap", "OutputFlag": "disp"}
+    _OPTIONS = {"disp", "presolve", "time_limit", "node_limit", "mip_rel_gap"}
+
+    def available(self) -> bool:
+        return importlib.util.find_spec("scipy") is not None
+
+    def solve(self, problem: Problem, cache: dict[str, Any], **params) -> tuple[list[int], int]:
+        # NOTE: the first import of scipy takes a while, which counts against TimeLimit too
+        begin = time.perf_counter()
+        import numpy as np
+        from scipy.optimize import Bounds, LinearConstraint, milp
+        from scipy.sparse import coo_array
+
+        n = problem.n
+        if problem.resources:
+            windows = problem.windows
+            offsets = [0]
+            for lo, hi in windows:
+                offsets.append(offsets[-1] + hi - lo + 1)
+            num_vars = offsets[-1] + 1
+            # start time of node i as a linear combination over its binaries
+            terms = [[(offsets[i] + t - lo, t) for t in range(lo, hi + 1)] for i, (lo, hi) in enumerate(windows)]
+            lb, ub = np.zeros(num_vars), np.ones(num_vars)
+        else:
+            num_vars = n + 1
+            terms = [[(i, 1)] for i in range(n)]
+            # pinned times are windows of a single step
+            lb = np.array([lo for lo, _ in problem.windows] + [0], dtype=float)
+            ub = np.array([hi for _, hi in problem.windows] + [0], dtype=float)
+        total_time = num_vars - 1
+        # the heuristic schedule is feasible, so it bounds the objective
+        lb[total_time], ub[total_time] = problem.lower_bound(), problem.makespan(problem.start)
+
+        rows, cols, coefs, row_lb, row_ub = [], [], [], [], []
+
+        def add_row(entries: list[tuple[int, float]], low: float, high: float):
+            for col, coef in entries:
+                if coef == 0:
+                    continue
+                rows.append(len(row_lb))
+                cols.append(col)
+                coefs.append(coef)
+            row_lb.append(low)
+            row_ub.append(high)
+
+        negate = lambda entries: [(col, -coef) for col, coef in entries]
+        for i in problem.sinks:
+            add_row([(total_time, 1)] + negate(terms[i]), problem.latencies[i], np.inf)
+        for i, j, w in problem.ilp_edges():
+            add_row(terms[j] + negate(terms[i]), w, np.inf)
+        if problem.resources:
+            for i in range(n):
+                add_row([(col, 1) for col, _ in terms[i]], 1, 1)
+            shared = [ty in problem.resources for ty in problem.types]
+            for i, j in sched.unit_chains(n, problem.deps, shared):
+                add_row(terms[j] + negate(terms[i]), 1, np.inf)
+            for t in range(max((hi + occ for (_, hi), occ in zip(windows, problem.occupancy)), default=0)):
+                for ty, limit in problem.resources.items():
+                    users = problem.resource_users(ty, t)
+                    if len(users) > limit:
+                        add_row([(offsets[i] + s - windows[i][0], 1) for i, s in users], -np.inf, limit)
+
+        params = _time_left(params, begin)
+        if params.get("TimeLimit", math.inf) < MIN_SOLVE_TIME:
+            return _incumbent(problem, None, None)
+        options = {self._PARAMS.get(k, k): v for k, v in params.items()}
+        # params of other backends, e.g., Gurobi ones without a counterpart, are ignored
+        options = {k: bool(v) if k == "disp" else v for k, v in options.items() if k in self._OPTIONS}
+        matrix = coo_array((coefs, (rows, cols)), shape=(len(row_lb), num_vars)).tocsr()
+        objective = np.zeros(num_vars)
+        objective[total_time] = 1
+        with stats.timed("ilp", solver=self.name) as counters:
+            begin = time.perf_counter()
+            result = milp(
+                objective,
+                integrality=np.ones(num_vars),
+                bounds=Bounds(lb, ub),
+                constraints=LinearConstraint(matrix, row_lb, row_ub) if row_lb else (),
+                options=options,
+            )
+            counters.update(
+                variables=num_vars,
+                integer_variables=num_vars,
+                constraints=len(row_lb),
+                nonzeros=matrix.nnz,
+                status=result.status,
+                solve_time=time.perf_counter() - begin,
+                nodes=getattr(result, "mip_node_count", None),
+            )
+            if result.x is not None:
+                counters.update(objective=result.fun, bound=getattr(result, "mip_dual_bound", None), gap=getattr(result, "mip_gap", None))
+        # NOTE: status 1 is an iteration or time limit, and 4 covers other limits, e.g., node_limit,
+        # where x is the incumbent if HiGHS found one, while the heuristic schedule rules out 2 and 3
+        if result.status in {2, 3}:
+            raise RuntimeError(f"Scheduling optimization failed: {result.message}")
+        ts = None
+        if result.x is not None:
+            if problem.resources:
+                ts = [max(terms[i], key=lambda term: result.x[term[0]])[1] for i in range(n)]
+            else:
+                ts = [int(round(result.x[i])) for i in range(n)]
+        # status 0 is within mip_rel_gap of the dual bound, which is only the makespan at a gap of 0
+        return _incumbent(problem, ts, getattr(result, "mip_dual_bound", None))
+
+
+BACKENDS: dict[str, Backend] = {backend.name: backend for backend in (GraphBackend(), GurobiBackend(), HighsBackend())}
+AUTO_ORDER = ["gurobi", "highs"]   # ILP backends tried by "auto", in order
+AUTO_ILP_LIMIT = 20000   # largest problem, in ILP variables, which "auto" solves by an ILP
+MIN_SOLVE_TIME = 0.01   # least TimeLimit, in seconds, worth starting an ILP solve with, otherwise the heuristic schedule is kept
+
+
+def register(backend: Backend):
+    # add a backend, or replace the one of the same name
+    BACKENDS[backend.name] = backend
+
+
+def solve(problem: Problem, solver: str, cache: dict[str, Any], deadline: float | None = None, **params) -> tuple[str, list[int], int]:
+    # return the name of the backend used, its schedule and the lower bound on the makespan proven by it
+    # NOTE: "auto" keeps the heuristic schedule if it is provably optimal, e.g., always without resource constraints
+    # NOTE: deadline is a time.time() by which the solve has to finish, an ILP gets the time left as its TimeLimit
+    # and the heuristic schedule is kept if none is left
+    if solver != "auto" and solver not in BACKENDS:
+        raise NotImplementedError(f"Unsupported scheduling solver: {solver}.")
+    if deadline is not None:
+        left = deadline - time.time()
+        if left < MIN_SOLVE_TIME:
+            return "graph", *BACKENDS["graph"].solve(problem, cache, **params)
+        params = {**params, "TimeLimit": min(params.get("TimeLimit", math.inf), left)}
+    if solver != "auto":
+        return solver, *BACKENDS[solver].solve(problem, cache, **params)
+    # backends picked implicitly stay quiet unless asked otherwise
+    params = {"OutputFlag": 0, **params}
+    if needs_ilp(problem, solver):
+        for name in AUTO_ORDER:
+            backend = BACKENDS[name]
+            if backend.available():
+                try:
+                    return name, *backend.solve(problem, cache, **params)
+                except SolverUnavailable:
+                    continue
+    return "graph", *BACKENDS["graph"].solve(problem, cache, **params)
+
+
+def gap(makespan: int, bound: int) -> float:
+    # relative optimality gap of a makespan given a lower bound on it, as Gurobi's MIPGap
+    return (makespan - bound) / makespan if makespan else 0.0
+
+
+def needs_ilp(problem: Problem, solver: str) -> bool:
+    # whether solve runs an ILP backend on the problem, rather than the graph one
+    if solver != "auto":
+        return solver != "graph"
+    return bool(problem.resources) and not problem.heuristic_optimal() and problem.size() <= AUTO_ILP_LIMIT
+
+
+def release(cache: dict[str, Any]):
+    # dispose of everything backends keep in the cache
+    for backend in BACKENDS.values():
+        backend.release(cache)
+    cache.clear()
@@ -0,0 +1,98 @@
+"""
+Timers and counters of compiler passes.
+Passes report into the collector opened by `collect`, and cost next to nothing when none is open, e.g.,
+    with stats.collect() as s:
+        bb.schedule(solver="gurobi")
+        to_pyrtl(func)
+    s.totals()          # seconds per pass
+    s.write_trace(f)    # Chrome trace event JSON, with the counters of each pass as its args
+"""
+from __future__ import annotations
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, TextIO
+
+
+@dataclass
+class PassRecord:
+    name: str
+    start: float                # seconds since the collector was opened
+    time: float = 0.0           # wall-clock seconds
+    depth: int = 0              # number of enclosing passes
+    counters: dict[str, Any] = field(default_factory=dict)
+
+
+class Stats:
+    # records of finished passes, in the order they finished
+    records: list[PassRecord]
+
+    def __init__(self, callback: Callable[[PassRecord], None] | None = None):
+        # callback is called with every record once its pass finishes
+        self.records = []
+        self._callback = callback
+        self._origin = time.perf_counter()
+        self._open: list[PassRecord] = []
+
+    @contextmanager
+    def timed(self, name: str, **counters) -> Iterator[dict[str, Any]]:
+        # time the enclosed pass, whose counters can be filled in through the yielded dict
+        record = PassRecord(name, time.perf_counter() - self._origin, depth=len(self._open), counters=counters)
+        self._open.append(record)
+        try:
+            yield record.counters
+        finally:
+            record.time = time.perf_counter() - self._origin - record.start
+            self._open.pop()
+            self.records.append(record)
+            if self._callback is not None:
+                self._callback(record)
+
+    def totals(self) -> dict[str, float]:
+        # return seconds spent in each pass name
+        totals: dict[str, float] = {}
+        for record in self.records:
+            totals[record.name] = totals.get(record.name, 0.0) + record.time
+        return totals
+
+    def to_json(self) -> list[dict[str, Any]]:
+        return [{"pass": r.name, "start": r.start, "time": r.time, "depth": r.depth, "counters": r.counters} for r in self.records]
+
+    def write_trace(self, file: TextIO):
+        # write records in the Chrome trace event format, viewable in chrome://tracing or Perfetto
+        events = [
+            {"name": r.name, "ph": "X", "ts": r.start * 1e6, "dur": r.time * 1e6, "pid": 0, "tid": 0, "args": r.counters}
+            for r in self.records
+        ]
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file, default=str)
+
+
+# collector of each thread or asyncio task
+_active_stats: ContextVar[Stats | None] = ContextVar("active_stats", default=None)
+
+
+@contextmanager
+def collect(callback: Callable[[PassRecord], None] | None = None) -> Iterator[Stats]:
+    # make a new collector the target of passes until the end of the block
+    token = _active_stats.set(Stats(callback))
+    try:
+        yield _active_stats.get()
+    finally:
+        _active_stats.reset(token)
+
+
+def active() -> Stats | None:
+    return _active_stats.get()
+
+
+@contextmanager
+def timed(name: str, **counters) -> Iterator[dict[str, Any]]:
+    # time a pass into the active collector, or only hand out a scratch dict of counters if none is open
+    collector = _active_stats.get()
+    if collector is None:
+        yield counters
+    else:
+        with collector.timed(name, **counters) as record:
+            yield record
@@ -0,0 +1,204 @@
+"""
+Difference-constraint engine behind the TVar algebra.
+Every constraint has the form x[v] - x[u] <= w over integer time points.
+A feasible assignment (potential) is maintained incrementally, so infeasibility is detected
+as soon as the constraint closing a negative cycle is added.
+Offsets fixed by pairs of opposite constraints, e.g., those of TVar.__add__, are kept in a union-find,
+so reading them needs no search.
+"""
+from __future__ import annotations
+import heapq
+
+
+class TimelineError(RuntimeError):
+    """
+    Raised when timeline constraints are infeasible.
+    `constraints` lists the constraints forming the infeasible (negative) cycle.
+    """
+    constraints: list[str]
+
+    def __init__(self, constraints: list[str]):
+        super().__init__("Infeasible timeline constraints: " + "; ".join(constraints))
+        self.constraints = constraints
+
+
+class Timeline:
+    """
+    A graph of time points and difference constraints.
+    Node 0 is the origin, i.e., TZERO, and every other node is never before it.
+    """
+    _succs: list[list[tuple[int, int, str]]]
+    _potential: list[int]
+    _root: list[int]    # union-find parent of each node, over nodes with a fixed offset to each other
+    _delta: list[int]   # x[node] - x[_root[node]]
+    _size: list[int]
+    relaxations: int    # edges scanned by searches so far, a measure of the work done
+
+    def __init__(self):
+        self._succs = [[]]
+        self._potential = [0]
+        self._root = [0]
+        self._delta = [0]
+        self._size = [1]
+        self.relaxations = 0
+
+    def __len__(self) -> int:
+        return len(self._succs)
+
+    def add_node(self, name: str = "", after: list[tuple[int, int]] | None = None) -> int:
+        """
+        Add a time point, starting at the earliest potential with x[node] >= x[u] + w for every (u, w) in after.
+        Adding these lower bounds afterwards, or the matching upper bound of a single one, needs no search.
+        """
+        node = len(self._succs)
+        self._succs.append([])
+        self._root.append(node)
+        self._delta.append(0)
+        self._size.append(1)
+        self._potential.append(max((self._potential[u] + w for u, w in after or ()), default=self._potential[0]))
+        self.add_constraint(node, 0, 0, f"{name} >= TZERO")
+        return node
+
+    def add_constraint(self, u: int, v: int, w: int, label: str = ""):
+        """
+        Add x[v] - x[u] <= w, or raise TimelineError if it contradicts existing constraints.
+        """
+        pot = self._potential
+        if pot[v] <= pot[u] + w:
+            self._succs[u].append((v, w, label))
+            return
+        if u == v:
+            raise TimelineError([label])
+        # lower the potentials reachable from v by Dijkstra over reduced costs,
+        # reaching u means the new edge closes a negative cycle
+        delta = {v: pot[u] + w - pot[v]}
+        parent: dict[int, tuple[int, str]] = {v: (u, label)}
+        heap = [(delta[v], v)]
+        done = set()
+        while heap:
+            d, x = heapq.heappop(heap)
+            if x in done:
+                continue
+            done.add(x)
+            self.relaxations += len(self._succs[x])
+            for y, wy, ly in self._succs[x]:
+                dy = pot[x] + d + wy - pot[y]
+                if dy < min(0, delta.get(y, 0)):
+                    parent[y] = (x, ly)
+                    if y == u:
+                        raise TimelineError(self._cycle(parent, u))
+                    delta[y] = dy
+                    heapq.heappush(heap, (dy, y))
+        for x, d in delta.items():
+            pot[x] += d
+        self._succs[u].append((v, w, label))
+
+    def add_constraints(self, constraints: list[tuple[int, int, int, str]]):
+        """
+        Add all of the (u, v, w, label) constraints, or none of them if any raises TimelineError.
+        """
+        added = []
+        try:
+            for u, v, w, label in constraints:
+                self.add_constraint(u, v, w, label)
+                added.append(u)
+        except TimelineError:
+            # the potentials stay feasible without the removed edges
+            for u in reversed(added):
+                self._succs[u].pop()
+            raise
+        # x[v] - x[u] <= w together with x[u] - x[v] <= -w fixes the offset
+        edges = {(u, v, w) for u, v, w, _ in constraints}
+        for u, v, w in edges:
+            if (v, u, -w) in edges:
+                self._union(u, v, w)
+
+    def _find(self, x: int) -> tuple[int, int]:
+        # root of x and x[x] - x[root], compressing the path to the root
+        root, delta = self._root, self._delta
+        path = []
+        while root[x] != x:
+            path.append(x)
+            x = root[x]
+        for y in reversed(path):
+            if root[y] != x:
+                delta[y] += delta[root[y]]
+                root[y] = x
+        return x, delta[path[0]] if path else 0
+
+    def _union(self, u: int, v: int, w: int):
+        # record x[v] - x[u] == w
+        ru, du = self._find(u)
+        rv, dv = self._find(v)
+        if ru == rv:
+            return
+        # x[rv] - x[ru] == w + du - dv, and the smaller tree goes under the larger one
+        d = w + du - dv
+        if self._size[ru] < self._size[rv]:
+            ru, rv, d = rv, ru, -d
+        self._root[rv] = ru
+        self._delta[rv] = d
+        self._size[ru] += self._size[rv]
+
+    def _cycle(self, parent: dict[int, tuple[int, str]], u: int) -> list[str]:
+        labels = []
+        x = u
+        while True:
+            x, label = parent[x]
+            labels.append(label)
+            if x == u:
+                break
+        labels.reverse()
+        return labels
+
+    def _distances(self, src: int) -> dict[int, int]:
+        # shortest paths from src, by Dijkstra over reduced costs
+        pot = self._potential
+        dist = {src: 0}
+        heap = [(0, src)]
+        done = set()
+        while heap:
+            d, x = heapq.heappop(heap)
+            if x in done:
+                continue
+            done.add(x)
+            self.relaxations += len(self._succs[x])
+            for y, w, _ in self._succs[x]:
+                dy = d + w + pot[x] - pot[y]
+                if dy < dist.get(y, dy + 1):
+                    dist[y] = dy
+                    heapq.heappush(heap, (dy, y))
+        return {y: d - pot[src] + pot[y] for y, d in dist.items()}
+
+    def bounds(self, u: int, v: int) -> tuple[int | None, int | None]:
+        """
+        Return the (lower, upper) bounds of x[v] - x[u], None if unbounded.
+        """
+        upper = self._distances(u).get(v)
+        lower = self._distances(v).get(u)
+        return (None if lower is None else -lower), upper
+
+    def known_offset(self, u: int, v: int) -> int | None:
+        """
+        Return x[v] - x[u] if pairs of opposite constraints fix it, otherwise None, without a search.
+        """
+        ru, du = self._find(u)
+        rv, dv = self._find(v)
+        return dv - du if ru == rv else None
+
+    def offset(self, u: int, v: int) -> int | None:
+        """
+        Return x[v] - x[u] if the constraints fix it, otherwise None.
+        Offsets fixed by pairs of opposite constraints are read without a search.
+        """
+        known = self.known_offset(u, v)
+        if known is not None:
+            return known
+        lower, upper = self.bounds(u, v)
+        return lower if lower is not None and lower == upper else None
+
+    def solution(self) -> list[int]:
+        """
+        Return a feasible assignment of all time points, with the origin at 0.
+        """
+        return [p - self._potential[0] for p in self._potential]
@@ -0,0 +1,424 @@
+"""
+Verilog emitter for scheduled functions.
+Lines are written to the output as they are generated instead of building a netlist in memory,
+only the drivers of multiplexed wires and registers are gathered before they are written.
+The module has the same interface and cycle behavior as the one from be.to_pyrtl,
+with a synchronous reset for control and state registers.
+"""
+from __future__ import annotations
+import re
+from collections import Counter
+from typing import Callable, TextIO
+from . import stats
+from .core import BasicBlock, Function, Port, Value
+from .regalloc import allocate_registers, latency, pipeline_ii, ready
+
+
+# conditional drivers of a destination, as (width, [(condition, source), ...])
+_Cases = dict[str, tuple[int, list[tuple[str, str]]]]
+
+# port types of core.Port the module has a counterpart for
+_PORT_TYPES = {"inputbus", "inputpulse", "outputbus", "outputpulse"}
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_$]*")
+# names of the registers and wires the module declares besides its ports, e.g., cnter, step3, r0, add4, add4_s1,
+# mul6_p2 of a private pipeline, or mul_u0_lhs of a shared unit
+_INTERNAL = re.compile(r"cnter|phase|(step|valid|r)\d+|(phi|read|add|mul|eq|mux|slice|shl)\d+(_s\d+|_p\d+)?|(add|mul)_u\d+(_lhs|_rhs|_s\d+)?")
+# Verilog keywords, and SystemVerilog ones that tools parsing .v files as SystemVerilog reject
+_KEYWORDS = set("""
+    always and assign automatic begin buf bufif0 bufif1 case casex casez cell cmos config deassign default defparam
+    design disable edge else end endcase endconfig endfunction endgenerate endmodule endprimitive endspecify endtable
+    endtask event for force forever fork function generate genvar highz0 highz1 if ifnone incdir include initial inout
+    input instance integer join large liblist library localparam macromodule medium module nand negedge nmos nor
+    noshowcancelled not notif0 notif1 or output parameter pmos posedge primitive pull0 pull1 pulldown pullup
+    pulsestyle_onevent pulsestyle_ondetect rcmos real realtime reg release repeat rnmos rpmos rtran rtranif0 rtranif1
+    scalared showcancelled signed small specify specparam strong0 strong1 supply0 supply1 table task time tran tranif0
+    tranif1 tri tri0 tri1 triand trior trireg unsigned use uwire vectored wait wand weak0 weak1 while wire wor xnor xor
+    alias assert assume bit break byte chandle class const constraint context continue cover dist do endclass enum
+    export extends extern final first_match foreach forkjoin iff import inside int interface intersect join_any
+    join_none local logic longint modport new null package packed priority program property protected pure rand randc
+    randcase randsequence ref return sequence shortint shortreal solve static string struct super this throughout
+    timeprecision timeunit type typedef union unique var virtual void wait_order wildcard with within
+""".split())
+
+
+def to_verilog(func: Function, out: TextIO, is_top: bool = True, pipelined: bool = False, ii: int | None = None):
+    # NOTE: same modes as be.to_pyrtl, i.e., a counter FSM by default, or a pipeline accepting go every ii cycles
+    if len(func.blocks) != 1:
+        raise NotImplementedError("Only single-block function is supported.")
+    bb = func.blocks[0]
+    if not bb.scheduled():
+        raise RuntimeError("Scheduling required before lowering.")
+    if not is_top:
+        raise NotImplementedError("Only top-level function is supported.")
+
+    with stats.timed("to_verilog", function=func.name, values=len(bb.body), pipelined=pipelined) as counters:
+        _write_module(_CountingWriter(out, counters) if stats.active() else out, func, bb, pipelined, ii)
+
+
+def _write_module(out: TextIO, func: Function, bb: BasicBlock, pipelined: bool, ii: int | None):
+    # NOTE: the pipeline has a ready output, high in the cycles where go is taken, as in be.to_pyrtl
+    controls = ["clk", "rst", "go"] + (["ready"] if pipelined else [])
+    for port in func.ports:
+        if port.type not in _PORT_TYPES:
+            raise NotImplementedError(f"Unsupported port type: {port.type}.")
+        if port.name in controls:
+            raise ValueError(f"Port name {port.name} is taken by a control port of the module.")
+        if port.name and _INTERNAL.fullmatch(port.name):
+            raise ValueError(f"Port name {port.name} is taken by an internal register or wire of the module.")
+    if pipelined:
+        ii = pipeline_ii(bb, ii)
+    port2name = {port: _ident(port.name) if port.name else f"port{k}" for k, port in enumerate(func.ports)}
+    # unnamed ports are port0, port1, ... by position, which other ports may be named as well
+    for name, count in Counter(port2name.values()).items():
+        if count > 1:
+            raise ValueError(f"Port name {name} is taken by more than one port of the module.")
+    val2name = {val: f"{val.type}{idx}" for idx, val in enumerate(bb.body) if val.type in {"phi", "read", "add", "mul", "eq", "mux", "slice", "shl"}}
+    out.write(f"module {_ident(func.name) if func.name else 'toplevel'}({', '.join(controls + list(port2name.values()))});\n")
+    for name in controls:
+        out.write(_decl("output" if name == "ready" else "input", 1, name))
+    for port, name in port2name.items():
+        out.write(_decl("input" if port.type.startswith("input") else "output", port.width, name))
+    out.write("\n")
+    if pipelined:
+        _write_pipelined(out, bb, ii, port2name, val2name)
+    else:
+        _write_fsm(out, bb, port2name, val2name)
+    out.write("endmodule\n")
+
+
+def _write_fsm(out: TextIO, bb: BasicBlock, port2name: dict[Port, str], val2name: dict[Value, str]):
+    # counter FSM, values crossing a cycle boundary are kept in shared registers, see be.to_pyrtl
+    time2vals: dict[int, list[Value]] = {}
+    time2ready: dict[int, list[Value]] = {}
+    for val in bb.body:
+        time2vals.setdefault(val.content["time"], []).append(val)
+        time2ready.setdefault(ready(val), []).append(val)
+    max_time = max(time2ready.keys())
+    cnter_width = max(max_time.bit_length(), 1)
+    steps = sorted(time2vals.keys() | time2ready.keys())
+
+    # declarations
+    out.write(_decl("reg", cnter_width, "cnter"))
+    for t in steps:
+        cond = f"cnter == {_const(cnter_width, t)}" if t > 0 else f"(cnter == {_const(cnter_width, 0)}) & go"
+        out.write(f"    wire step{t} = {cond};\n")
+    val2idx = allocate_registers(bb)
+    reg_widths: dict[int, int] = {}
+    for val, idx in val2idx.items():
+        reg_widths[idx] = max(reg_widths.get(idx, 0), _width(val))
+    for idx in range(len(reg_widths)):
+        out.write(_decl("reg", reg_widths[idx], f"r{idx}"))
+    _declare_values(out, bb, val2name)
+    val2unit = _declare_units(out, bb, val2name)
+    out.write("\n")
+
+    def ref(val: Value, t: int) -> str:
+        # the value as seen in time step t, from its register if ready earlier
+        if val.type == "const":
+            return _const(_width(val), val.content["constant"])
+        if ready(val) < t:
+            idx = val2idx[val]
+            return _slice(f"r{idx}", reg_widths[idx], _width(val))
+        return port2name[val.content["from"]] if val.type == "read" else val2name[val]
+
+    wire_cases, port2emits = _write_datapath(out, bb, val2unit, port2name, val2name, lambda t: f"step{t}", ref)
+
+    # registers and phi nodes capture values in the time step they are ready
+    reg_cases: _Cases = {f"r{idx}": (width, []) for idx, width in reg_widths.items()}
+    reg_resets: dict[str, int] = {}
+    next2phis: dict[Value, list[Value]] = {}
+    for val in bb.body:
+        if val.type == "phi":
+            reg_cases[val2name[val]] = (_width(val), [])
+            reg_resets[val2name[val]] = val.content.get("init", 0)
+            if "next" in val.content:
+                next2phis.setdefault(val.content["next"], []).append(val)
+    for t in steps:
+        for val in time2ready.get(t, []):
+            if val in val2idx:
+                reg_cases[f"r{val2idx[val]}"][1].append((f"step{t}", ref(val, t)))
+            for phi in next2phis.get(val, []):
+                reg_cases[val2name[phi]][1].append((f"step{t}", ref(val, t)))
+    _write_units(out, val2unit)
+    _write_outputs(out, wire_cases, port2emits, port2name)
+    _write_registers(out, reg_cases, reg_resets)
+
+    # counter update
+    zero = _const(cnter_width, 0)
+    out.write("    always @(posedge clk)\n")
+    out.write(f"        if (rst) cnter <= {zero};\n")
+    out.write(f"        else if (cnter == {zero}) begin\n")
+    out.write(f"            if (go) cnter <= {_const(cnter_width, 1)};\n")
+    out.write("        end\n")
+    out.write(f"        else if (cnter >= {_const(cnter_width, max_time)}) cnter <= {zero};\n")
+    out.write(f"        else cnter <= cnter + {_const(cnter_width, 1)};\n")
+
+
+def _write_pipelined(out: TextIO, bb: BasicBlock, ii: int, port2name: dict[Port, str], val2name: dict[Value, str]):
+    # every time step is a stage and a valid bit travels with each transaction, see be._to_pyrtl_pipelined
+    max_time = max(ready(val) for val in bb.body)
+    last_use = {val: ready(val) for val in bb.body}
+    for val in bb.body:
+        for pred in val.predecessors:
+            last_use[pred] = max(last_use[pred], val.content["time"])
+
+    # declarations
+    phase_width = (ii - 1).bit_length()
+    if ii > 1:
+        out.write(_decl("reg", phase_width, "phase"))
+        out.write(f"    assign ready = phase == {_const(phase_width, 0)};\n")
+        out.write("    wire valid0 = go & ready;\n")
+    else:
+        out.write("    assign ready = 1'b1;\n")
+        out.write("    wire valid0 = go;\n")
+    for t in range(1, max_time + 1):
+        out.write(_decl("reg", 1, f"valid{t}"))
+    for val, name in val2name.items():
+        for k in range(1, last_use[val] - ready(val) + 1):
+            out.write(_decl("reg", _width(val), f"{name}_s{k}"))
+    _declare_values(out, bb, val2name)
+    val2unit = _declare_units(out, bb, val2name)
+    out.write("\n")
+
+    def ref(val: Value, t: int) -> str:
+        # the value as seen in stage t
+        if val.type == "const":
+            return _const(_width(val), val.content["constant"])
+        k = t - ready(val)
+        if k > 0:
+            return f"{val2name[val]}_s{k}"
+        return port2name[val.content["from"]] if val.type == "read" else val2name[val]
+
+    wire_cases, port2emits = _write_datapath(out, bb, val2unit, port2name, val2name, lambda t: f"valid{t}", ref)
+
+    reg_cases: _Cases = {}
+    reg_resets: dict[str, int] = {}
+    for val in bb.body:
+        if val.type == "phi":
+            reg_resets[val2name[val]] = val.content.get("init", 0)
+            cases = reg_cases.setdefault(val2name[val], (_width(val), []))[1]
+            if "next" in val.content:
+                t_next = ready(val.content["next"])
+                cases.append((f"valid{t_next}", ref(val.content["next"], t_next)))
+    _write_units(out, val2unit)
+    _write_outputs(out, wire_cases, port2emits, port2name)
+    _write_registers(out, reg_cases, reg_resets)
+
+    # free-running stage registers and valid bits
+    for val, name in val2name.items():
+        if last_use[val] > ready(val):
+            out.write("    always @(posedge clk) begin\n")
+            for k in range(1, last_use[val] - ready(val) + 1):
+                out.write(f"        {name}_s{k} <= {ref(val, ready(val) + k - 1)};\n")
+            out.write("    end\n")
+    if max_time > 0 or ii > 1:
+        out.write("    always @(posedge clk)\n")
+        out.write("        if (rst) begin\n")
+        if ii > 1:
+            out.write(f"            phase <= {_const(phase_width, 0)};\n")
+        for t in range(1, max_time + 1):
+            out.write(f"            valid{t} <= 1'b0;\n")
+        out.write("        end\n")
+        out.write("        else begin\n")
+        if ii > 1:
+            zero = _const(phase_width, 0)
+            out.write(f"            phase <= phase == {_const(phase_width, ii - 1)} ? {zero} : phase + {_const(phase_width, 1)};\n")
+        for t in range(1, max_time + 1):
+            out.write(f"            valid{t} <= valid{t - 1};\n")
+        out.write("        end\n")
+
+
+def _write_datapath(
+    out: TextIO,
+    bb: BasicBlock,
+    val2unit: dict[Value, tuple[str, list[str]]],
+    port2name: dict[Port, str],
+    val2name: dict[Value, str],
+    cond: Callable[[int], str],
+    ref: Callable[[Value, int], str]
+) -> tuple[_Cases, dict[Port, list[str]]]:
+    # write the operators of every value in its time step,
+    # return the conditional drivers of unit operands and output buses, and the conditions of output pulses
+    wire_cases: _Cases = {}
+    port2emits: dict[Port, list[str]] = {}
+    for port in port2name:
+        if port.type == "outputbus":
+            wire_cases[port2name[port]] = (port.width, [])
+    for val in bb.body:
+        t = val.content["time"]
+        if val.type in {"add", "mul"}:
+            lhs, rhs = val.content["operands"]
+            name = val2name[val]
+            op = "+" if val.type == "add" else "*"
+            if "unit" in val.content:
+                # steer operands into the shared unit in this time step, the result leaves its pipeline when ready
+                unit, stages = val2unit[val]
+                wire_cases.setdefault(f"{unit}_lhs", (_width(lhs), []))[1].append((cond(t), ref(lhs, t)))
+                wire_cases.setdefault(f"{unit}_rhs", (_width(rhs), []))[1].append((cond(t), ref(rhs, t)))
+                out.write(f"    assign {name} = {stages[latency(val)]};\n")
+            elif val in val2unit:
+                # private pipeline, whose result is only used when ready
+                _, stages = val2unit[val]
+                out.write("    always @(posedge clk) begin\n")
+                out.write(f"        {stages[1]} <= {ref(lhs, t)} {op} {ref(rhs, t)};\n")
+                for k in range(2, len(stages)):
+                    out.write(f"        {stages[k]} <= {stages[k - 1]};\n")
+                out.write("    end\n")
+                out.write(f"    assign {name} = {stages[-1]};\n")
+            else:
+                out.write(f"    assign {name} = {ref(lhs, t)} {op} {ref(rhs, t)};\n")
+        elif val.type == "eq":
+            lhs, rhs = val.content["operands"]
+            out.write(f"    assign {val2name[val]} = {ref(lhs, t)} == {ref(rhs, t)};\n")
+        elif val.type == "mux":
+            sel, lhs, rhs = val.content["operands"]
+            out.write(f"    assign {val2name[val]} = {ref(sel, t)} ? {ref(lhs, t)} : {ref(rhs, t)};\n")
+        elif val.type == "slice":
+            # shifted rather than indexed, since the operand may be a literal or a register slice
+            out.write(f"    assign {val2name[val]} = {ref(val.content['operands'][0], t)} >> {val.content['lsb']};\n")
+        elif val.type == "shl":
+            out.write(f"    assign {val2name[val]} = {ref(val.content['operands'][0], t)} << {val.content['amount']};\n")
+        elif val.type == "write":
+            port = val.content["to"]
+            if port.type != "outputbus":
+                raise ValueError(f"Write to port {port.name} of type {port.type}, only output buses are written.")
+            wire_cases[port2name[port]][1].append((cond(t), ref(val.content["value"], t)))
+        elif val.type == "emit":
+            port = val.content["to"]
+            if port.type != "outputpulse":
+                raise ValueError(f"Emit to port {port.name} of type {port.type}, only output pulses are emitted.")
+            port2emits.setdefault(port, []).append(cond(t))
+    return wire_cases, port2emits
+
+
+def _declare_values(out: TextIO, bb: BasicBlock, val2name: dict[Value, str]):
+    # phi nodes are state registers and operators are wires, reads are the input ports themselves
+    # and constants are literals
+    for val in bb.body:
+        if val.type == "phi":
+            out.write(_decl("reg", _width(val), val2name[val]))
+        elif val.type in {"add", "mul", "eq", "mux", "slice", "shl"}:
+            out.write(_decl("wire", _width(val), val2name[val]))
+
+
+def _declare_units(out: TextIO, bb: BasicBlock, val2name: dict[Value, str]) -> dict[Value, tuple[str, list[str]]]:
+    # declare functional units shared by values bound to the same unit, and a private pipeline for every other
+    # multi-cycle value, return the unit name of each value and its output delayed by 0, 1, ... cycles
+    # NOTE: as in be._declare_units, a value with latency L takes stage L
+    # NOTE: a private pipeline has no stage 0, its first register takes the operator output directly
+    dims: dict[str, list[int]] = {}   # unit name -> [lhs width, rhs width, output width, depth]
+    val2name_unit: dict[Value, str] = {}
+    for val in bb.body:
+        if val.type not in {"add", "mul"}:
+            continue
+        if "unit" in val.content:
+            unit = f"{val.type}_u{val.content['unit']}"
+        elif latency(val) > 0:
+            unit = f"{val2name[val]}_p"
+        else:
+            continue
+        lhs, rhs = val.content["operands"]
+        unit_dims = dims.setdefault(unit, [0, 0, 0, 0])
+        for k, dim in enumerate((_width(lhs), _width(rhs), _width(val), latency(val))):
+            unit_dims[k] = max(unit_dims[k], dim)
+        val2name_unit[val] = unit
+    unit2stages: dict[str, list[str]] = {}
+    for unit, (lhs_width, rhs_width, out_width, depth) in dims.items():
+        private = unit.endswith("_p")
+        if not private:
+            out.write(_decl("wire", lhs_width, f"{unit}_lhs"))
+            out.write(_decl("wire", rhs_width, f"{unit}_rhs"))
+            out.write(_decl("wire", out_width, unit))
+        stages = ["" if private else unit] + [f"{unit}{k}" if private else f"{unit}_s{k}" for k in range(1, depth + 1)]
+        for stage in stages[1:]:
+            out.write(_decl("reg", out_width, stage))
+        unit2stages[unit] = stages
+    return {val: (unit, unit2stages[unit]) for val, unit in val2name_unit.items()}
+
+
+def _write_units(out: TextIO, val2unit: dict[Value, tuple[str, list[str]]]):
+    # operators and pipeline registers of shared units
+    written = set()
+    for val, (name, stages) in val2unit.items():
+        if name in written or "unit" not in val.content:
+            continue
+        written.add(name)
+        op = "+" if val.type == "add" else "*"
+        out.write(f"    assign {name} = {name}_lhs {op} {name}_rhs;\n")
+        if len(stages) > 1:
+            out.write("    always @(posedge clk) begin\n")
+            for k in range(1, len(stages)):
+                out.write(f"        {stages[k]} <= {stages[k - 1]};\n")
+            out.write("    end\n")
+
+
+def _write_outputs(out: TextIO, wire_cases: _Cases, port2emits: dict[Port, list[str]], port2name: dict[Port, str]):
+    # multiplexed wires default to zero when none of their conditions hold
+    for dest, (width, cases) in wire_cases.items():
+        out.write(f"    assign {dest} =")
+        for cond, src in cases:
+            out.write(f"\n        {cond} ? {src} :")
+        out.write(f"\n        {_const(width, 0)};\n" if cases else f" {_const(width, 0)};\n")
+    for port in port2name:
+        if port.type == "outputpulse":
+            emits = port2emits.get(port, [])
+            out.write(f"    assign {port2name[port]} = {' | '.join(emits) if emits else _const(port.width, 0)};\n")
+
+
+def _write_registers(out: TextIO, reg_cases: _Cases, reg_resets: dict[str, int]):
+    # registers keep their value unless one of their conditions holds
+    for dest, (width, cases) in reg_cases.items():
+        if not cases and dest not in reg_resets:
+            continue
+        out.write("    always @(posedge clk)\n")
+        keyword = "if"
+        if dest in reg_resets:
+            out.write(f"        if (rst) {dest} <= {_const(width, reg_resets[dest])};\n")
+            keyword = "else if"
+        for cond, src in cases:
+            out.write(f"        {keyword} ({cond}) {dest} <= {src};\n")
+            keyword = "else if"
+
+
+class _CountingWriter:
+    # forward writes, counting bytes, lines, and declared registers and wires into stats counters
+    def __init__(self, out: TextIO, counters: dict[str, int]):
+        self._out = out
+        self._counters = counters
+        counters.update(bytes=0, lines=0, registers=0, wires=0)
+
+    def write(self, text: str) -> int:
+        self._counters["bytes"] += len(text)
+        self._counters["lines"] += text.count("\n")
+        if text.startswith("    reg "):
+            self._counters["registers"] += 1
+        elif text.startswith("    wire "):
+            self._counters["wires"] += 1
+        return self._out.write(text)
+
+
+def _ident(name: str) -> str:
+    # names that are not plain identifiers are escaped, which ends them with a space
+    if _IDENTIFIER.fullmatch(name) and name not in _KEYWORDS:
+        return name
+    return f"\\{name} "
+
+
+def _decl(kind: str, width: int, name: str) -> str:
+    return f"    {kind} {name};\n" if width == 1 else f"    {kind} [{width - 1}:0] {name};\n"
+
+
+def _const(width: int, value: int) -> str:
+    return f"{width}'d{value}"
+
+
+def _slice(name: str, name_width: int, width: int) -> str:
+    # low bits of a wider wire
+    return name if name_width <= width else f"{name}[{width - 1}:0]"
+
+
+def _width(val: Value) -> int:
+    # bitwidth of the wire carrying the value
+    if val.type == "read":
+        return val.content["from"].width
+    return val.content["width"]
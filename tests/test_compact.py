@@ -0,0 +1,34 @@
+import pytest
+from redstone.compact import MAX_OPCODES, OPCODES, CompactBlock
+from redstone.core import BasicBlock, Port, Value
+
+
+def test_opcodes_are_per_block():
+    a, b = CompactBlock("a"), CompactBlock("b")
+    a.append("const", width=4, constant=3)
+    assert a.body[0].type == "const"
+    assert b.optypes == list(OPCODES)
+    b.append("mux", width=4)
+    assert a.opcode("mux") == b.opcode("const") == len(OPCODES) + 1
+
+
+def test_too_many_value_types_raise():
+    cb = CompactBlock("wide")
+    for k in range(MAX_OPCODES - len(OPCODES)):
+        cb.opcode(f"op{k}")
+    with pytest.raises(ValueError):
+        cb.append("one_too_many")
+    assert len(cb.body) == 0
+
+
+def test_round_trip_keeps_values():
+    a, out = Port("a", "inputbus", 8), Port("o", "outputbus", 8)
+    r = Value("read", False, {"from": a, "time": 0})
+    k = Value("const", False, {"constant": 5, "width": 8})
+    s = Value("add", False, {"width": 8, "operands": [r, k]})
+    bb = BasicBlock("entry")
+    bb.body = [r, k, s, Value("write", True, {"value": s, "to": out})]
+    back = CompactBlock.from_block(bb).to_block()
+    assert [val.type for val in back.body] == ["read", "const", "add", "write"]
+    assert back.body[2].content["operands"] == [back.body[0], back.body[1]]
+    assert back.body[1].content["constant"] == 5
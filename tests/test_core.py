@@ -0,0 +1,37 @@
+from redstone.core import BasicBlock, Port, Value
+
+
+def check_index(bb: BasicBlock):
+    # the index matches the one built from scratch out of the operands of every value
+    position = {val: idx for idx, val in enumerate(bb.body)}
+    deps = [(position[pred], idx) for idx, val in enumerate(bb.body) for pred in val.predecessors]
+    assert bb.dependencies() == deps
+    assert bb.predecessors() == [[position[pred] for pred in val.predecessors] for val in bb.body]
+    assert bb.successors() == [[j for i, j in deps if i == idx] for idx in range(len(bb.body))]
+    assert all(bb.index(val) == idx for val, idx in position.items())
+
+
+def test_index_follows_appends_and_edits():
+    a = Port("a", "inputbus", 8)
+    r = Value("read", False, {"from": a})
+    s = Value("add", False, {"width": 8, "operands": [r, r]})
+    bb = BasicBlock("entry")
+    bb.body.append(r)
+    bb.body.append(s)
+    check_index(bb)
+    # appended values extend the index, with += keeping the same list
+    m = Value("mul", False, {"width": 8, "operands": [s, r]})
+    bb.body += [m]
+    check_index(bb)
+    # other edits shift positions, so the index is rebuilt
+    c = Value("const", False, {"constant": 3, "width": 8})
+    bb.body.insert(0, c)
+    check_index(bb)
+    bb.body.remove(m)
+    check_index(bb)
+    bb.body = [c, r, s, m]
+    check_index(bb)
+    # operands changed in place are only seen after reindex
+    m.content["operands"] = [s, c]
+    bb.reindex()
+    check_index(bb)
@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import pytest
+import redstone as rs
+from redstone import fe, stats
+
+
+def elaborate(name: str, width: int, step=lambda: None) -> fe.Module:
+    # a module of its own name and width, calling step between its ports and its loop
+    with rs.module(name) as m:
+        a, o = rs.input(width=width, name=f"{name}_a"), rs.output(width=width, name=f"{name}_o")
+        step()
+        with rs.loop(at=rs.TZERO) as (start, next_start):
+            v = rs.values((width,), names="v")[0]
+            rs.at(start).do(rs.NormalAction({"type": "sample", "from": a, "to": v}))
+            rs.at(start + width).do(rs.NormalAction({"type": "drive", "from": v, "to": o}))
+            next_start.tset(start + width + 1)
+        assert rs.current_module() is m
+    return m
+
+
+def check(m: fe.Module, name: str, width: int):
+    assert m.name == name
+    assert [port["name"] for port in m.ports] == [f"{name}_a", f"{name}_o"]
+    assert all(port["width"] == width for port in m.ports)
+
+
+def test_threads_elaborate_their_own_modules():
+    barrier = threading.Barrier(4)
+    results: dict[int, fe.Module] = {}
+    errors = []
+
+    def work(k: int):
+        try:
+            # every thread is between its ports and its loop at once, then lowers it into a collector of its own
+            with stats.collect() as collected:
+                results[k] = elaborate(f"m{k}", k + 1, barrier.wait)
+                barrier.wait()
+                rs.lower(results[k])
+            assert [record.counters["module"] for record in collected.records if record.name == "lower"] == [f"m{k}"]
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(k,)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    for k, m in results.items():
+        check(m, f"m{k}", k + 1)
+    with pytest.raises(RuntimeError):
+        rs.current_module()
+
+
+def test_tasks_elaborate_their_own_modules():
+    async def work(k: int) -> fe.Module:
+        # every task yields to the others between its ports and its loop, with the module open
+        with rs.module(f"t{k}") as m:
+            rs.input(width=k + 1, name=f"t{k}_a")
+            await asyncio.sleep(0)
+            rs.output(width=k + 1, name=f"t{k}_o")
+            assert rs.current_module() is m
+        return m
+
+    async def main() -> list[fe.Module]:
+        return await asyncio.gather(*(work(k) for k in range(4)))
+
+    for k, m in enumerate(asyncio.run(main())):
+        assert m.name == f"t{k}"
+        assert [port["name"] for port in m.ports] == [f"t{k}_a", f"t{k}_o"]
+
+
+def test_nested_modules_restore_the_outer_one():
+    with rs.module("outer") as outer:
+        inner = elaborate("inner", 2)
+        assert rs.current_module() is outer
+    check(inner, "inner", 2)
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+import pytest
+
+HEAVY = ("pyrtl", "gurobipy", "numpy", "scipy")
+
+
+def loaded_after(code: str) -> list[str]:
+    # heavy dependencies in sys.modules after running code in a fresh interpreter
+    check = f"import sys\n{code}\nprint(' '.join(name for name in {HEAVY!r} if name in sys.modules))"
+    return subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True).stdout.split()
+
+
+def test_elaboration_loads_no_backend():
+    assert loaded_after("""
+import redstone as rs
+with rs.module("m") as m:
+    a, o = rs.input(width=8, name="a"), rs.output(width=8, name="o")
+""") == []
+
+
+def test_scheduling_without_resources_loads_no_solver():
+    assert loaded_after("""
+import redstone as rs
+with rs.module("m") as m:
+    a, o = rs.input(width=8, name="a"), rs.output(width=8, name="o")
+rs.lower(m).blocks[0].schedule()
+rs.to_verilog
+""") == []
+
+
+def test_backends_are_loaded_on_first_use():
+    pytest.importorskip("pyrtl")
+    assert "pyrtl" in loaded_after("import redstone as rs\nrs.to_pyrtl")
+
+
+def test_unknown_names_raise_attribute_error():
+    import redstone as rs
+    with pytest.raises(AttributeError):
+        rs.no_such_name
+    assert {"to_verilog", "sched", "BasicBlock"} <= set(dir(rs))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import redstone as rs
+from redstone.irsim import simulate
+
+
+def select_module():
+    # o = (a + 1 if s == 0 else a + 2) + 10 if s != 0, with the switch deciding at 2 and the branch at 3
+    with rs.module("select") as m:
+        a, s, o = rs.input(width=8, name="a"), rs.input(width=2, name="s"), rs.output(width=8, name="o")
+        with rs.loop(at=rs.TZERO) as (start, next_start):
+            av, sv, r = rs.values((8, 2, 8), names="av sv r")
+            rs.at(start).do(
+                rs.NormalAction({"type": "sample", "from": a, "to": av}),
+                rs.NormalAction({"type": "sample", "from": s, "to": sv}),
+            )
+            with rs.switch(selector=sv, at=start + 2) as sw:
+                with sw.case(0):
+                    rs.NormalAction({"type": "add", "operands": (av, 1), "to": r})
+                with sw.default():
+                    rs.NormalAction({"type": "add", "operands": (av, 2), "to": r})
+            with rs.branch(condition={"type": "bool", "value": sv}, at=start + 3) as br:
+                with br.then():
+                    rs.NormalAction({"type": "add", "operands": (r, 10), "to": r})
+            rs.at(start + 4).do(rs.NormalAction({"type": "drive", "from": r, "to": o}))
+            next_start.tset(start + 5)
+    return m
+
+
+def test_control_flow_at_pins_selects():
+    bb = rs.lower(select_module()).blocks[0]
+    assert sorted(val.content["time"] for val in bb.body if val.type == "eq") == [2, 3]
+    bb.schedule()
+    muxes = [val for val in bb.body if val.type == "mux"]
+    assert muxes and all(mux.content["time"] >= mux.content["operands"][0].content["time"] >= 2 for mux in muxes)
+    out = simulate(bb, {"a": np.array([1, 1, 1]), "s": np.array([0, 1, 2])})
+    np.testing.assert_array_equal(out["o"][:, 4], [2, 13, 13])
+
+
+def test_loop_after_a_wait_is_not_supported():
+    with rs.module("waiting") as m:
+        go = rs.input_pulse(name="start")
+        begin = rs.wait(rs.PulseEvent(go), at=rs.TZERO)
+        with rs.loop(at=begin):
+            pass
+    with pytest.raises(NotImplementedError):
+        rs.lower(m)
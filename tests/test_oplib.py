@@ -0,0 +1,28 @@
+from redstone.core import BasicBlock, Port, Value
+from redstone.oplib import OpLib
+
+
+def test_occupancy_of_pipelined_and_blocking_units():
+    oplib = OpLib(latencies={"mul": lambda w: 3 if w > 16 else 0, "add": lambda w: 1}, pipelined={"add": False})
+    assert oplib.latency("mul", 32) == 3 and oplib.latency("mul", 8) == 0
+    assert oplib.occupancy("mul", 32) == 1 and oplib.occupancy("mul", 8) == 1
+    assert oplib.occupancy("add", 8) == 1 and oplib.pipelined("add") is False
+    assert OpLib(latencies={"add": lambda w: 2}, pipelined={"add": False}).occupancy("add", 8) == 2
+    # types without an entry take no time
+    assert oplib.delay("write", 8) == 0.0 and oplib.latency("read", 8) == 0
+
+
+def test_consumers_wait_for_multi_cycle_results():
+    # a wide mul takes three cycles and a narrow one none, and the sum of both follows the wide one
+    a, o = Port("a", "inputbus", 8), Port("o", "outputbus", 32)
+    r = Value("read", False, {"from": a, "time": 0})
+    wide = Value("mul", False, {"width": 32, "operands": [r, r]})
+    narrow = Value("mul", False, {"width": 8, "operands": [r, r]})
+    total = Value("add", False, {"width": 32, "operands": [wide, narrow]})
+    bb = BasicBlock("entry")
+    bb.body = [r, wide, narrow, total, Value("write", True, {"value": total, "to": o})]
+    oplib = OpLib(latencies={"mul": lambda w: 3 if w > 16 else 0})
+    bb.schedule(oplib=oplib)
+    assert bb.latencies(oplib) == [0, 3, 0, 0, 0]
+    assert wide.content["latency"] == 3 and narrow.content.get("latency", 0) == 0
+    assert total.content["time"] == wide.content["time"] + 3
@@ -0,0 +1,120 @@
+import numpy as np
+from redstone import opt
+from redstone.core import BasicBlock, Function, Port, Value
+from redstone.irsim import simulate
+
+
+def stimulus(f: Function, steps: int, seed: int = 0) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    return {
+        port.name: rng.integers(0, 1 << port.width, size=(8, steps), dtype=np.uint64)
+        for port in f.ports if port.type.startswith("input")
+    }
+
+
+def check_same_simulation(make, optimize, iterations: int = 8):
+    # a block simulates the same before and after optimize, both scheduled as soon as possible
+    reference = make()
+    reference.blocks[0].schedule()
+    f = make()
+    optimize(f.blocks[0])
+    f.blocks[0].schedule()
+    inputs = stimulus(reference, 80)
+    expected = simulate(reference.blocks[0], inputs, iterations)
+    actual = simulate(f.blocks[0], inputs, iterations)
+    assert expected.keys() == actual.keys()
+    for name in expected:
+        np.testing.assert_array_equal(actual[name], expected[name])
+    return f
+
+
+def wide() -> Function:
+    # 8-bit inputs summed and multiplied in 32 bits, with outputs of 16 and 32 bits, and a 32-bit accumulator
+    x, y = Port("x", "inputbus", 8), Port("y", "inputbus", 8)
+    low, full, total = Port("low", "outputbus", 16), Port("full", "outputbus", 32), Port("total", "outputbus", 16)
+    acc = Value("phi", False, {"width": 32, "init": 0})
+    rx = Value("read", False, {"from": x})
+    ry = Value("read", False, {"from": y})
+    s = Value("add", False, {"width": 32, "operands": [rx, ry]})
+    m = Value("mul", False, {"width": 32, "operands": [s, rx]})
+    nxt = Value("add", False, {"width": 32, "operands": [acc, m]})
+    acc.content["next"] = nxt
+    bb = BasicBlock("entry")
+    bb.body = [
+        acc, rx, ry, s, m, nxt,
+        Value("write", True, {"value": m, "to": low}),
+        Value("write", True, {"value": s, "to": full}),
+        Value("write", True, {"value": nxt, "to": total}),
+    ]
+    f = Function("wide")
+    f.ports = [x, y, low, full, total]
+    f.blocks.append(bb)
+    return f
+
+
+def test_narrowing_keeps_simulation():
+    f = check_same_simulation(wide, opt.narrow_widths)
+    acc, _, _, s, m, nxt = f.blocks[0].body[:6]
+    # the sum of two bytes takes 9 bits, and only the low 16 bits of the others reach a port
+    assert s.content["width"] == 9
+    assert m.content["width"] == 16
+    assert acc.content["width"] == nxt.content["width"] == 16
+
+
+def test_narrowing_reports_saved_bits():
+    f = wide()
+    assert opt.narrow_widths(f.blocks[0]) == (32 - 9) + 3 * (32 - 16)
+    assert opt.narrow_widths(f.blocks[0]) == 0
+
+
+def foldable() -> Function:
+    # x + 0, 8 * x, 3 * 5, a mux of a constant select, an accumulator that never changes, and a dead product
+    x, y = Port("x", "inputbus", 8), Port("y", "inputbus", 8)
+    o1, o2, o3 = Port("o1", "outputbus", 16), Port("o2", "outputbus", 8), Port("o3", "outputbus", 8)
+    const = lambda constant, width=16: Value("const", False, {"constant": constant, "width": width})
+    still = Value("phi", False, {"width": 8, "init": 7})
+    acc = Value("phi", False, {"width": 8, "init": 2})
+    rx = Value("read", False, {"from": x, "time": 0})
+    ry = Value("read", False, {"from": y, "time": 0})
+    zero, one, eight, three, five, high = const(0), const(1), const(8), const(3), const(5), const(1, 1)
+    a = Value("add", False, {"width": 16, "operands": [rx, zero]})
+    m = Value("mul", False, {"width": 16, "operands": [eight, a]})
+    k = Value("mul", False, {"width": 16, "operands": [three, five]})
+    s = Value("add", False, {"width": 16, "operands": [m, k]})
+    picked = Value("mux", False, {"width": 16, "operands": [high, s, ry]})
+    nxt = Value("add", False, {"width": 8, "operands": [acc, ry]})
+    acc.content["next"] = nxt
+    dead = Value("mul", False, {"width": 32, "operands": [rx, ry]})
+    kept = Value("mul", False, {"width": 8, "operands": [still, one]})
+    bb = BasicBlock("entry")
+    bb.body = [
+        still, acc, rx, ry, zero, one, eight, three, five, high, a, m, k, s, picked, nxt, dead, kept,
+        Value("write", True, {"value": picked, "to": o1, "time": 1}),
+        Value("write", True, {"value": kept, "to": o2}),
+        Value("write", True, {"value": acc, "to": o3}),
+    ]
+    f = Function("foldable")
+    f.ports = [x, y, o1, o2, o3]
+    f.blocks.append(bb)
+    return f
+
+
+def test_folding_keeps_simulation():
+    f = check_same_simulation(foldable, opt.fold_constants)
+    types = f.blocks[0].types()
+    # 8 * x is a shift, and the dead product is the only mul left, to be dropped by eliminate_dead_values
+    assert "shl" in types
+    assert types.count("mul") == 1 and "mux" not in types
+
+
+def test_dead_values_are_dropped():
+    f = check_same_simulation(foldable, opt.eliminate_dead_values)
+    body = f.blocks[0].body
+    assert not any(val.type == "mul" and val.content["width"] == 32 for val in body)
+    assert len(body) < len(foldable().blocks[0].body)
+
+
+def test_optimize_keeps_simulation():
+    f = check_same_simulation(foldable, opt.optimize)
+    assert "mul" not in f.blocks[0].types()
+    assert len(f.blocks[0].body) < 12
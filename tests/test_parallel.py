@@ -0,0 +1,25 @@
+from benchmarks.workloads import random_dag
+from redstone import parallel, stats
+from redstone.core import BasicBlock
+from redstone.oplib import OpLib
+
+BLOCKING = OpLib(latencies={"mul": lambda w: 2}, pipelined={"mul": False})
+RESOURCES = {"mul": 2, "add": 1}
+
+
+def blocks() -> list[BasicBlock]:
+    # scheduled times are pinned in later schedules, so each run gets blocks of its own
+    return [random_dag(30, seed=seed).blocks[0] for seed in range(3)]
+
+
+def test_pooled_schedule_matches_serial():
+    serial = blocks()
+    parallel.schedule_blocks(serial, solver="highs", resources=RESOURCES, period=8.0, oplib=BLOCKING)
+    pooled = blocks()
+    with stats.collect() as collected:
+        parallel.schedule_blocks(pooled, solver="highs", resources=RESOURCES, period=8.0, oplib=BLOCKING, workers=2)
+    counters = [record.counters for record in collected.records if record.name == "schedule_blocks"][-1]
+    assert counters["pooled"] > 1
+    for a, b in zip(serial, pooled):
+        assert [val.content["time"] for val in a.body] == [val.content["time"] for val in b.body]
+        assert [val.content.get("unit") for val in a.body] == [val.content.get("unit") for val in b.body]
@@ -0,0 +1,34 @@
+import pytest
+from benchmarks.workloads import generate
+from redstone.core import BasicBlock, Port, Value
+from redstone.regalloc import allocate_registers, lifetimes
+
+
+def test_values_share_a_register_once_the_first_is_dead():
+    # a is held until the mul at 3, b only until the add at 1, and the sum from 2 until the mul
+    a, b, o = Port("a", "inputbus", 8), Port("b", "inputbus", 8), Port("o", "outputbus", 8)
+    av = Value("read", False, {"from": a, "time": 0})
+    bv = Value("read", False, {"from": b, "time": 0})
+    s = Value("add", False, {"width": 8, "operands": [av, bv], "time": 1})
+    m = Value("mul", False, {"width": 8, "operands": [s, av], "time": 3})
+    bb = BasicBlock("entry")
+    bb.body = [av, bv, s, m, Value("write", True, {"value": m, "to": o, "time": 3})]
+    assert lifetimes(bb) == {av: (1, 3), bv: (1, 1), s: (2, 3)}
+    val2idx = allocate_registers(bb)
+    assert val2idx[s] == val2idx[bv] != val2idx[av]
+    assert len(set(val2idx.values())) == 2
+
+
+@pytest.mark.parametrize("ops", [40, 200])
+def test_left_edge_uses_as_many_registers_as_values_live_at_once(ops):
+    bb = generate("random_dag", ops).blocks[0]
+    bb.schedule(resources={"mul": 1, "add": 1})
+    spans = lifetimes(bb)
+    val2idx = allocate_registers(bb)
+    assert val2idx.keys() == spans.keys()
+    for val, (first, last) in spans.items():
+        for other, (other_first, other_last) in spans.items():
+            if other is not val and val2idx[other] == val2idx[val]:
+                assert last < other_first or other_last < first
+    live = max(sum(first <= t <= last for first, last in spans.values()) for t in range(max(last for _, last in spans.values()) + 1))
+    assert len(set(val2idx.values())) == live
@@ -0,0 +1,193 @@
+import random
+from collections import Counter
+import pytest
+from redstone import sched, solvers
+from redstone.core import BasicBlock, Function, Port, Value
+from redstone.oplib import OpLib
+
+MULTI_CYCLE = OpLib(latencies={"mul": lambda w: 2})
+BLOCKING = OpLib(latencies={"mul": lambda w: 3}, pipelined={"mul": False})
+
+
+def random_block(n: int, seed: int, width: int = 16) -> Function:
+    # a block of n random adds and muls over four inputs, writing the last one
+    rnd = random.Random(seed)
+    inputs = [Port(f"i{k}", "inputbus", width) for k in range(4)]
+    out = Port("o", "outputbus", width)
+    vals = [Value("read", False, {"from": port, "time": 0}) for port in inputs]
+    for _ in range(n):
+        a, b = rnd.choice(vals[-8:]), rnd.choice(vals)
+        vals.append(Value(rnd.choice(["add", "mul"]), False, {"width": width, "operands": [a, b]}))
+    bb = BasicBlock("entry")
+    bb.body = vals + [Value("write", True, {"value": vals[-1], "to": out})]
+    f = Function("rand")
+    f.ports = inputs + [out]
+    f.blocks.append(bb)
+    return f
+
+
+def times(bb: BasicBlock) -> list[int]:
+    return [val.content["time"] for val in bb.body]
+
+
+def check_dependencies(bb: BasicBlock, oplib: OpLib, period: float | None = None):
+    ts = times(bb)
+    deps, weights = bb.constraints(period, oplib)
+    for (i, j), w in zip(deps, weights):
+        assert ts[j] - ts[i] >= w
+
+
+def check_resources(bb: BasicBlock, resources: dict[str, int], oplib: OpLib, ii: int | None = None):
+    # at most resources[type] values hold a unit of a type in a time step, or in a slot modulo ii,
+    # and values holding units at once are bound to different ones
+    busy: Counter[tuple[str, int]] = Counter()
+    units: dict[tuple[str, int], set[int]] = {}
+    for val in bb.body:
+        if val.type not in resources:
+            continue
+        t, unit = val.content["time"], val.content["unit"]
+        for step in range(t, t + oplib.occupancy(val.type, val.content["width"])):
+            slot = (val.type, step if ii is None else step % ii)
+            busy[slot] += 1
+            assert unit not in units.setdefault(slot, set())
+            units[slot].add(unit)
+    for (ty, _), count in busy.items():
+        assert count <= resources[ty]
+
+
+def makespan(bb: BasicBlock, oplib: OpLib) -> int:
+    return max(t + lat for t, lat in zip(times(bb), bb.latencies(oplib)))
+
+
+@pytest.mark.parametrize("oplib", [OpLib(), MULTI_CYCLE])
+def test_alap_keeps_makespan(oplib):
+    # scheduled times are pinned in later schedules, so each one gets a block of its own
+    bb = random_block(40, 1).blocks[0]
+    bb.schedule("ASAP", oplib=oplib)
+    asap = makespan(bb, oplib)
+    bb = random_block(40, 1).blocks[0]
+    bb.schedule("ALAP", oplib=oplib)
+    check_dependencies(bb, oplib)
+    assert makespan(bb, oplib) == asap
+    assert min(bb.mobility(oplib=oplib)) == 0
+
+
+def test_alap_multi_cycle_sink_finishes_by_makespan():
+    # the sum is the latest start, and the square not written anywhere takes two steps
+    a, out = Port("a", "inputbus", 8), Port("o", "outputbus", 8)
+    r = Value("read", False, {"from": a})
+    product = Value("mul", False, {"width": 8, "operands": [r, r]})
+    total = Value("add", False, {"width": 8, "operands": [product, r]})
+    square = Value("mul", False, {"width": 8, "operands": [r, r]})
+    bb = BasicBlock("entry")
+    bb.body = [r, product, total, square, Value("write", True, {"value": total, "to": out})]
+    bb.schedule("ALAP", oplib=MULTI_CYCLE)
+    check_dependencies(bb, MULTI_CYCLE)
+    assert square.content["time"] == 0
+    assert makespan(bb, MULTI_CYCLE) == 2
+
+
+def test_chain_cuts_split_paths_longer_than_the_period():
+    # a chain of five 2 ns values, with a free one between the second and the third
+    deps = [(0, 1), (1, 5), (5, 2), (2, 3), (3, 4)]
+    delays = [2.0, 2.0, 2.0, 2.0, 2.0, 0.0]
+    assert sorted(sched.chain_cuts(6, deps, delays, 5.0)) == [(0, 2), (1, 3), (2, 4)]
+    assert sorted(sched.chain_cuts(6, deps, delays, 4.0)) == [(0, 2), (1, 3), (2, 4)]
+    assert sorted(sched.chain_cuts(6, deps, delays, 3.0)) == [(0, 1), (1, 2), (2, 3), (3, 4)]
+    assert sched.chain_cuts(6, deps, delays, 10.0) == []
+    with pytest.raises(RuntimeError):
+        sched.chain_cuts(6, deps, delays, 1.5)
+
+
+@pytest.mark.parametrize("period", [None, 5.0, 12.0])
+def test_chains_fit_in_the_period(period):
+    bb = random_block(30, 4).blocks[0]
+    bb.schedule(period=period)
+    check_dependencies(bb, OpLib(), period)
+    # the longest combinational path ending at each value, within its time step
+    ts, delays, preds = times(bb), bb.delays(), bb.predecessors()
+    arrival = []
+    for i, d in enumerate(delays):
+        arrival.append(d + max((arrival[k] for k in preds[i] if ts[k] == ts[i]), default=0.0))
+    if period is None:
+        assert max(ts) == 0
+    else:
+        assert 0 < max(ts) and max(arrival) <= period
+
+
+def available(solver: str) -> bool:
+    return solver == "graph" or solvers.BACKENDS[solver].available()
+
+
+@pytest.mark.parametrize("solver", ["graph", "highs", "gurobi"])
+@pytest.mark.parametrize("oplib", [OpLib(), MULTI_CYCLE, BLOCKING])
+@pytest.mark.parametrize("resources", [{"mul": 1}, {"mul": 2, "add": 1}])
+def test_list_schedule_respects_resources(solver, oplib, resources):
+    if not available(solver):
+        pytest.skip(f"{solver} is not available")
+    bb = random_block(20, 2).blocks[0]
+    bb.schedule(solver=solver, resources=resources, oplib=oplib, OutputFlag=0)
+    check_dependencies(bb, oplib)
+    check_resources(bb, resources, oplib)
+
+
+def test_list_schedule_is_no_shorter_than_unconstrained():
+    bb = random_block(30, 3).blocks[0]
+    bb.schedule(oplib=MULTI_CYCLE)
+    unconstrained = makespan(bb, MULTI_CYCLE)
+    bb = random_block(30, 3).blocks[0]
+    bb.schedule(solver="graph", resources={"mul": 1}, oplib=MULTI_CYCLE)
+    assert makespan(bb, MULTI_CYCLE) >= unconstrained
+    # one pipelined unit starts a mul per step, and the last one takes two more
+    assert makespan(bb, MULTI_CYCLE) >= sum(val.type == "mul" for val in bb.body) + 1
+
+
+@pytest.mark.parametrize("limit", [0, -1, 1.5, True])
+def test_resource_limits_below_one_raise(limit):
+    with pytest.raises(ValueError):
+        sched.list_schedule(2, [(0, 1)], {}, ["read", "mul"], {"mul": limit})
+    with pytest.raises(ValueError):
+        random_block(5, 0).blocks[0].schedule(resources={"mul": limit})
+    with pytest.raises(ValueError):
+        dot_block().modulo_schedule(1, resources={"mul": limit})
+
+
+def test_resources_need_asap():
+    bb = random_block(5, 0).blocks[0]
+    with pytest.raises(NotImplementedError):
+        bb.schedule("ALAP", resources={"mul": 1})
+
+
+def dot_block() -> BasicBlock:
+    # acc = acc + a * b, then a write of (acc + a * b) * a, with two muls
+    a, b, out = Port("a", "inputbus", 16), Port("b", "inputbus", 16), Port("o", "outputbus", 16)
+    acc = Value("phi", False, {"width": 16, "init": 5})
+    av = Value("read", False, {"from": a, "time": 0})
+    bv = Value("read", False, {"from": b, "time": 1})
+    product = Value("mul", False, {"width": 16, "operands": [av, bv]})
+    total = Value("add", False, {"width": 16, "operands": [acc, product]})
+    scaled = Value("mul", False, {"width": 16, "operands": [total, av]})
+    acc.content["next"] = total
+    bb = BasicBlock("loop")
+    bb.body = [acc, av, bv, product, total, scaled, Value("write", True, {"value": scaled, "to": out})]
+    return bb
+
+
+@pytest.mark.parametrize("oplib", [OpLib(), MULTI_CYCLE, BLOCKING])
+@pytest.mark.parametrize("resources", [{}, {"mul": 1}, {"mul": 2}])
+@pytest.mark.parametrize("target", [1, 2, 4])
+def test_modulo_schedule_respects_resources(oplib, resources, target):
+    bb = dot_block()
+    ii = bb.modulo_schedule(target, resources=resources, oplib=oplib)
+    assert ii >= target and bb.ii == ii
+    check_dependencies(bb, oplib)
+    check_resources(bb, resources, oplib, ii)
+    # the sum is carried to the next iteration, which starts ii steps later
+    acc, total = bb.body[0], bb.body[4]
+    assert total.content["time"] + oplib.latency("add", 16) <= acc.content["time"] + ii
+
+
+def test_modulo_schedule_is_bounded_by_units():
+    bb = dot_block()
+    # two blocking muls of three steps each share a single unit
+    assert bb.modulo_schedule(1, resources={"mul": 1}, oplib=BLOCKING) >= 6
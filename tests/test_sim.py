@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from redstone import be
+from redstone.core import BasicBlock, Function, Port, Value
+from redstone.irsim import simulate
+from redstone.oplib import OpLib
+from redstone.rtlsim import simulate_rtl
+
+OPLIBS = [OpLib(), OpLib(latencies={"mul": lambda w: 2}), OpLib(latencies={"mul": lambda w: 3}, pipelined={"mul": False})]
+
+
+def dot_function() -> Function:
+    # acc = acc + a * b every iteration, writing (acc + a * b) * a and pulsing done at time 6
+    a, b = Port("a", "inputbus", 16), Port("b", "inputbus", 16)
+    out, done = Port("o", "outputbus", 16), Port("done", "outputpulse", 1)
+    acc = Value("phi", False, {"width": 16, "init": 5})
+    av = Value("read", False, {"from": a, "time": 0})
+    bv = Value("read", False, {"from": b, "time": 1})
+    product = Value("mul", False, {"width": 16, "operands": [av, bv]})
+    total = Value("add", False, {"width": 16, "operands": [acc, product]})
+    scaled = Value("mul", False, {"width": 16, "operands": [total, av]})
+    acc.content["next"] = total
+    bb = BasicBlock("loop")
+    bb.body = [
+        acc, av, bv, product, total, scaled,
+        Value("write", True, {"value": scaled, "to": out, "time": 8}),
+        Value("emit", True, {"to": done, "time": 8}),
+    ]
+    f = Function("dot")
+    f.ports = [a, b, out, done]
+    f.blocks.append(bb)
+    return f
+
+
+@pytest.mark.parametrize("oplib", OPLIBS)
+@pytest.mark.parametrize("resources", [{}, {"mul": 1}])
+@pytest.mark.parametrize("target", [1, 2, 3])
+def test_pipelined_rtl_matches_ir(oplib, resources, target):
+    f = dot_function()
+    bb = f.blocks[0]
+    bb.modulo_schedule(target, resources=resources, oplib=oplib)
+    rng = np.random.default_rng(target)
+    stimulus = {"a": rng.integers(0, 1 << 16, size=(1, 60)), "b": rng.integers(0, 1 << 16, size=(1, 60))}
+    # with go held high, the hardware starts an iteration every ii cycles, as the IR simulator does
+    ir = simulate(bb, stimulus, iterations=6)
+    steps = ir["o"].shape[1]
+    rtl = simulate_rtl(f, {name: col[0, :steps] for name, col in stimulus.items()}, steps, pipelined=True)
+    np.testing.assert_array_equal(rtl["o"], ir["o"][0])
+    np.testing.assert_array_equal(rtl["done"], ir["done"][0])
+    assert rtl["done"].sum() == 6
+
+
+def test_pipelined_ii_below_the_schedule_fails():
+    f = dot_function()
+    f.blocks[0].schedule(resources={"mul": 1})
+    # both muls are bound to the only unit, so iterations cannot overlap in every cycle
+    with pytest.raises(ValueError):
+        be.to_pyrtl(f, pipelined=True, ii=1)
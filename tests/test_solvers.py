@@ -0,0 +1,135 @@
+import dataclasses
+import importlib.util
+import math
+import time
+import pytest
+from benchmarks.workloads import generate
+from redstone import solvers, stats
+from redstone.oplib import OpLib
+
+BLOCKING = OpLib(latencies={"mul": lambda w: 2}, pipelined={"mul": False})
+RESOURCES = {"mul": 2, "add": 1}
+
+
+def problem(ops: int = 60) -> solvers.Problem:
+    bb = generate("random_dag", ops).blocks[0]
+    return bb._problem(RESOURCES, 8.0, BLOCKING)[0]
+
+
+def check_schedule(p: solvers.Problem, ts: list[int], bound: int):
+    for (i, j), w in zip(p.deps, p.weights):
+        assert ts[j] - ts[i] >= w
+    for ty, limit in RESOURCES.items():
+        for t in range(p.makespan(ts) + 1):
+            assert sum(p.types[i] == ty and s <= t < s + p.occupancy[i] for i, s in enumerate(ts)) <= limit
+    assert p.lower_bound() <= bound <= p.makespan(ts) <= p.makespan(p.start)
+
+
+def test_edges_drop_parallel_and_implied_deps():
+    # 0 -> 1 -> 2 with a parallel 0 -> 1, an implied 0 -> 2, and a 1 -> 3 longer than through 2
+    deps = [(0, 1), (0, 1), (1, 2), (0, 2), (2, 3), (1, 3)]
+    p = solvers.Problem(4, deps, [1, 2, 1, 3, 1, 3], [0, 0, 0, 1], {}, [0, 2, 3, 5])
+    assert sorted(p.edges) == [(0, 1, 2), (1, 2, 1), (1, 3, 3), (2, 3, 1)]
+    assert p.windows == [(0, 0), (2, 2), (3, 4), (5, 5)]
+    # the windows of a tight horizon imply every edge, and two more steps of slack imply none
+    assert p.ilp_edges() == []
+    assert sorted(p.ilp_edges([(0, 2), (2, 4), (3, 6), (5, 7)])) == sorted(p.edges)
+    assert p.sinks == [3]
+
+
+def test_windows_hold_every_optimal_schedule():
+    p = problem(40)
+    assert all(lo <= t <= hi for t, (lo, hi) in zip(p.start, p.windows))
+    assert set(p.ilp_edges()) <= set(p.edges)
+    ts, bound = solvers.BACKENDS["highs"].solve(p, {})
+    check_schedule(p, ts, bound)
+    assert all(lo <= t <= hi for t, (lo, hi) in zip(ts, p.windows))
+
+
+def test_expired_deadline_keeps_the_heuristic_schedule():
+    p = problem()
+    with stats.collect() as collected:
+        backend, ts, bound = solvers.solve(p, "highs", {}, deadline=time.time() - 1)
+    assert backend == "graph" and ts == p.start
+    check_schedule(p, ts, bound)
+    assert not [record for record in collected.records if record.name == "ilp"]
+
+
+@pytest.mark.parametrize("solver", ["highs", "gurobi"])
+def test_time_limit_too_short_to_solve_returns_the_incumbent(solver):
+    if not solvers.BACKENDS[solver].available():
+        pytest.skip(f"{solver} is not available")
+    p = problem()
+    with stats.collect() as collected:
+        ts, bound = solvers.BACKENDS[solver].solve(p, {}, TimeLimit=1e-6, OutputFlag=0)
+    assert ts == p.start
+    check_schedule(p, ts, bound)
+    assert not [record for record in collected.records if record.name == "ilp"]
+
+
+def test_stopped_solve_returns_an_incumbent():
+    p = problem()
+    # a node limit of 0 stops HiGHS at the root, before it proves any schedule optimal
+    with stats.collect() as collected:
+        ts, bound = solvers.BACKENDS["highs"].solve(p, {}, node_limit=0)
+    assert [record.counters["status"] for record in collected.records if record.name == "ilp"] != [0]
+    check_schedule(p, ts, bound)
+
+
+@pytest.mark.parametrize("solver", ["highs", "gurobi"])
+def test_solve_within_gap_reports_the_dual_bound(solver):
+    if not solvers.BACKENDS[solver].available():
+        pytest.skip(f"{solver} is not available")
+    p = problem(20)
+    # any schedule is within a relative gap of 1, so both stop at the first one, short of proving it optimal
+    with stats.collect() as collected:
+        ts, bound = solvers.BACKENDS[solver].solve(p, {}, OutputFlag=0, MIPGap=1.0)
+    check_schedule(p, ts, bound)
+    dual = [record.counters["bound"] for record in collected.records if record.name == "ilp"][-1]
+    assert bound == max(p.lower_bound(), math.ceil(dual - 1e-6)) < p.makespan(ts)
+
+
+def test_budget_reports_bound_and_gap():
+    bb = generate("random_dag", 60).blocks[0]
+    with stats.collect() as collected:
+        bb.schedule(resources=RESOURCES, period=8.0, oplib=BLOCKING, budget=0)
+    counters = [record.counters for record in collected.records if record.name == "schedule"][-1]
+    assert counters["backend"] == "graph"
+    makespan = counters["length"] - 1
+    assert 0 <= counters["bound"] <= makespan
+    assert counters["gap"] == solvers.gap(makespan, counters["bound"])
+
+
+def test_gurobi_model_is_reused_for_the_same_problem():
+    if not solvers.BACKENDS["gurobi"].available():
+        pytest.skip("gurobi is not available")
+    p, cache = problem(20), {}
+    try:
+        ts, bound = solvers.BACKENDS["gurobi"].solve(p, cache, OutputFlag=0)
+        ilp = cache["gurobi"]
+        assert solvers.BACKENDS["gurobi"].solve(p, cache, OutputFlag=0) == (ts, bound)
+        assert cache["gurobi"] is ilp
+        # the same graph and limits with adds and muls swapped shares other units, so it gets a model of its own
+        swap = {"add": "mul", "mul": "add"}
+        types = [swap.get(ty, ty) for ty in p.types]
+        swapped = dataclasses.replace(p, types=types, resources={swap[ty]: limit for ty, limit in p.resources.items()})
+        solvers.BACKENDS["gurobi"].solve(swapped, cache, OutputFlag=0)
+        assert cache["gurobi"] is not ilp
+    finally:
+        solvers.release(cache)
+
+
+def test_gurobi_license_check_is_quiet(capfd):
+    if importlib.util.find_spec("gurobipy") is None:
+        pytest.skip("gurobipy is not installed")
+    # a backend of its own, since the registered one checks the license only once
+    backend = solvers.GurobiBackend()
+    if not backend.available():
+        pytest.skip("gurobi is not available")
+    cache = {}
+    try:
+        backend.solve(problem(20), cache, MIPGap=0.5, OutputFlag=0)
+    finally:
+        backend.release(cache)
+    out, err = capfd.readouterr()
+    assert not out and not err
@@ -0,0 +1,41 @@
+import io
+import json
+from redstone import stats
+
+
+def test_nested_passes_are_recorded_with_counters():
+    seen = []
+    with stats.collect(seen.append) as collected:
+        with stats.timed("outer", size=3) as counters:
+            with stats.timed("inner"):
+                pass
+            counters["done"] = True
+        with stats.timed("inner"):
+            pass
+    assert [(r.name, r.depth) for r in collected.records] == [("inner", 1), ("outer", 0), ("inner", 0)]
+    assert collected.records[1].counters == {"size": 3, "done": True}
+    assert seen == collected.records
+    outer = collected.records[1]
+    assert outer.start <= collected.records[0].start and collected.records[0].time <= outer.time
+    assert collected.totals().keys() == {"outer", "inner"}
+    assert stats.active() is None
+
+
+def test_passes_without_a_collector_only_fill_counters():
+    with stats.timed("alone", size=1) as counters:
+        counters["more"] = 2
+    assert counters == {"size": 1, "more": 2}
+    assert stats.active() is None
+
+
+def test_trace_has_an_event_per_pass():
+    with stats.collect() as collected:
+        with stats.timed("schedule", block="entry", bound=object()):
+            pass
+    out = io.StringIO()
+    collected.write_trace(out)
+    trace = json.loads(out.getvalue())
+    event, = trace["traceEvents"]
+    assert event["name"] == "schedule" and event["ph"] == "X" and event["dur"] >= 0
+    # counters that are not JSON types are written as strings
+    assert event["args"]["block"] == "entry" and isinstance(event["args"]["bound"], str)
@@ -0,0 +1,96 @@
+import pytest
+import redstone as rs
+from redstone.fe import TVar, TZERO
+from redstone.timeline import Timeline, TimelineError
+
+
+@pytest.fixture
+def module():
+    with rs.module("timeline") as m:
+        yield m
+
+
+def test_offsets_follow_the_algebra(module):
+    a = TZERO + 2
+    b = a + 3
+    later = TVar.tmax(a, b)
+    assert TZERO.offset(b) == 5
+    assert a.offset(later) == 3
+    free = TVar()
+    a.tbefore(free)
+    assert a.offset(free) is None
+    assert module.timeline.bounds(module.tnode(a), module.tnode(free)) == (1, None)
+
+
+def test_contradiction_raises_with_the_cycle(module):
+    a = TZERO + 1
+    b = a + 1
+    with pytest.raises(TimelineError) as info:
+        b.tset(TZERO + 1)
+    # derived time variables are spelled out by their definitions
+    assert any("TZERO+2" in c and "tset" in c for c in info.value.constraints)
+    assert len(info.value.constraints) >= 3
+
+
+def test_before_and_after_contradict(module):
+    a, b = TVar(name="a"), TVar(name="b")
+    a.tbefore(b)
+    with pytest.raises(TimelineError):
+        a.tafter(b)
+
+
+def test_nothing_is_before_tzero(module):
+    with pytest.raises(TimelineError):
+        (TZERO + -1).tset(TZERO + -1)
+
+
+def test_failed_constraint_leaves_no_edge(module):
+    a, b = TVar(name="a"), TVar(name="b")
+    a.tbefore(b)
+    # the upper bound alone fits, the lower bound closes a cycle with tbefore
+    with pytest.raises(TimelineError):
+        a._constrain(b, 0, -1, "test")
+    assert module.timeline.bounds(module.tnode(a), module.tnode(b)) == (1, None)
+    b.tset(a + 4)
+    assert a.offset(b) == 4
+
+
+def test_loop_of_one_step_fails():
+    with pytest.raises(TimelineError):
+        with rs.module("loop"):
+            with rs.loop(at=TZERO) as (start, next_start):
+                next_start.tset(start)
+
+
+def test_timeline_negative_cycle():
+    timeline = Timeline()
+    u, v = timeline.add_node("u"), timeline.add_node("v")
+    timeline.add_constraint(u, v, 3, "v - u <= 3")
+    with pytest.raises(TimelineError) as info:
+        timeline.add_constraints([(0, u, 0, "u <= 0"), (v, u, -4, "v - u >= 4")])
+    assert "v - u <= 3" in info.value.constraints
+    # neither constraint of the failed batch is kept
+    assert timeline.bounds(0, u) == (0, None)
+
+
+def test_chains_are_built_without_searches(module):
+    def chain(n: int) -> int:
+        begin = module.timeline.relaxations
+        t = TZERO
+        for _ in range(n):
+            t = TVar.tmax(t, t + 1) + 1
+        assert TZERO.offset(t) == 2 * n
+        return module.timeline.relaxations - begin
+    # a search per step would scan a number of edges growing with the length of the chain
+    assert chain(2000) == chain(500) == 0
+
+
+def test_tmax_is_a_lower_bound_unless_the_offset_is_fixed(module):
+    a, b = TVar(name="a"), TVar(name="b")
+    a.tbefore(b)
+    later = TVar.tmax(a, b)
+    assert b.offset(later) is None
+    assert module.timeline.bounds(module.tnode(b), module.tnode(later)) == (0, None)
+    c = TVar(name="c")
+    c.tset(a + 3)
+    assert a.offset(TVar.tmax(c, a)) == 3
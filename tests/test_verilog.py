@@ -0,0 +1,83 @@
+import io
+import pytest
+from redstone.core import BasicBlock, Function, Port, Value
+from redstone.oplib import OpLib
+from redstone.verilog import to_verilog
+
+MULTI_CYCLE = OpLib(latencies={"mul": lambda w: 2})
+
+
+def dot_function(names: tuple[str | None, ...] = ("a", "b", "o", "done")) -> Function:
+    # acc = acc + a * b every iteration, writing (acc + a * b) * a and pulsing done
+    a, b = Port(names[0], "inputbus", 16), Port(names[1], "inputbus", 16)
+    out, done = Port(names[2], "outputbus", 16), Port(names[3], "outputpulse", 1)
+    acc = Value("phi", False, {"width": 16, "init": 5})
+    av = Value("read", False, {"from": a, "time": 0})
+    bv = Value("read", False, {"from": b, "time": 1})
+    product = Value("mul", False, {"width": 16, "operands": [av, bv]})
+    total = Value("add", False, {"width": 16, "operands": [acc, product]})
+    scaled = Value("mul", False, {"width": 16, "operands": [total, av]})
+    acc.content["next"] = total
+    bb = BasicBlock("loop")
+    bb.body = [
+        acc, av, bv, product, total, scaled,
+        Value("write", True, {"value": scaled, "to": out}),
+        Value("emit", True, {"to": done}),
+    ]
+    f = Function("dot")
+    f.ports = [a, b, out, done]
+    f.blocks.append(bb)
+    return f
+
+
+def emit(f: Function, **kwargs) -> set[str]:
+    # the names the module declares, after checking it elaborates without any diagnostic
+    pyslang = pytest.importorskip("pyslang")
+    out = io.StringIO()
+    to_verilog(f, out, **kwargs)
+    compilation = pyslang.ast.Compilation()
+    compilation.addSyntaxTree(pyslang.syntax.SyntaxTree.fromText(out.getvalue()))
+    assert [(str(diag.code), diag.args) for diag in compilation.getAllDiagnostics()] == []
+    top, = compilation.getRoot().topInstances
+    return {member.name for member in top.body}
+
+
+def test_fsm_declares_its_registers():
+    f = dot_function()
+    f.blocks[0].schedule(resources={"mul": 1}, oplib=MULTI_CYCLE)
+    names = emit(f)
+    assert {"clk", "rst", "go", "a", "b", "o", "done", "cnter", "step0", "r0", "mul_u0_lhs", "mul_u0_s2"} <= names
+    assert "ready" not in names
+
+
+def test_pipeline_declares_its_stages():
+    f = dot_function()
+    ii = f.blocks[0].modulo_schedule(2, resources={"mul": 1}, oplib=MULTI_CYCLE)
+    names = emit(f, pipelined=True, ii=ii)
+    assert {"ready", "phase", "valid1", "mul_u0_rhs"} <= names
+    assert not {"cnter", "step0"} & names
+
+
+def test_keywords_and_other_names_are_escaped():
+    f = dot_function(("wire", "b-in", "module", "done"))
+    f.blocks[0].schedule()
+    assert {"wire", "b-in", "module"} <= emit(f)
+
+
+@pytest.mark.parametrize("name", ["cnter", "step1", "r0", "mul3", "add4_s1", "mul3_p2", "mul_u0_lhs", "ready"])
+def test_ports_named_as_internal_names_raise(name):
+    f = dot_function((name, "b", "o", "done"))
+    f.blocks[0].modulo_schedule(2, resources={"mul": 1})
+    with pytest.raises(ValueError):
+        to_verilog(f, io.StringIO(), pipelined=True)
+    if name != "ready":
+        with pytest.raises(ValueError):
+            to_verilog(f, io.StringIO())
+
+
+def test_ports_of_the_same_name_raise():
+    f = dot_function(("a", "b", "port3", None))
+    f.blocks[0].schedule()
+    # the unnamed pulse is port3 by position
+    with pytest.raises(ValueError):
+        to_verilog(f, io.StringIO())
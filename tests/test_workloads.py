@@ -0,0 +1,41 @@
+import json
+import pytest
+from benchmarks import run
+from benchmarks.workloads import WORKLOADS, generate
+
+
+@pytest.mark.parametrize("name", sorted(WORKLOADS))
+@pytest.mark.parametrize("ops", [10, 100])
+def test_workloads_have_about_ops_operators(name, ops):
+    types = generate(name, ops).blocks[0].types()
+    operators = types.count("add") + types.count("mul")
+    assert ops / 3 <= operators <= 3 * ops
+
+
+def test_run_times_every_stage():
+    record = run.run_one("fir", 12, resources={"mul": 1}, batch=4, cycles=10)
+    assert set(record["times"]) == {"generate", "dependencies", "schedule", "verilog", "simulate_ir", "to_pyrtl", "simulate_rtl"}
+    assert record["units"] == 1 and record["schedule_length"] >= record["operators"]["mul"]
+    # above max_rtl_ops, lowering to pyrtl is skipped
+    assert "to_pyrtl" not in run.run_one("fir", 12, max_rtl_ops=4, batch=4)["times"]
+
+
+def test_regressions_compare_the_same_runs():
+    old = {"workload": "fir", "ops": 10, "resources": None, "times": {"schedule": 1.0, "verilog": 1e-4}}
+    slower = {**old, "times": {"schedule": 1.5, "verilog": 1e-3}}
+    messages = run.regressions([old], [slower], tolerance=0.2, min_time=1e-3)
+    # the verilog stage is below min_time in the baseline, so it is noise
+    assert len(messages) == 1 and "schedule" in messages[0]
+    assert run.regressions([old], [{**slower, "ops": 20}], 0.2, 1e-3) == []
+    assert run.regressions([old], [{**slower, "workers": 4}], 0.2, 1e-3) == []
+
+
+def test_main_writes_records_and_fails_on_regressions(tmp_path):
+    output = tmp_path / "new.jsonl"
+    args = ["--workloads", "dot_product", "--ops", "10", "--batch", "4", "--cycles", "10", "--output", str(output)]
+    assert run.main(args) == 0
+    record, = [json.loads(line) for line in output.read_text().splitlines()]
+    assert record["workload"] == "dot_product" and record["passes"]
+    baseline = tmp_path / "old.jsonl"
+    baseline.write_text(json.dumps({**record, "times": {label: 1e-9 for label in record["times"]}}) + "\n")
+    assert run.main(args + ["--baseline", str(baseline), "--min-time", "0"]) == 1